@@ -0,0 +1,206 @@
+# Provider adapters compiled from PROVIDER_APIS_CONFIG.
+# Each config entry is turned once into a request builder and a path extractor, so the
+# refresh loop only fills in currencies instead of re-interpreting the config per call.
+#
+# A provider can also declare a "batch" endpoint that returns many pairs per call:
+#   "batch": {
+#       "api_url": "...",                    # optional, defaults to the provider's api_url
+#       "params_template": {"from": "{source}"},
+#       # either a mapping of target currency -> rate (one call per distinct params)...
+#       "rates_map_path": ["rates"],
+#       # ...or a list of records
+#       "items_path": ["data"], "source_key": "source", "target_key": "target", "rate_key": "rate"
+#   }
+# Pairs whose batch params format identically share one request, so a batch endpoint
+# with no params costs a single request per refresh cycle.
+
+import json
+import os
+import threading
+from string import Formatter
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'providers')
+
+
+def _is_template(value):
+    return isinstance(value, str) and any(field for _, field, _, _ in Formatter().parse(value))
+
+
+def _compile_template(value):
+    """Returns a function of the currency context: either str.format_map or a constant."""
+    if _is_template(value):
+        return value.format_map
+    return lambda context, value=value: value
+
+
+def compile_path(path):
+    """
+    Compiles a rate_path such as ["rates", "{target}"] into a function(payload, context)
+    that returns the value at that path, or None if any step is missing.
+    """
+    steps = tuple(_compile_template(step) for step in path)
+
+    def extract(payload, context):
+        value = payload
+        try:
+            for step in steps:
+                value = value[step(context)]
+        except (KeyError, IndexError, TypeError):
+            return None
+        return value
+
+    return extract
+
+
+def compile_params(params_template):
+    """Compiles a params_template dict into a function(context) -> params dict."""
+    fields = tuple((key, _compile_template(value)) for key, value in params_template.items())
+    return lambda context: {key: build(context) for key, build in fields}
+
+
+def _as_rate(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class BatchSpec:
+    """Compiled "batch" section of a provider config."""
+
+    def __init__(self, config, default_url):
+        self.api_url = config.get('api_url', default_url)
+        self.build_params = compile_params(config.get('params_template', {}))
+        if 'rates_map_path' in config:
+            self.extract_map = compile_path(config['rates_map_path'])
+            self.extract_items = None
+        else:
+            self.extract_map = None
+            self.extract_items = compile_path(config.get('items_path', []))
+            self.source_key = config.get('source_key', 'source')
+            self.target_key = config.get('target_key', 'target')
+            self.rate_key = config.get('rate_key', 'rate')
+
+    def parse(self, payload, pairs):
+        """Picks the requested pairs out of one batch response. Returns {pair: rate or None}."""
+        rates = {}
+        if self.extract_map is not None:
+            for pair in pairs:
+                source, target = pair.split('_')
+                mapping = self.extract_map(payload, {'source': source, 'target': target}) or {}
+                rates[pair] = _as_rate(mapping.get(target)) if isinstance(mapping, dict) else None
+            return rates
+
+        items = self.extract_items(payload, {}) or []
+        by_pair = {}
+        for item in items:
+            try:
+                by_pair[f"{item[self.source_key]}_{item[self.target_key]}"] = item[self.rate_key]
+            except (KeyError, TypeError):
+                continue
+        return {pair: _as_rate(by_pair.get(pair)) for pair in pairs}
+
+
+class ProviderAdapter:
+    """Request builder + response parser for one provider, compiled from its config."""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.api_url = config['api_url']
+        self.build_params = compile_params(config.get('params_template', {}))
+        self.extract_rate = compile_path(config.get('rate_path', []))
+        self.batch = BatchSpec(config['batch'], self.api_url) if config.get('batch') else None
+
+    @staticmethod
+    def _context(pair):
+        source, target = pair.split('_')
+        return {'source': source, 'target': target}
+
+    def plan_requests(self, pairs):
+        """
+        Groups pairs into the requests one refresh cycle needs: single pair strings for
+        per-pair calls, tuples of pairs for calls to the batch endpoint.
+        """
+        if self.batch is None:
+            return list(pairs)
+        groups = {}
+        for pair in pairs:
+            key = tuple(sorted(self.batch.build_params(self._context(pair)).items()))
+            groups.setdefault(key, []).append(pair)
+        return [tuple(group) for group in groups.values()]
+
+    def fetch_rate(self, pair, session, timeout):
+        """One per-pair request. Raises on transport/HTTP errors so callers can retry."""
+        context = self._context(pair)
+        response = session.get(self.api_url, params=self.build_params(context), timeout=timeout)
+        response.raise_for_status()
+        return _as_rate(self.extract_rate(response.json(), context))
+
+    def fetch_batch(self, pairs, session, timeout):
+        """One batch request covering `pairs` (which must share batch params)."""
+        params = self.batch.build_params(self._context(pairs[0]))
+        response = session.get(self.batch.api_url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return self.batch.parse(response.json(), pairs)
+
+
+_adapters = {}
+_adapters_lock = threading.Lock()
+
+
+def get_adapter(provider_name, config):
+    """Compiled adapter for a provider, built once per config object."""
+    key = (provider_name, id(config))
+    adapter = _adapters.get(key)
+    if adapter is None:
+        with _adapters_lock:
+            adapter = _adapters.get(key)
+            if adapter is None:
+                adapter = _adapters[key] = ProviderAdapter(provider_name, config)
+    return adapter
+
+
+# --- Offline fixtures ---
+
+class FixtureResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} from fixture", response=self)
+
+
+class FixtureSession:
+    """
+    Stand-in for requests.Session that replays recorded provider responses from
+    fixtures/providers/*.json and counts the requests it serves. Unknown requests
+    get a 404.
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self._responses = {}
+        self._lock = threading.Lock()
+        self.request_count = 0
+        for filename in sorted(os.listdir(fixtures_dir)):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(fixtures_dir, filename)) as f:
+                for recorded in json.load(f)['responses']:
+                    key = self._key(recorded['url'], recorded.get('params', {}))
+                    self._responses[key] = (recorded.get('status', 200), recorded['body'])
+
+    @staticmethod
+    def _key(url, params):
+        return url, tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.request_count += 1
+        status, body = self._responses.get(self._key(url, params), (404, {"error": "no fixture"}))
+        return FixtureResponse(status, body)
@@ -0,0 +1,151 @@
+# Reading click data back out of UserActivity.
+# Exports walk the table with keyset pagination on id (WHERE id > last_id ORDER BY id LIMIT n)
+# and yield plain tuples, so memory stays constant no matter how many rows there are.
+# Per-day counts come from click_daily_summary, which is maintained on every click write.
+# The HTTP endpoints only ever read PUBLIC_COLUMNS; the IP address and user agent are
+# available through the export-clicks CLI command alone.
+
+import csv
+import io
+import json
+from collections import Counter
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import db, UserActivity, ClickDailySummary
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+EXPORT_COLUMNS = ('id', 'action', 'provider_name', 'currency_pair_viewed',
+                  'ip_address', 'user_agent', 'timestamp')
+# What the (unauthenticated) analytics endpoints return: no personal data
+PUBLIC_COLUMNS = ('id', 'action', 'provider_name', 'currency_pair_viewed', 'timestamp')
+
+
+def _activity_query(columns=EXPORT_COLUMNS, provider=None, currency_pair=None, since=None, until=None):
+    # columns must start with 'id' (the keyset)
+    query = select(*[getattr(UserActivity, name) for name in columns])
+    if provider:
+        query = query.where(UserActivity.provider_name == provider)
+    if currency_pair:
+        query = query.where(UserActivity.currency_pair_viewed == currency_pair)
+    if since:
+        query = query.where(UserActivity.timestamp >= since)
+    if until:
+        query = query.where(UserActivity.timestamp < until)
+    return query
+
+
+def fetch_activity_page(after_id=0, limit=DEFAULT_PAGE_SIZE, columns=EXPORT_COLUMNS, **filters):
+    """
+    One page of UserActivity rows with id > after_id, as dicts of `columns`.
+    Returns (rows, next_after_id); next_after_id is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = _activity_query(columns, **filters).where(UserActivity.id > after_id)\
+                                               .order_by(UserActivity.id).limit(limit)
+    rows = [_row_to_dict(row, columns) for row in db.session.execute(query)]
+    next_after_id = rows[-1]['id'] if len(rows) == limit else None
+    return rows, next_after_id
+
+
+def iter_activity(page_size=DEFAULT_PAGE_SIZE, columns=EXPORT_COLUMNS, **filters):
+    """Yields every matching row (as a tuple in `columns` order), one page at a time."""
+    last_id = 0
+    base_query = _activity_query(columns, **filters).order_by(UserActivity.id).limit(page_size)
+    while True:
+        page = db.session.execute(base_query.where(UserActivity.id > last_id)).all()
+        if not page:
+            return
+        yield from page
+        last_id = page[-1][0]
+        if len(page) < page_size:
+            return
+
+
+def _row_to_dict(row, columns=EXPORT_COLUMNS):
+    record = dict(zip(columns, row))
+    record['timestamp'] = record['timestamp'].isoformat()
+    return record
+
+
+def stream_ndjson(rows, columns=EXPORT_COLUMNS):
+    for row in rows:
+        yield json.dumps(_row_to_dict(row, columns)) + '\n'
+
+
+def stream_csv(rows, columns=EXPORT_COLUMNS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(_row_to_dict(row, columns).values())
+        # Hand each line off as soon as it's written so the buffer never grows
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
+
+
+# --- Daily summary ---
+
+def increment_click_summary(events):
+    """
+    Adds a batch of click events (UserActivity column dicts) to click_daily_summary
+    with one upsert. Call it in the same transaction as the UserActivity insert.
+    """
+    counts = Counter(
+        (event['timestamp'].strftime('%Y-%m-%d'), event.get('provider_name') or '',
+         event.get('currency_pair_viewed') or '')
+        for event in events
+    )
+    if not counts:
+        return
+    table = ClickDailySummary.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['day', 'provider_name', 'currency_pair'],
+        set_={'clicks': table.c.clicks + stmt.excluded.clicks}
+    )
+    db.session.execute(stmt, [
+        {'day': day, 'provider_name': provider, 'currency_pair': pair, 'clicks': clicks}
+        for (day, provider, pair), clicks in counts.items()
+    ])
+
+
+def rebuild_click_summary():
+    """Recomputes click_daily_summary from UserActivity (one-off backfill). Returns the row count."""
+    day = func.strftime('%Y-%m-%d', UserActivity.timestamp)
+    provider = func.coalesce(UserActivity.provider_name, '')
+    pair = func.coalesce(UserActivity.currency_pair_viewed, '')
+    aggregate = select(day, provider, pair, func.count())\
+        .where(UserActivity.action == 'register_click')\
+        .group_by(day, provider, pair)
+
+    db.session.execute(ClickDailySummary.__table__.delete())
+    db.session.execute(ClickDailySummary.__table__.insert().from_select(
+        ['day', 'provider_name', 'currency_pair', 'clicks'], aggregate))
+    db.session.commit()
+    return ClickDailySummary.query.count()
+
+
+def get_click_summary(provider=None, currency_pair=None, since_day=None, until_day=None):
+    """Summary rows filtered by provider/pair and an inclusive YYYY-MM-DD day range."""
+    query = ClickDailySummary.query
+    if provider:
+        query = query.filter(ClickDailySummary.provider_name == provider)
+    if currency_pair:
+        query = query.filter(ClickDailySummary.currency_pair == currency_pair)
+    if since_day:
+        query = query.filter(ClickDailySummary.day >= since_day)
+    if until_day:
+        query = query.filter(ClickDailySummary.day <= until_day)
+    return [row.to_dict() for row in query.order_by(ClickDailySummary.day, ClickDailySummary.provider_name)]
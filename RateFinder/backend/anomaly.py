@@ -0,0 +1,231 @@
+# Validation stage between fetching rates and writing them.
+# A bad tick (an inverted rate, a unit slip, a zero) would otherwise become the top
+# result of get_rates as soon as the refresh commits. Every fetched rate is checked:
+#   1. it must be a positive, finite number;
+#   2. when at least MIN_PEERS other providers quote the pair, it must lie within
+#      MEDIAN_BAND of the median of their rates in the same cycle (a peer missing from
+#      the cycle counts with its last accepted rate), so a move of the whole market
+#      passes while one provider's bad tick does not;
+#   3. otherwise, once the provider/pair has MIN_SAMPLES tick-to-tick returns, it must lie
+#      within max(Z_THRESHOLD volatilities, HISTORY_BAND) of the pair's EWMA (in log
+#      terms), where volatility is the running standard deviation of log returns.
+# Rejected rates are quarantined instead of written, and the last good rate keeps
+# being served (flagged stale once it ages). A rate the provider keeps repeating is
+# taken as its new level: after QUARANTINE_CONFIRMATIONS consecutive consistent ticks
+# for a check 3 failure, MEDIAN_CONFIRMATIONS for a check 2 failure (a provider that
+# really prices away from the others). Invalid rates are never promoted.
+#
+# State is O(1) per provider/pair: parallel stdlib arrays (8 bytes a value) indexed by
+# a slot per (provider_id, currency_pair), updated with Welford's algorithm and an
+# EWMA, so checking a cycle costs a few microseconds per rate.
+
+import logging
+import math
+import threading
+from array import array
+from bisect import bisect_left
+
+from .instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+MEDIAN_BAND = 0.10            # Max relative distance from the other providers' median
+MIN_PEERS = 2                 # Other providers needed before the median check applies
+HISTORY_BAND = 0.02           # Minimum relative band around the EWMA (quiet pairs have ~0 volatility)
+Z_THRESHOLD = 6.0             # Volatilities (std of log returns) a tick may move from the EWMA
+MIN_SAMPLES = 5               # Accepted tick-to-tick returns before the history check applies
+EWMA_ALPHA = 0.3
+QUARANTINE_CONFIRMATIONS = 3  # Consecutive consistent ticks that turn a history outlier into a new level
+MEDIAN_CONFIRMATIONS = 5      # Same for a provider that stays away from its peers' median
+
+INVALID = 'invalid'
+MEDIAN = 'median'
+HISTORY = 'history'
+
+rate_anomalies = registry.counter(
+    'ratefinder_rate_anomalies_total', 'Fetched rates rejected by the anomaly check, by reason',
+    ('provider', 'reason'))
+
+
+class RateValidator:
+    """
+    Rolling per provider/pair statistics and the accept/quarantine decision.
+
+    validate() takes the refresh job's (provider_id, currency_pair, rate) rows and
+    returns (accepted rows, rejections). Peers are compared using their rates in the
+    same cycle, falling back to the last accepted rate of peers the cycle didn't
+    fetch, so the order of rows within a cycle doesn't matter. prime() seeds the last
+    accepted rates (e.g. from exchange_rates) for that fallback after a restart.
+    """
+
+    def __init__(self, median_band=MEDIAN_BAND, min_peers=MIN_PEERS, history_band=HISTORY_BAND,
+                 z_threshold=Z_THRESHOLD, min_samples=MIN_SAMPLES, ewma_alpha=EWMA_ALPHA,
+                 quarantine_confirmations=QUARANTINE_CONFIRMATIONS, median_confirmations=MEDIAN_CONFIRMATIONS):
+        self.median_band = median_band
+        self.min_peers = min_peers
+        self.history_band = history_band
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.ewma_alpha = ewma_alpha
+        self.quarantine_confirmations = quarantine_confirmations
+        self.median_confirmations = median_confirmations
+        self._lock = threading.Lock()
+        self._slots = {}           # (provider_id, currency_pair) -> slot
+        self._pair_slots = {}      # currency_pair -> slots of the providers quoting it
+        self.primed = False
+        # Per slot: log returns seen, their Welford mean/M2, EWMA and last accepted rate
+        self._count = array('q')
+        self._mean = array('d')
+        self._m2 = array('d')
+        self._ewma = array('d')
+        self._last = array('d')
+        self._quarantine = {}      # slot -> [rate, consecutive confirmations, reason]
+        self.accepted = 0
+        self.rejected = 0
+        self.promoted = 0
+
+    def _slot(self, provider_id, currency_pair):
+        # Caller holds self._lock
+        slot = self._slots.get((provider_id, currency_pair))
+        if slot is None:
+            slot = self._slots[(provider_id, currency_pair)] = len(self._count)
+            self._pair_slots.setdefault(currency_pair, []).append(slot)
+            self._count.append(0)
+            self._mean.append(0.0)
+            self._m2.append(0.0)
+            self._ewma.append(0.0)
+            self._last.append(math.nan)
+        return slot
+
+    def _accept(self, slot, rate, reset_level=False):
+        # Caller holds self._lock
+        last = self._last[slot]
+        if math.isnan(last) or reset_level:
+            self._ewma[slot] = rate
+        else:
+            self._ewma[slot] += self.ewma_alpha * (rate - self._ewma[slot])
+            # Welford's update over log returns (a confirmed level shift is not a return)
+            log_return = math.log(rate / last)
+            n = self._count[slot] = self._count[slot] + 1
+            delta = log_return - self._mean[slot]
+            self._mean[slot] += delta / n
+            self._m2[slot] += delta * (log_return - self._mean[slot])
+        self._last[slot] = rate
+        self._quarantine.pop(slot, None)
+
+    def prime(self, rate_rows):
+        """Seeds last accepted rates from stored (provider_id, currency_pair, rate) rows."""
+        with self._lock:
+            for provider_id, currency_pair, rate in rate_rows:
+                slot = self._slot(provider_id, currency_pair)
+                if math.isnan(self._last[slot]) and rate is not None and rate > 0:
+                    self._last[slot] = rate
+                    self._ewma[slot] = rate
+            self.primed = True
+
+    def _median_excluding(self, rates, own):
+        # rates is sorted; own (this provider's rate in the list, or NaN) is left out by
+        # index arithmetic rather than copying the list
+        skip = bisect_left(rates, own) if not math.isnan(own) else len(rates)
+        count = len(rates) - (skip < len(rates))
+        if count < self.min_peers:
+            return None
+        middle = count // 2
+        upper = rates[middle + (middle >= skip)]
+        if count % 2:
+            return upper
+        return (rates[middle - 1 + (middle - 1 >= skip)] + upper) / 2
+
+    def _history_band(self, slot):
+        count = self._count[slot]
+        if count < self.min_samples:
+            return None
+        volatility = math.sqrt(self._m2[slot] / (count - 1)) if count > 1 else 0.0
+        return max(self.z_threshold * volatility, math.log1p(self.history_band))
+
+    def validate(self, rate_rows):
+        """
+        Splits rows into (accepted rows, rejections). A rejection is a dict with
+        provider_id, currency_pair, rate, reason and reference (the median or EWMA the
+        rate was compared to).
+        """
+        accepted = []
+        rejections = []
+        confirmations_needed = {HISTORY: self.quarantine_confirmations, MEDIAN: self.median_confirmations}
+        with self._lock:
+            slots = [self._slot(provider_id, currency_pair) for provider_id, currency_pair, _ in rate_rows]
+            valid = [isinstance(rate, (int, float)) and math.isfinite(rate) and rate > 0 for _, _, rate in rate_rows]
+            current = {slot: row[2] for slot, row, ok in zip(slots, rate_rows, valid) if ok}
+            # Peer medians use this cycle's rates (the last accepted one for a peer the
+            # cycle didn't fetch), sorted once per pair
+            last = self._last
+            peers = {}
+            for pair in {row[1] for row in rate_rows}:
+                rates = [current.get(slot, last[slot]) for slot in self._pair_slots[pair]]
+                peers[pair] = sorted(rate for rate in rates if rate == rate) # Drop NaN (never accepted)
+            for slot, ok, (provider_id, currency_pair, rate) in zip(slots, valid, rate_rows):
+                reason = reference = None
+                reset_level = False
+                if not ok:
+                    reason = INVALID
+                else:
+                    median = self._median_excluding(peers[currency_pair], current[slot])
+                    band = self._history_band(slot)
+                    moved = band is not None and abs(math.log(rate / self._ewma[slot])) > band
+                    if median is not None:
+                        if abs(rate / median - 1) > self.median_band:
+                            reason, reference = MEDIAN, median
+                        else:
+                            reset_level = moved # The market moved with it: a new level, not a return
+                    elif moved:
+                        reason, reference = HISTORY, self._ewma[slot]
+
+                if reason is None:
+                    self._accept(slot, rate, reset_level)
+                    accepted.append((provider_id, currency_pair, rate))
+                    continue
+
+                held = self._quarantine.get(slot)
+                if (reason != INVALID and held is not None and held[2] == reason
+                        and abs(math.log(rate / held[0])) <= math.log1p(self.history_band)):
+                    held[0] = rate
+                    held[1] += 1
+                    if held[1] >= confirmations_needed[reason]:
+                        self._accept(slot, rate, reset_level=True)
+                        accepted.append((provider_id, currency_pair, rate))
+                        self.promoted += 1
+                        continue
+                else:
+                    self._quarantine[slot] = [rate, 1, reason]
+                rejections.append({"provider_id": provider_id, "currency_pair": currency_pair, "rate": rate,
+                                   "reason": reason, "reference": reference})
+            self.accepted += len(accepted)
+            self.rejected += len(rejections)
+        return accepted, rejections
+
+    def stats(self, provider_names=None):
+        """Counters plus the quarantined rates (provider names from provider_names when given)."""
+        provider_names = provider_names or {}
+        with self._lock:
+            keys = {slot: key for key, slot in self._slots.items() if slot in self._quarantine}
+            return {
+                'tracked': len(self._slots),
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'promoted': self.promoted,
+                'quarantined': [
+                    {
+                        'provider': provider_names.get(keys[slot][0], keys[slot][0]),
+                        'currency_pair': keys[slot][1],
+                        'rate': rate,
+                        'confirmations': confirmations,
+                        'reason': reason,
+                        'last_accepted': None if math.isnan(self._last[slot]) else self._last[slot]
+                    }
+                    for slot, (rate, confirmations, reason) in sorted(self._quarantine.items())
+                ]
+            }
+
+
+# Shared by the refresh job (every instance validates what it fetches)
+rate_validator = RateValidator()
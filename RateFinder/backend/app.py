@@ -1,125 +1,418 @@
-from flask import Flask, jsonify, request
+import json
+import logging
+import math
+import os
+import click
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from .models import db, Provider, ExchangeRate, UserActivity # Import models
 from .models import init_app as init_db_app # Import the db initializer
+from .migrations import run_migrations, explain_query_plans
+from .seed import seed_database
+from .cache import rate_cache
+from .shared_cache import shared_rate_cache
+from .click_buffer import init_app as init_click_queue, get_click_queue
+from .history import get_history, prune_history, DEFAULT_MAX_POINTS, PRUNE_INTERVAL as HISTORY_PRUNE_INTERVAL
+from . import analytics
+from .broadcaster import rate_broadcaster
+from .circuit_breaker import provider_breakers
+from .anomaly import rate_validator
+from .freshness import rate_revalidator, refresh_job_name, stale_at as rate_stale_at, REVALIDATE_MIN_INTERVAL
+from .instrumentation import (registry as metrics_registry, PROMETHEUS_CONTENT_TYPE, configure_logging,
+                              instrument_flask_app, instrument_sqlalchemy_engine)
+from .scheduler import Scheduler, SQLiteJobLock
+from .change_feed import POLL_INTERVAL as CHANGE_POLL_INTERVAL
+from .utils import PROVIDER_APIS_CONFIG, DEFAULT_REFRESH_INTERVAL, update_all_rates_from_apis, sync_rate_changes
 
-app = Flask(__name__)
-CORS(app) # Enable CORS for all routes
+# NumPy-backed modules (rate_graph, quotes) are imported by the routes that use them, so
+# importing this module and creating the app stay cheap for processes that never serve them.
+
+logger = logging.getLogger(__name__)
 
-import os
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'ratefinder.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Initialize SQLAlchemy with the app
-init_db_app(app)
+# Routes and CLI commands; create_app() registers them on each app it builds
+api = Blueprint('api', __name__, cli_group=None)
+
+
+def create_app(config=None):
+    """
+    Builds a configured RateFinder app. config (a dict) overrides the settings read from
+    the environment. Nothing here touches the database: create the schema with
+    `flask --app backend.app db-upgrade` and seed it with `flask --app backend.app seed-db`.
+    """
+    configure_logging() # Level from RATEFINDER_LOG_LEVEL (default INFO)
+
+    flask_app = Flask(__name__)
+    CORS(flask_app) # Enable CORS for all routes
+
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'RATEFINDER_DATABASE_URI', 'sqlite:///' + os.path.join(basedir, 'ratefinder.db'))
+    flask_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Queue clicks and write them in batches instead of committing on the request thread
+    flask_app.config['CLICK_BUFFER_ENABLED'] = os.environ.get('RATEFINDER_CLICK_BUFFER', '1') != '0'
+    # Under gunicorn, set RATEFINDER_SCHEDULER=1 to refresh rates in the background
+    flask_app.config['RATE_SCHEDULER_ENABLED'] = os.environ.get('RATEFINDER_SCHEDULER') == '1'
+    # redis://... or memory:// to share rate snapshots between instances (see shared_cache.py)
+    flask_app.config['SHARED_CACHE_URL'] = os.environ.get('RATEFINDER_SHARED_CACHE_URL')
+    flask_app.config.update(config or {})
+
+    # Initialize SQLAlchemy with the app
+    init_db_app(flask_app)
+    init_click_queue(flask_app)
+    rate_revalidator.init_app(flask_app)
+    shared_rate_cache.init_app(flask_app)
+
+    # Per-route latency and per-request query counts/time, served on /metrics
+    instrument_flask_app(flask_app)
+    with flask_app.app_context():
+        instrument_sqlalchemy_engine(db.engine)
+
+    flask_app.register_blueprint(api)
+
+    if flask_app.config['RATE_SCHEDULER_ENABLED']:
+        start_rate_scheduler(flask_app)
+    return flask_app
+
+
+def _shared_app():
+    global app
+    if 'app' not in globals():
+        app = create_app()
+    return app
+
+
+def __getattr__(name):
+    """
+    The shared `app` (used by `flask --app backend.app`, gunicorn's backend.app:app and
+    the benchmarks) is created on first access rather than at import.
+    """
+    if name == 'app':
+        return _shared_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Dummy Data Setup ---
-# This function will initialize the database with some dummy data if it's empty.
-def init_db_with_data():
-    with app.app_context():
+# Creates/upgrades the schema and seeds the initial data (the db-upgrade and seed-db
+# commands in one step), for local runs and benchmarks.
+def init_db_with_data(flask_app=None):
+    flask_app = flask_app or _shared_app()
+    with flask_app.app_context():
         db.create_all() # Create tables if they don't exist
-
-        if Provider.query.count() == 0:
-            print("Populating database with initial provider data...")
-            providers_data = [
-                {"name": "TapTap Send", "registration_link": "https://www.taptapsend.com/"},
-                {"name": "Revolut", "registration_link": "https://www.revolut.com/"},
-                {"name": "Remitly", "registration_link": "https://www.remitly.com/"},
-                {"name": "Wise (TransferWise)", "registration_link": "https://wise.com/"}
-            ]
-            for p_data in providers_data:
-                provider = Provider(name=p_data['name'], registration_link=p_data['registration_link'])
-                db.session.add(provider)
-            db.session.commit()
-            print("Providers populated.")
-
-        if ExchangeRate.query.count() == 0:
-            print("Populating database with initial exchange rate data...")
-            taptap = Provider.query.filter_by(name="TapTap Send").first()
-            revolut = Provider.query.filter_by(name="Revolut").first()
-            remitly = Provider.query.filter_by(name="Remitly").first()
-            wise = Provider.query.filter_by(name="Wise (TransferWise)").first()
-
-            # Ensure providers exist before trying to use their IDs
-            if not all([taptap, revolut, remitly, wise]):
-                print("Error: Not all providers found. Skipping rate population.")
-                return
-
-            rates_data = [
-                {"provider_id": taptap.id, "currency_pair": "USD_EUR", "rate": 0.9210, "last_updated": datetime.utcnow()},
-                {"provider_id": revolut.id, "currency_pair": "USD_EUR", "rate": 0.9255, "last_updated": datetime.utcnow()},
-                {"provider_id": remitly.id, "currency_pair": "USD_EUR", "rate": 0.9180, "last_updated": datetime.utcnow()},
-                {"provider_id": wise.id, "currency_pair": "USD_EUR", "rate": 0.9230, "last_updated": datetime.utcnow()},
-                {"provider_id": taptap.id, "currency_pair": "USD_GBP", "rate": 0.7905, "last_updated": datetime.utcnow()},
-                {"provider_id": revolut.id, "currency_pair": "USD_GBP", "rate": 0.7950, "last_updated": datetime.utcnow()},
-                {"provider_id": remitly.id, "currency_pair": "USD_GBP", "rate": 0.7880, "last_updated": datetime.utcnow()},
-                {"provider_id": wise.id, "currency_pair": "USD_GBP", "rate": 0.7920, "last_updated": datetime.utcnow()},
-                {"provider_id": revolut.id, "currency_pair": "EUR_GBP", "rate": 0.8580, "last_updated": datetime.utcnow()},
-                {"provider_id": wise.id, "currency_pair": "EUR_GBP", "rate": 0.8590, "last_updated": datetime.utcnow()},
-            ]
-            for r_data in rates_data:
-                rate = ExchangeRate(**r_data)
-                db.session.add(rate)
-            db.session.commit()
-            print("Exchange rates populated.")
-        else:
-            print("Database already contains data.")
+        run_migrations(db.session) # Bring databases created by older versions up to date
+        seed_database()
 
 
-@app.route('/')
+@api.route('/')
 def home():
     return "RateFinder Backend is running!"
 
-@app.route('/api/currency-pairs', methods=['GET'])
+@api.route('/api/currency-pairs', methods=['GET'])
 def get_currency_pairs():
     try:
         pairs_query = db.session.query(ExchangeRate.currency_pair).distinct().all()
         pairs = [pair[0] for pair in pairs_query]
+        if request.args.get('include_derived') == '1':
+            # Add pairs only reachable through an inverse or a triangulated route
+            from .rate_graph import ensure_built as ensure_rate_graph
+
+            pairs = sorted(set(pairs) | set(ensure_rate_graph().reachable_pairs()))
         if not pairs:
             return jsonify(["USD_EUR", "USD_GBP", "EUR_GBP"]) # Fallback
         return jsonify(pairs)
-    except Exception as e:
-        # Log the error e
-        print(f"Error fetching currency pairs: {e}")
+    except Exception:
+        logger.exception("Error fetching currency pairs")
         return jsonify({"error": "Could not fetch currency pairs"}), 500
 
 
-@app.route('/api/rates/<currency_pair>', methods=['GET'])
+def _cached_json_response(cached):
+    """Turns a CachedResponse into a Flask response, answering 304 when the ETag matches."""
+    if cached.status == 200 and request.if_none_match.contains(cached.etag):
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, status=cached.status, mimetype='application/json')
+    response.set_etag(cached.etag)
+    return response
+
+
+def _load_rate_rows(currency_pair):
+    """
+    (provider, register_link, rate, last_updated) rows for a pair, cheapest first, and
+    whether they came from the shared cache's snapshot (otherwise this instance's SQLite).
+    """
+    snapshot = shared_rate_cache.read(currency_pair)
+    if snapshot is not None:
+        return snapshot.rows, True
+    rates_data = ExchangeRate.query.join(Provider)\
+                                   .filter(ExchangeRate.currency_pair == currency_pair)\
+                                   .order_by(ExchangeRate.rate)\
+                                   .all()
+    return [(er.provider.name, er.provider.registration_link, er.rate, er.last_updated) for er in rates_data], False
+
+
+@api.route('/api/rates/<currency_pair>', methods=['GET'])
 def get_rates(currency_pair):
-    try:
-        rates_data = ExchangeRate.query.join(Provider)\
-                                       .filter(ExchangeRate.currency_pair == currency_pair.upper())\
-                                       .order_by(ExchangeRate.rate)\
-                                       .all()
+    """
+    Rates for a pair, cheapest first. Rates older than their provider's freshness window
+    are still returned (last known good) with "stale": true, and a background refresh of
+    those providers is requested; the request itself never waits on an upstream.
+    """
+    cache_key = currency_pair.upper()
+    shared_rate_cache.sync_local(rate_cache) # Another instance may have published newer rates
+    cached = rate_cache.get(cache_key)
+    if cached is not None:
+        return _cached_json_response(cached)
 
-        if not rates_data:
-            return jsonify([]), 404
+    try:
+        # Read the version before querying so a refresh in between can't be cached over
+        cache_version = rate_cache.version
+        rate_rows, from_snapshot = _load_rate_rows(cache_key)
 
+        now = datetime.utcnow()
         result = []
-        for er in rates_data:
+        stale_providers = []
+        expires_at = None # When the first fresh rate in this response turns stale
+        for provider_name, register_link, rate, last_updated in rate_rows:
+            becomes_stale = rate_stale_at(provider_name, last_updated)
+            stale = becomes_stale <= now
+            if stale:
+                stale_providers.append(provider_name)
+            elif expires_at is None or becomes_stale < expires_at:
+                expires_at = becomes_stale
             result.append({
-                "provider": er.provider.name,
-                "rate": er.rate,
-                "register_link": er.provider.registration_link,
-                "last_updated": er.last_updated.isoformat()
+                "provider": provider_name,
+                "rate": rate,
+                "register_link": register_link,
+                "last_updated": last_updated.isoformat(),
+                "stale": stale
             })
-        return jsonify(result)
-    except Exception as e:
-        print(f"Error fetching rates for {currency_pair}: {e}")
+        if stale_providers:
+            if not from_snapshot: # Snapshot rates are refreshed by the elected refresher only
+                rate_revalidator.request(stale_providers)
+            # Look again once the revalidation has had a chance to land
+            retry_at = now + timedelta(seconds=REVALIDATE_MIN_INTERVAL)
+            expires_at = min(expires_at, retry_at) if expires_at else retry_at
+        status = 200 if result else 404
+        cached = rate_cache.put(cache_key, cache_version, current_app.json.dumps(result), status, stale_at=expires_at)
+        return _cached_json_response(cached)
+    except Exception:
+        logger.exception("Error fetching rates for %s", currency_pair)
         return jsonify({"error": f"Could not fetch rates for {currency_pair}"}), 500
 
-@app.route('/api/track-click', methods=['POST'])
+@api.route('/api/quotes/<currency_pair>', methods=['GET'])
+def get_quotes(currency_pair):
+    """
+    What the recipient gets from each provider for ?amount= (in the source currency)
+    after that provider's fee band, ranked by received amount rather than raw rate.
+    """
+    from .quotes import load_quote_table, quote_amount
+
+    try:
+        amount = float(request.args['amount'])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Pass a numeric ?amount= in the source currency"}), 400
+    if not (math.isfinite(amount) and amount > 0): # float() also accepts 'inf' and 'nan'
+        return jsonify({"error": "amount must be a positive, finite number"}), 400
+
+    try:
+        quotes = quote_amount(load_quote_table(currency_pair.upper()), amount)
+        if not quotes:
+            return jsonify({"error": f"No quotes for {currency_pair.upper()}"}), 404
+        return jsonify({"currency_pair": currency_pair.upper(), "amount": amount,
+                        "best": quotes[0], "quotes": quotes})
+    except Exception:
+        logger.exception("Error computing quotes for %s", currency_pair)
+        return jsonify({"error": f"Could not compute quotes for {currency_pair}"}), 500
+
+@api.route('/api/quotes/<currency_pair>/batch', methods=['GET', 'POST'])
+def get_quotes_batch(currency_pair):
+    """
+    Quotes many amounts in one call: POST {"amounts": [...]} or GET ?amounts=100,250,500.
+    received/fee are [provider][amount] matrices and ranking lists provider indices per
+    amount, best first.
+    """
+    from .quotes import load_quote_table, quote_amounts, MAX_BATCH_AMOUNTS
+
+    try:
+        if request.method == 'POST':
+            amounts = [float(a) for a in (request.get_json(silent=True) or {}).get('amounts', [])]
+        else:
+            amounts = [float(a) for a in request.args.get('amounts', '').split(',') if a.strip()]
+    except (TypeError, ValueError):
+        return jsonify({"error": "amounts must be numbers"}), 400
+    if (not amounts or len(amounts) > MAX_BATCH_AMOUNTS
+            or not all(math.isfinite(amount) and amount > 0 for amount in amounts)):
+        return jsonify({"error": f"Pass between 1 and {MAX_BATCH_AMOUNTS} positive, finite amounts"}), 400
+
+    try:
+        table = load_quote_table(currency_pair.upper())
+        if not table.providers:
+            return jsonify({"error": f"No quotes for {currency_pair.upper()}"}), 404
+        return jsonify(dict(quote_amounts(table, amounts), currency_pair=currency_pair.upper(), amounts=amounts))
+    except Exception:
+        logger.exception("Error computing batch quotes for %s", currency_pair)
+        return jsonify({"error": f"Could not compute quotes for {currency_pair}"}), 500
+
+def _parse_utc(value):
+    """
+    ISO-8601 timestamp -> naive UTC datetime (the form everything is stored in).
+    An offset, e.g. 2024-05-01T12:00:00+02:00, is converted; no offset means UTC.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@api.route('/api/rates/<currency_pair>/history', methods=['GET'])
+def get_rate_history(currency_pair):
+    """
+    Downsampled OHLC series per provider. Query params (all optional):
+    start/end as ISO-8601 timestamps, UTC unless they carry an offset (default: the
+    last 24 hours), points = maximum points per provider, provider = provider name.
+    """
+    try:
+        end = _parse_utc(request.args['end']) if 'end' in request.args else datetime.utcnow()
+        start = _parse_utc(request.args['start']) if 'start' in request.args else end - timedelta(days=1)
+        max_points = int(request.args.get('points', DEFAULT_MAX_POINTS))
+    except ValueError:
+        return jsonify({"error": "start/end must be ISO-8601 timestamps and points an integer"}), 400
+    if start >= end:
+        return jsonify({"error": "start must be before end"}), 400
+    if max_points < 1:
+        return jsonify({"error": "points must be a positive integer"}), 400
+
+    try:
+        providers = {p.id: p.name for p in Provider.query.all()}
+        provider_id = None
+        if 'provider' in request.args:
+            provider_id = next((pid for pid, name in providers.items() if name == request.args['provider']), None)
+            if provider_id is None:
+                return jsonify({"error": "Unknown provider"}), 404
+
+        resolution, series = get_history(currency_pair.upper(), start, end, max_points, provider_id)
+        return jsonify({
+            "currency_pair": currency_pair.upper(),
+            "resolution": resolution,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "series": [
+                {
+                    "provider": providers.get(pid),
+                    "points": [dict(point, bucket_start=datetime.utcfromtimestamp(point["bucket_start"]).isoformat())
+                               for point in points]
+                }
+                for pid, points in series.items()
+            ]
+        })
+    except Exception:
+        logger.exception("Error fetching rate history for %s", currency_pair)
+        return jsonify({"error": f"Could not fetch rate history for {currency_pair}"}), 500
+
+@api.route('/api/routes/<currency_pair>', methods=['GET'])
+def get_best_route(currency_pair):
+    """Best direct or triangulated route per provider, e.g. CAD->USD->EUR, best first."""
+    try:
+        source, target = currency_pair.upper().split('_')
+    except ValueError:
+        return jsonify({"error": "Currency pair must look like USD_EUR"}), 400
+
+    from .rate_graph import ensure_built as ensure_rate_graph
+
+    try:
+        routes = ensure_rate_graph().routes(source, target)
+        if not routes:
+            return jsonify({"error": f"No route found for {currency_pair.upper()}"}), 404
+
+        providers = {p.id: p for p in Provider.query.all()}
+        result = []
+        for route in routes:
+            provider = providers.get(route.pop("provider_id"))
+            if provider is None:
+                continue
+            result.append(dict(route, provider=provider.name, register_link=provider.registration_link))
+        return jsonify({
+            "currency_pair": currency_pair.upper(),
+            "best": result[0] if result else None,
+            "providers": result
+        })
+    except Exception:
+        logger.exception("Error computing routes for %s", currency_pair)
+        return jsonify({"error": f"Could not compute routes for {currency_pair}"}), 500
+
+SSE_HEARTBEAT_SECONDS = 15 # Comment line sent when idle so proxies keep the stream open
+SSE_MAX_PAIRS = 50
+
+@api.route('/api/stream/rates', methods=['GET'])
+def stream_rates():
+    """
+    Server-sent events with rate changes for ?pairs=USD_EUR,USD_GBP, pushed after each
+    refresh commits. Each 'rates' event carries only the providers whose rate changed.
+    A client that stops reading is evicted and receives an 'evicted' event.
+    """
+    pairs = {pair.strip().upper() for pair in request.args.get('pairs', '').split(',') if pair.strip()}
+    if not pairs or len(pairs) > SSE_MAX_PAIRS:
+        return jsonify({"error": f"Pass between 1 and {SSE_MAX_PAIRS} comma-separated pairs"}), 400
+
+    subscription = rate_broadcaster.subscribe(pairs)
+
+    def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except LookupError:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: rates\ndata: {json.dumps(event)}\n\n"
+        finally:
+            rate_broadcaster.unsubscribe(subscription)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/api/stream/stats', methods=['GET'])
+def get_stream_stats():
+    return jsonify(rate_broadcaster.stats())
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(rate_cache.stats())
+
+@api.route('/api/cache/shared/stats', methods=['GET'])
+def get_shared_cache_stats():
+    return jsonify(shared_rate_cache.stats())
+
+@api.route('/api/track-click', methods=['POST'])
 def track_click():
-    data = request.json
+    data = request.get_json(silent=True)
+    if data is None: # Malformed JSON or not a JSON request
+        return jsonify({"status": "error", "message": "Request body must be JSON"}), 400
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Request body must be a JSON object"}), 400
     provider_name = data.get('provider')
     currency_pair_viewed = data.get('currency_pair_viewed') # Optional from frontend
 
     if not provider_name:
         return jsonify({"status": "error", "message": "Provider name required"}), 400
 
+    if current_app.config['CLICK_BUFFER_ENABLED']:
+        accepted = get_click_queue().submit({
+            "action": 'register_click',
+            "provider_name": provider_name,
+            "currency_pair_viewed": currency_pair_viewed,
+            "ip_address": request.remote_addr,
+            "user_agent": request.user_agent.string,
+            "timestamp": datetime.utcnow()
+        })
+        if not accepted:
+            return jsonify({"status": "error", "message": "Click buffer full, try again later"}), 503
+        return jsonify({"status": "success", "message": "Click queued"}), 202
+
     try:
         activity = UserActivity(
             action='register_click',
@@ -129,16 +422,201 @@ def track_click():
             user_agent=request.user_agent.string
         )
         db.session.add(activity)
+        analytics.increment_click_summary([{
+            "provider_name": provider_name,
+            "currency_pair_viewed": currency_pair_viewed,
+            "timestamp": datetime.utcnow()
+        }])
         db.session.commit()
         return jsonify({"status": "success", "message": "Click tracked"}), 200
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error tracking click: {e}")
+        logger.exception("Error tracking click")
         return jsonify({"status": "error", "message": "Could not track click"}), 500
 
+@api.route('/api/track-click/stats', methods=['GET'])
+def get_click_stats():
+    return jsonify(get_click_queue().stats())
+
+
+def _activity_filters(args):
+    """Common provider/pair/time filters for the analytics endpoints (raises ValueError)."""
+    return {
+        "provider": args.get('provider'),
+        "currency_pair": args['pair'].upper() if args.get('pair') else None,
+        "since": _parse_utc(args['since']) if args.get('since') else None,
+        "until": _parse_utc(args['until']) if args.get('until') else None
+    }
+
+@api.route('/api/analytics/clicks', methods=['GET'])
+def list_clicks():
+    """
+    Keyset-paginated clicks: pass the returned next_after_id as after_id for the next page.
+    IP addresses and user agents are left out; use the export-clicks command for those.
+    """
+    try:
+        filters = _activity_filters(request.args)
+        after_id = int(request.args.get('after_id', 0))
+        limit = int(request.args.get('limit', analytics.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "Invalid filter or pagination parameter"}), 400
+    rows, next_after_id = analytics.fetch_activity_page(after_id, limit, analytics.PUBLIC_COLUMNS, **filters)
+    return jsonify({"clicks": rows, "next_after_id": next_after_id})
+
+@api.route('/api/analytics/clicks/export', methods=['GET'])
+def export_clicks():
+    """Streams every matching click as NDJSON (default) or CSV (?format=csv), without IPs or user agents."""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in analytics.EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {export_format}"}), 400
+    try:
+        filters = _activity_filters(request.args)
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO-8601 timestamps"}), 400
+
+    serializer, mimetype = analytics.EXPORT_FORMATS[export_format]
+    rows = analytics.iter_activity(columns=analytics.PUBLIC_COLUMNS, **filters)
+    response = Response(stream_with_context(serializer(rows, analytics.PUBLIC_COLUMNS)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=clicks.{export_format}'
+    return response
+
+@api.route('/api/analytics/clicks/summary', methods=['GET'])
+def get_click_summary():
+    """Daily click counts per provider/pair; since/until are inclusive YYYY-MM-DD days."""
+    pair = request.args.get('pair')
+    return jsonify(analytics.get_click_summary(
+        provider=request.args.get('provider'),
+        currency_pair=pair.upper() if pair else None,
+        since_day=request.args.get('since'),
+        until_day=request.args.get('until')
+    ))
+
+
+@api.cli.command('export-clicks')
+@click.option('--format', 'export_format', type=click.Choice(sorted(analytics.EXPORT_FORMATS)), default='ndjson')
+@click.option('--output', type=click.File('w'), default='-', help='Output file (default: stdout)')
+@click.option('--provider', default=None)
+@click.option('--pair', default=None)
+@click.option('--since', type=click.DateTime(), default=None)
+@click.option('--until', type=click.DateTime(), default=None)
+def export_clicks_command(export_format, output, provider, pair, since, until):
+    """Stream UserActivity clicks (including IP address and user agent) to a file in constant memory."""
+    serializer, _ = analytics.EXPORT_FORMATS[export_format]
+    rows = analytics.iter_activity(provider=provider, currency_pair=pair.upper() if pair else None,
+                                   since=since, until=until)
+    for chunk in serializer(rows):
+        output.write(chunk)
+
+@api.cli.command('rebuild-click-summary')
+def rebuild_click_summary_command():
+    """Recompute click_daily_summary from the full UserActivity table."""
+    count = analytics.rebuild_click_summary()
+    print(f"click_daily_summary rebuilt: {count} rows.")
+
+@api.cli.command('prune-history')
+def prune_history_command():
+    """Delete raw rate ticks and 1m/1h rollups past their retention windows."""
+    deleted = prune_history()
+    raw = deleted.pop('raw')
+    print(f"Pruned {raw} raw ticks, " + ", ".join(f"{count} {resolution} rollups" for resolution, count in deleted.items()))
+
+@api.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations."""
+    db.create_all()
+    applied = run_migrations(db.session)
+    print(f"Applied migrations: {applied}" if applied else "Database schema is up to date.")
+
+@api.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN QUERY PLAN every hot query and fail if one doesn't use its index."""
+    failures = 0
+    for name, plan, expected_index, ok in explain_query_plans(db.session):
+        print(f"[{'OK' if ok else 'FAIL'}] {name}: {plan}")
+        if not ok:
+            failures += 1
+            print(f"       expected index: {expected_index}")
+    if failures:
+        raise SystemExit(1)
+
+@api.cli.command('seed-db')
+def seed_db_command():
+    """Insert the initial providers, rates and fee schedules that are missing."""
+    inserted = seed_database()
+    print("Seeded: " + ", ".join(f"{count} {table}" for table, count in inserted.items()))
+
+@api.route('/api/scheduler/metrics', methods=['GET'])
+def get_scheduler_metrics():
+    rate_scheduler = current_app.extensions.get('rate_scheduler')
+    return jsonify(rate_scheduler.metrics() if rate_scheduler else {})
+
+
+@api.route('/api/providers/status', methods=['GET'])
+def get_provider_status():
+    """Circuit breaker state per provider, background revalidation counters and quarantined rates."""
+    provider_names = {p.id: p.name for p in Provider.query.all()}
+    return jsonify({
+        "circuit_breakers": provider_breakers.stats(),
+        "revalidation": rate_revalidator.stats(),
+        "anomalies": rate_validator.stats(provider_names)
+    })
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: route latency, DB query counts/time, provider fetch latency/failures."""
+    return Response(metrics_registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+# --- Background refresh ---
+def start_rate_scheduler(flask_app):
+    """
+    Starts one refresh job per configured provider on its own interval, plus the hourly
+    history prune. The jobs take a lease in the database, so every worker process can
+    call this and each job still runs in only one of them per interval. With the shared
+    cache, the refresh jobs instead take the elected refresher's lease across instances,
+    while the prune keeps the database lease: every instance prunes its own history.
+    Every worker also polls the change feed, so refreshes committed elsewhere reach its
+    response cache, route graph and stream subscribers.
+    """
+    rate_scheduler = flask_app.extensions.get('rate_scheduler')
+    if rate_scheduler is not None:
+        return rate_scheduler
+
+    db_uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+    db_path = db_uri[len('sqlite:///'):] if db_uri.startswith('sqlite:///') else ''
+    local_lock = SQLiteJobLock(db_path) if db_path else None # In-memory DBs can't be shared anyway
+    if shared_rate_cache.enabled:
+        lock = shared_rate_cache.leader_lock() # One refresher across all instances
+    else:
+        lock = local_lock
+
+    rate_scheduler = Scheduler(lock=lock)
+    for provider_name, config in PROVIDER_APIS_CONFIG.items():
+        def refresh(provider_name=provider_name):
+            with flask_app.app_context():
+                update_all_rates_from_apis(provider_names=[provider_name])
+        rate_scheduler.add_job(refresh_job_name(provider_name), refresh,
+                               interval=config.get('refresh_interval', DEFAULT_REFRESH_INTERVAL))
+
+    def prune():
+        with flask_app.app_context():
+            logger.info("Pruned rate history", extra=prune_history())
+    # Housekeeping of this instance's own database, whichever instance is the refresher
+    rate_scheduler.add_job('prune-history', prune, interval=HISTORY_PRUNE_INTERVAL,
+                           leased=local_lock is not None, lock=local_lock)
+
+    def sync_changes():
+        with flask_app.app_context():
+            sync_rate_changes()
+    rate_scheduler.add_job('sync-rate-changes', sync_changes, interval=CHANGE_POLL_INTERVAL, leased=False)
+    flask_app.extensions['rate_scheduler'] = rate_scheduler
+    rate_revalidator.lock = lock # Stale-rate revalidation takes the refresh jobs' leases
+    rate_scheduler.start()
+    return rate_scheduler
+
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        init_db_with_data()
+    app = create_app()
+    init_db_with_data(app)
+    start_rate_scheduler(app)
     app.run(debug=True, port=5000)
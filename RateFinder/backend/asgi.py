@@ -0,0 +1,276 @@
+# Optional async serving mode for the RateFinder API.
+# Serves the same routes and JSON shapes as app.py with async handlers over aiosqlite,
+# so a slow query waits on the event loop instead of holding a worker thread.
+#
+# Needs: pip install starlette aiosqlite uvicorn
+# Run from the RateFinder directory: uvicorn backend.asgi:app --port 5000
+# The database schema is still owned by the Flask app (flask --app backend.app db-upgrade).
+# Only stdlib-level modules of the backend are imported here (no Flask, Flask-SQLAlchemy
+# or the refresh job), and status codes follow app.py: clicks are buffered and answered
+# with 202 unless RATEFINDER_CLICK_BUFFER=0, and a malformed body is a 400.
+
+import asyncio
+import logging
+import os
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import aiosqlite
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from .migrations import SQLITE_PRAGMAS
+from .freshness import stale_at as rate_stale_at
+
+logger = logging.getLogger(__name__)
+
+READ_CONNECTIONS = 4
+FALLBACK_CURRENCY_PAIRS = ["USD_EUR", "USD_GBP", "EUR_GBP"]
+
+# Same switch and defaults as the Flask app's click buffer (app.py, click_buffer.py)
+CLICK_BUFFER_ENABLED = os.environ.get('RATEFINDER_CLICK_BUFFER', '1') != '0'
+CLICK_MAX_PENDING = 10000
+CLICK_BATCH_SIZE = 500
+CLICK_FLUSH_INTERVAL = 1.0
+
+INSERT_CLICK_SQL = ("INSERT INTO user_activity (action, provider_name, currency_pair_viewed, ip_address, user_agent, "
+                    "timestamp) VALUES (?, ?, ?, ?, ?, ?)")
+UPSERT_CLICK_SUMMARY_SQL = ("INSERT INTO click_daily_summary (day, provider_name, currency_pair, clicks) "
+                            "VALUES (?, ?, ?, ?) ON CONFLICT (day, provider_name, currency_pair) "
+                            "DO UPDATE SET clicks = clicks + excluded.clicks")
+
+
+def database_path():
+    """Same database as app.py: RATEFINDER_DATABASE_URI if set, else backend/ratefinder.db."""
+    uri = os.environ.get('RATEFINDER_DATABASE_URI')
+    if uri:
+        return uri[len('sqlite:///'):]
+    return os.path.join(os.path.abspath(os.path.dirname(__file__)), 'ratefinder.db')
+
+
+class AsyncDatabase:
+    """A few reader connections handed out through a queue, plus one serialized writer."""
+
+    def __init__(self, path, read_connections=READ_CONNECTIONS):
+        self.path = path
+        self.read_connections = read_connections
+        self._readers = asyncio.Queue()
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.path)
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def open(self):
+        for _ in range(self.read_connections):
+            self._readers.put_nowait(await self._connect())
+        self._writer = await self._connect()
+
+    async def close(self):
+        while not self._readers.empty():
+            await self._readers.get_nowait().close()
+        if self._writer is not None:
+            await self._writer.close()
+
+    async def fetchall(self, sql, params=()):
+        conn = await self._readers.get()
+        try:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def write(self, statements):
+        """Runs (sql, list of params) statements with executemany, in one transaction on the writer connection."""
+        async with self._write_lock:
+            try:
+                for sql, params_list in statements:
+                    await self._writer.executemany(sql, params_list)
+                await self._writer.commit()
+            except Exception:
+                await self._writer.rollback()
+                raise
+
+
+def click_statements(clicks):
+    """
+    The rows app.py writes for a batch of (provider, pair, ip, user agent, timestamp)
+    clicks: one user_activity row each plus their click_daily_summary counts.
+    """
+    summary = Counter((timestamp.strftime('%Y-%m-%d'), provider, pair or '')
+                      for provider, pair, _, _, timestamp in clicks)
+    return [
+        (INSERT_CLICK_SQL, [('register_click', provider, pair, ip_address, user_agent, timestamp.isoformat(sep=' '))
+                            for provider, pair, ip_address, user_agent, timestamp in clicks]),
+        (UPSERT_CLICK_SUMMARY_SQL, [key + (count,) for key, count in summary.items()]),
+    ]
+
+
+class AsyncClickBuffer:
+    """
+    Event-loop counterpart of click_buffer.ClickIngestQueue: clicks wait in a bounded
+    queue and one task writes them in batches, so a request never waits on the write
+    lock. submit() returns False when the queue is full (the route answers 503).
+    """
+
+    def __init__(self, db, max_pending=CLICK_MAX_PENDING, batch_size=CLICK_BATCH_SIZE,
+                 flush_interval=CLICK_FLUSH_INTERVAL):
+        self.db = db
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, click):
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            return False
+        self._pending.append(click)
+        self.accepted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self):
+        """Writes everything queued so far. Returns the number of clicks written."""
+        written = 0
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.batch_size))]
+            try:
+                await self.db.write(click_statements(batch))
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Error flushing %d click events", len(batch))
+                continue
+            self.written += len(batch)
+            written += len(batch)
+        return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stops the flush task and writes whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+database = AsyncDatabase(database_path())
+click_buffer = AsyncClickBuffer(database)
+
+
+async def home(request):
+    return PlainTextResponse("RateFinder Backend is running!")
+
+
+async def get_currency_pairs(request):
+    try:
+        rows = await database.fetchall("SELECT DISTINCT currency_pair FROM exchange_rates")
+        pairs = [row[0] for row in rows]
+        return JSONResponse(pairs or FALLBACK_CURRENCY_PAIRS)
+    except Exception:
+        logger.exception("Error fetching currency pairs")
+        return JSONResponse({"error": "Could not fetch currency pairs"}, status_code=500)
+
+
+async def get_rates(request):
+    currency_pair = request.path_params['currency_pair']
+    try:
+        rows = await database.fetchall(
+            "SELECT providers.name, exchange_rates.rate, providers.registration_link, exchange_rates.last_updated "
+            "FROM exchange_rates JOIN providers ON providers.id = exchange_rates.provider_id "
+            "WHERE exchange_rates.currency_pair = ? ORDER BY exchange_rates.rate",
+            (currency_pair.upper(),)
+        )
+        # Same "stale" flag as app.py; revalidation is left to the Flask app's refresh jobs
+        now = datetime.utcnow()
+        result = []
+        for name, rate, link, last_updated in rows:
+            # SQLAlchemy stores DateTime as 'YYYY-MM-DD HH:MM:SS.ffffff'; app.py returns isoformat()
+            last_updated = datetime.fromisoformat(last_updated)
+            result.append({"provider": name, "rate": rate, "register_link": link,
+                           "last_updated": last_updated.isoformat(),
+                           "stale": rate_stale_at(name, last_updated) <= now})
+        return JSONResponse(result, status_code=200 if result else 404)
+    except Exception:
+        logger.exception("Error fetching rates for %s", currency_pair)
+        return JSONResponse({"error": f"Could not fetch rates for {currency_pair}"}, status_code=500)
+
+
+async def track_click(request):
+    try:
+        data = await request.json()
+    except ValueError: # Malformed JSON or not UTF-8
+        return JSONResponse({"status": "error", "message": "Request body must be JSON"}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({"status": "error", "message": "Request body must be a JSON object"}, status_code=400)
+    provider_name = data.get('provider')
+    currency_pair_viewed = data.get('currency_pair_viewed') # Optional from frontend
+
+    if not provider_name:
+        return JSONResponse({"status": "error", "message": "Provider name required"}, status_code=400)
+
+    click = (provider_name, currency_pair_viewed, request.client.host if request.client else None,
+             request.headers.get('user-agent'), datetime.utcnow())
+    if CLICK_BUFFER_ENABLED:
+        if not click_buffer.submit(click):
+            return JSONResponse({"status": "error", "message": "Click buffer full, try again later"}, status_code=503)
+        return JSONResponse({"status": "success", "message": "Click queued"}, status_code=202)
+
+    try:
+        # Same rows the Flask app writes: the click plus its click_daily_summary count
+        await database.write(click_statements([click]))
+        return JSONResponse({"status": "success", "message": "Click tracked"})
+    except Exception:
+        logger.exception("Error tracking click")
+        return JSONResponse({"status": "error", "message": "Could not track click"}, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(asgi_app):
+    await database.open()
+    click_buffer.start()
+    yield
+    await click_buffer.stop()
+    await database.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/api/currency-pairs', get_currency_pairs, methods=['GET']),
+        Route('/api/rates/{currency_pair}', get_rates, methods=['GET']),
+        Route('/api/track-click', track_click, methods=['POST']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
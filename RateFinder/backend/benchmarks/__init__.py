@@ -0,0 +1,34 @@
+# Local benchmarks for the RateFinder backend.
+# Run from the RateFinder directory, e.g.: python -m backend.benchmarks.upsert
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from flask import Flask
+
+from ..models import init_app as init_db_app
+
+
+def make_benchmark_app(db_path=None):
+    """
+    Builds a throwaway Flask app bound to a temporary SQLite file so benchmarks
+    never touch the real ratefinder.db.
+    """
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='ratefinder-bench-', suffix='.db')
+        os.close(fd)
+    bench_app = Flask('ratefinder_benchmark')
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    bench_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db_app(bench_app)
+    return bench_app, db_path
+
+
+@contextmanager
+def timed(results, name):
+    """Records the wall time of the enclosed block in results[name] (seconds)."""
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
@@ -0,0 +1,59 @@
+# Fan-out benchmark for the SSE rate broadcaster (backend/broadcaster.py).
+# Subscribes N simulated clients spread over the supported pairs, publishes refresh
+# cycles, and reports publish time per cycle. A slice of clients never drains its
+# queue, to show that slow consumers get evicted instead of growing memory.
+# Usage: python -m backend.benchmarks.broadcast [--subscribers 10000] [--cycles 100]
+
+import argparse
+import time
+
+from ..broadcaster import RateBroadcaster
+from ..utils import SUPPORTED_CURRENCY_PAIRS
+
+
+def run(subscribers=10000, cycles=100, slow_fraction=0.05, max_queue=64):
+    broadcaster = RateBroadcaster(max_queue=max_queue)
+    subscriptions = [
+        broadcaster.subscribe([SUPPORTED_CURRENCY_PAIRS[i % len(SUPPORTED_CURRENCY_PAIRS)]])
+        for i in range(subscribers)
+    ]
+    slow_every = int(1 / slow_fraction) if slow_fraction else 0
+
+    publish_times = []
+    for cycle in range(cycles):
+        changes = {
+            pair: [{"provider": "Wise", "rate": 1.0 + cycle / 1000, "last_updated": None}]
+            for pair in SUPPORTED_CURRENCY_PAIRS
+        }
+        start = time.perf_counter()
+        broadcaster.publish(changes)
+        publish_times.append(time.perf_counter() - start)
+
+        # Fast clients drain everything after each cycle; slow ones never read
+        for i, subscription in enumerate(subscriptions):
+            if slow_every and i % slow_every == 0:
+                continue
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+
+    publish_times.sort()
+    return {
+        "subscribers": subscribers,
+        "cycles": cycles,
+        "publish_ms_mean": sum(publish_times) / len(publish_times) * 1000,
+        "publish_ms_p99": publish_times[min(len(publish_times) - 1, int(len(publish_times) * 0.99))] * 1000,
+        "stats": broadcaster.stats()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark SSE rate change fan-out')
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--slow-fraction', type=float, default=0.05)
+    args = parser.parse_args()
+
+    results = run(args.subscribers, args.cycles, args.slow_fraction)
+    print(f"{results['subscribers']} subscribers, {results['cycles']} publish cycles")
+    print(f"  publish fan-out: mean {results['publish_ms_mean']:.2f} ms, p99 {results['publish_ms_p99']:.2f} ms")
+    print(f"  broadcaster stats: {results['stats']}")
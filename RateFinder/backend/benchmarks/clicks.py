@@ -0,0 +1,72 @@
+# Load benchmark for POST /api/track-click, synchronous commits vs the buffered queue.
+# Usage: python -m backend.benchmarks.clicks [--requests 2000] [--threads 8]
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _drive(flask_app, total_requests, threads):
+    """Fires total_requests clicks from `threads` concurrent clients; returns requests/sec."""
+    per_thread = total_requests // threads
+
+    def client_loop(worker_id):
+        client = flask_app.test_client()
+        for i in range(per_thread):
+            client.post('/api/track-click', json={
+                "provider": f"Provider {i % 10}",
+                "currency_pair_viewed": "USD_EUR"
+            }, environ_base={'REMOTE_ADDR': f'10.0.0.{worker_id}'})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(client_loop, range(threads)))
+    return (per_thread * threads) / (time.perf_counter() - start)
+
+
+def run(total_requests=2000, threads=8):
+    fd, db_path = tempfile.mkstemp(prefix='ratefinder-bench-', suffix='.db')
+    os.close(fd)
+    # The shared app reads its database location when it is first created
+    os.environ['RATEFINDER_DATABASE_URI'] = 'sqlite:///' + db_path
+    from ..app import app
+    from ..click_buffer import get_click_queue
+    from ..models import db, UserActivity
+
+    results = {"requests": total_requests, "threads": threads}
+    try:
+        with app.app_context():
+            db.create_all()
+
+        app.config['CLICK_BUFFER_ENABLED'] = False
+        results["sync_rps"] = _drive(app, total_requests, threads)
+
+        app.config['CLICK_BUFFER_ENABLED'] = True
+        results["buffered_rps"] = _drive(app, total_requests, threads)
+        click_queue = get_click_queue(app)
+        start = time.perf_counter()
+        click_queue.flush()
+        results["final_flush_seconds"] = time.perf_counter() - start
+        results["queue"] = click_queue.stats()
+
+        with app.app_context():
+            results["rows_written"] = UserActivity.query.count()
+    finally:
+        os.remove(db_path)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark click tracking ingestion')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.threads)
+    print(f"{results['requests']} clicks from {results['threads']} threads")
+    print(f"  synchronous commit: {results['sync_rps']:10.1f} req/s")
+    print(f"  buffered queue:     {results['buffered_rps']:10.1f} req/s "
+          f"(final flush {results['final_flush_seconds'] * 1000:.1f} ms)")
+    print(f"  rows written: {results['rows_written']}, queue stats: {results['queue']}")
@@ -0,0 +1,51 @@
+# Counts the upstream requests one refresh cycle issues, per-pair vs batch endpoints,
+# by replaying the recorded fixtures in fixtures/providers (no network needed).
+# Usage: python -m backend.benchmarks.requests_per_cycle
+
+import time
+
+from ..adapters import FixtureSession
+from ..fetcher import fetch_rates_concurrently
+from ..utils import (PROVIDER_APIS_CONFIG, SUPPORTED_CURRENCY_PAIRS, fetch_batch_from_external_api,
+                     get_adapter, plan_provider_requests)
+
+
+def _per_pair_fetch(provider_name, pair, config=None, session=None, timeout=None):
+    return get_adapter(provider_name, config).fetch_rate(pair, session, timeout)
+
+
+def _run_cycle(plan):
+    session = FixtureSession()
+    start = time.perf_counter()
+    rates = fetch_rates_concurrently(plan, _per_pair_fetch, provider_configs=PROVIDER_APIS_CONFIG,
+                                     session=session, batch_fetch_fn=fetch_batch_from_external_api)
+    return session.request_count, time.perf_counter() - start, rates
+
+
+def run():
+    providers = list(PROVIDER_APIS_CONFIG)
+    per_pair_plan = {name: list(SUPPORTED_CURRENCY_PAIRS) for name in providers}
+    batch_plan = plan_provider_requests(providers, SUPPORTED_CURRENCY_PAIRS, fetch_mode='fixtures')
+
+    per_pair_requests, per_pair_seconds, per_pair_rates = _run_cycle(per_pair_plan)
+    batch_requests, batch_seconds, batch_rates = _run_cycle(batch_plan)
+    return {
+        "providers": len(providers),
+        "pairs": len(SUPPORTED_CURRENCY_PAIRS),
+        "per_pair_requests": per_pair_requests,
+        "batch_requests": batch_requests,
+        "per_pair_seconds": per_pair_seconds,
+        "batch_seconds": batch_seconds,
+        "rates_match": per_pair_rates == batch_rates,
+        "missing_rates": sorted(f"{p} {pair}" for (p, pair), rate in batch_rates.items() if rate is None)
+    }
+
+
+if __name__ == '__main__':
+    results = run()
+    print(f"{results['providers']} providers x {results['pairs']} pairs per cycle")
+    print(f"  per-pair requests: {results['per_pair_requests']}")
+    print(f"  batched requests:  {results['batch_requests']}")
+    print(f"  same rates from both plans: {results['rates_match']}")
+    if results['missing_rates']:
+        print(f"  missing: {results['missing_rates']}")
@@ -0,0 +1,134 @@
+# Load benchmark: the sync Flask server vs the async ASGI app (backend/asgi.py).
+# Starts both servers on a temporary copy of the seeded database, then drives
+# GET /api/rates/USD_EUR at several concurrency levels and reports requests/sec and p99.
+# Needs the optional async dependencies: pip install starlette aiosqlite uvicorn
+# Usage: python -m backend.benchmarks.serving [--concurrency 1 8 32] [--seconds 5]
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RATEFINDER_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _start_server(mode, port, env):
+    if mode == 'sync':
+        cmd = [sys.executable, '-m', 'flask', '--app', 'backend.app', 'run', '--port', str(port), '--with-threads']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'backend.asgi:app', '--port', str(port), '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, cwd=RATEFINDER_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_for_port(port)
+    return proc
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def drive(port, path, concurrency, seconds):
+    """Runs `concurrency` keep-alive clients for `seconds`. Returns (requests/sec, p50 ms, p99 ms, errors)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        local = []
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    raise RuntimeError(response.status)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    begin = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - begin
+
+    latencies.sort()
+    return (len(latencies) / elapsed, _percentile(latencies, 0.50) * 1000 if latencies else None,
+            _percentile(latencies, 0.99) * 1000 if latencies else None, errors[0])
+
+
+def run(concurrency_levels=(1, 8, 32), seconds=5.0, path='/api/rates/USD_EUR'):
+    fd, db_path = tempfile.mkstemp(prefix='ratefinder-bench-', suffix='.db')
+    os.close(fd)
+    env = dict(os.environ, RATEFINDER_DATABASE_URI='sqlite:///' + db_path)
+    # Seed through the Flask app in a child process so this process stays server-agnostic
+    subprocess.run([sys.executable, '-c', 'from backend.app import init_db_with_data; init_db_with_data()'],
+                   cwd=RATEFINDER_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    results = []
+    try:
+        for mode in ('sync', 'async'):
+            port = _free_port()
+            proc = _start_server(mode, port, env)
+            try:
+                for concurrency in concurrency_levels:
+                    rps, p50, p99, errors = drive(port, path, concurrency, seconds)
+                    results.append({"mode": mode, "concurrency": concurrency, "rps": rps,
+                                    "p50_ms": p50, "p99_ms": p99, "errors": errors})
+            finally:
+                proc.terminate()
+                proc.wait()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark sync vs async serving modes')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--path', default='/api/rates/USD_EUR')
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'conc':>5} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for row in run(args.concurrency, args.seconds, args.path):
+        print(f"{row['mode']:<6} {row['concurrency']:>5} {row['rps']:>10.1f} "
+              f"{row['p50_ms'] or 0:>9.2f} {row['p99_ms'] or 0:>9.2f} {row['errors']:>7}")
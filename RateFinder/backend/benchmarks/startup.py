@@ -0,0 +1,98 @@
+# Startup cost: how long a fresh process takes to import the backend, build the app and
+# answer its first request. Every measurement runs in a new interpreter so nothing is
+# already imported or cached. The import breakdown comes from `python -X importtime`,
+# which shows the modules that dominate `import backend.app`.
+# Usage: python -m backend.benchmarks.startup [--runs 5] [--top 15]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RATEFINDER_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run in the child: phase timings from interpreter start to the first response
+COLD_START_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import backend.app
+imported = time.perf_counter()
+flask_app = backend.app.create_app()
+created = time.perf_counter()
+response = flask_app.test_client().get(%r)
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "create_app_seconds": created - imported,
+                  "first_request_seconds": done - created, "total_seconds": done - start}))
+"""
+
+
+def _run_python(args, env=None):
+    return subprocess.run([sys.executable] + args, cwd=RATEFINDER_DIR, env=env or os.environ.copy(),
+                          capture_output=True, text=True, check=True)
+
+
+def import_profile(module='backend.app', top=15):
+    """
+    Parses `python -X importtime -c "import <module>"`. Returns the total import time in
+    seconds and the `top` slowest modules as (module, cumulative seconds, self seconds).
+    """
+    stderr = _run_python(['-X', 'importtime', '-c', f'import {module}']).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(cumulative_us) / 1e6, int(self_us) / 1e6))
+    total = next((cumulative for name, cumulative, _ in rows if name == module), None)
+    return total, sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def cold_start(db_uri, path='/api/rates/USD_EUR'):
+    """Phase timings (seconds) of one fresh process importing, creating the app and serving `path`."""
+    env = dict(os.environ, RATEFINDER_DATABASE_URI=db_uri)
+    return json.loads(_run_python(['-c', COLD_START_SCRIPT % path], env=env).stdout.strip().splitlines()[-1])
+
+
+def run(runs=5, top=15, path='/api/rates/USD_EUR'):
+    fd, db_path = tempfile.mkstemp(prefix='ratefinder-bench-', suffix='.db')
+    os.close(fd)
+    db_uri = 'sqlite:///' + db_path
+    env = dict(os.environ, RATEFINDER_DATABASE_URI=db_uri)
+    try:
+        for command in ('db-upgrade', 'seed-db'):
+            subprocess.run([sys.executable, '-m', 'flask', '--app', 'backend.app', command],
+                           cwd=RATEFINDER_DIR, env=env, check=True, capture_output=True)
+        samples = [cold_start(db_uri, path) for _ in range(runs)]
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    total, modules = import_profile(top=top)
+    return {
+        "runs": runs,
+        "phases": {phase: statistics.median(sample[phase] for sample in samples) for phase in samples[0]},
+        "import_seconds": total,
+        "slowest_imports": modules
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure RateFinder import time and first-request latency')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes to take the median over')
+    parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+    parser.add_argument('--path', default='/api/rates/USD_EUR')
+    args = parser.parse_args()
+
+    results = run(args.runs, args.top, args.path)
+    print(f"Cold start, median of {results['runs']} processes:")
+    for phase, seconds in results["phases"].items():
+        print(f"  {phase:<22} {seconds * 1000:>9.1f} ms")
+    print(f"\npython -X importtime, import backend.app: {results['import_seconds'] * 1000:.1f} ms")
+    print(f"  {'module':<40} {'cumulative ms':>14} {'self ms':>9}")
+    for name, cumulative, self_seconds in results["slowest_imports"]:
+        print(f"  {name:<40} {cumulative * 1000:>14.1f} {self_seconds * 1000:>9.1f}")
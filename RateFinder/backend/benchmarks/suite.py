@@ -0,0 +1,337 @@
+# Reproducible benchmark suite over a synthetic dataset (see synthetic.py).
+# Each scenario is timed asv-style: one warm-up call, then `repeat` rounds of `number`
+# calls, reporting per-call min/median/mean/stddev. Results go to a JSON file together
+# with the git commit and dataset spec, and --compare diffs two such files so a
+# regression between commits shows up locally.
+#
+# Usage (from the RateFinder directory):
+#   python -m backend.benchmarks.suite --output before.json
+#   ... change code ...
+#   python -m backend.benchmarks.suite --output after.json --compare before.json
+# Scale the dataset with --providers/--currencies/--pairs/--clicks; pick scenarios with --only.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .synthetic import DEFAULT_SPEC, build_database
+
+DEFAULT_REPEAT = 5
+DEFAULT_NUMBER = 20
+DEFAULT_THRESHOLD = 0.10 # Median slowdown reported as a regression by --compare
+
+SCENARIOS = {}
+
+
+def scenario(name, number=None):
+    """
+    Registers a scenario. The decorated function gets the suite context and returns the
+    callable to time (optionally with a teardown callable as a second value).
+    """
+    def register(setup):
+        SCENARIOS[name] = (setup, number)
+        return setup
+    return register
+
+
+class SuiteContext:
+    def __init__(self, flask_app, dataset, seed):
+        self.app = flask_app
+        self.client = flask_app.test_client()
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+
+    def random_pair(self):
+        return self.rng.choice(self.dataset["pairs"])
+
+    def random_provider(self):
+        return self.rng.choice(self.dataset["providers"])
+
+
+def _check(response):
+    if response.status_code >= 500:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}")
+    return response
+
+
+@scenario('get_rates_uncached')
+def bench_get_rates_uncached(ctx):
+    from ..cache import rate_cache
+    from ..freshness import rate_revalidator
+
+    # Rates that turn stale mid-run would start background refreshes writing to the
+    # database being measured; request() does nothing while no app is bound
+    saved = rate_revalidator.app
+    rate_revalidator.app = None
+
+    def call():
+        rate_cache.invalidate()
+        _check(ctx.client.get(f'/api/rates/{ctx.random_pair()}'))
+
+    def teardown():
+        rate_revalidator.app = saved
+    return call, teardown
+
+
+@scenario('get_rates_shared_snapshot')
+def bench_get_rates_uncached_shared(ctx):
+    from ..cache import rate_cache
+    from ..shared_cache import MemoryCacheBackend, shared_rate_cache
+    from ..utils import publish_rate_snapshots
+
+    # Every pair published as a snapshot, read back instead of querying SQLite
+    saved = shared_rate_cache.backend
+    shared_rate_cache.backend = MemoryCacheBackend()
+    with ctx.app.app_context():
+        publish_rate_snapshots(ctx.dataset["pairs"])
+
+    def call():
+        rate_cache.invalidate()
+        _check(ctx.client.get(f'/api/rates/{ctx.random_pair()}'))
+
+    def teardown():
+        shared_rate_cache.backend = saved
+    return call, teardown
+
+
+@scenario('get_rates_cached')
+def bench_get_rates_cached(ctx):
+    pair = ctx.random_pair()
+    _check(ctx.client.get(f'/api/rates/{pair}'))
+    return lambda: _check(ctx.client.get(f'/api/rates/{pair}'))
+
+
+@scenario('get_currency_pairs')
+def bench_get_currency_pairs(ctx):
+    return lambda: _check(ctx.client.get('/api/currency-pairs'))
+
+
+def _click_payload(ctx):
+    return {"provider": ctx.random_provider(), "currency_pair_viewed": ctx.random_pair()}
+
+
+@scenario('track_click_sync')
+def bench_track_click_sync(ctx):
+    ctx.app.config['CLICK_BUFFER_ENABLED'] = False
+    return lambda: _check(ctx.client.post('/api/track-click', json=_click_payload(ctx)))
+
+
+@scenario('track_click_buffered')
+def bench_track_click_buffered(ctx):
+    from ..click_buffer import get_click_queue
+
+    ctx.app.config['CLICK_BUFFER_ENABLED'] = True
+    return (lambda: _check(ctx.client.post('/api/track-click', json=_click_payload(ctx))),
+            get_click_queue(ctx.app).flush)
+
+
+@scenario('click_summary_by_provider')
+def bench_click_summary(ctx):
+    return lambda: _check(ctx.client.get('/api/analytics/clicks/summary',
+                                         query_string={'provider': ctx.random_provider()}))
+
+
+@scenario('click_page_by_provider')
+def bench_click_page(ctx):
+    return lambda: _check(ctx.client.get('/api/analytics/clicks',
+                                         query_string={'provider': ctx.random_provider(), 'limit': 1000}))
+
+
+@scenario('quote_single_amount')
+def bench_quote_single_amount(ctx):
+    return lambda: _check(ctx.client.get(f'/api/quotes/{ctx.random_pair()}', query_string={'amount': 750}))
+
+
+@scenario('quote_batch_200_amounts')
+def bench_quote_batch(ctx):
+    amounts = [10 * (i + 1) for i in range(200)]
+    return lambda: _check(ctx.client.post(f'/api/quotes/{ctx.random_pair()}/batch', json={'amounts': amounts}))
+
+
+@contextmanager
+def synthetic_upstream(dataset):
+    """
+    Points the refresh job at the synthetic providers: their configs, their pairs and an
+    in-process fetch function returning each provider's quoted rate with a small jitter.
+    """
+    from .. import utils
+
+    quoted = {(dataset["providers"][index], pair): rate for index, pair, rate in dataset["quotes"]}
+    rng = random.Random(0)
+
+    def fetch(provider_name, pair, config=None, session=None, timeout=None):
+        rate = quoted.get((provider_name, pair))
+        return None if rate is None else rate * (1 + rng.uniform(-0.001, 0.001))
+
+    saved = (utils.PROVIDER_APIS_CONFIG, utils.SUPPORTED_CURRENCY_PAIRS, utils.fetch_rate_from_external_api,
+             utils.FETCH_MODE)
+    utils.PROVIDER_APIS_CONFIG = {name: {"api_url": "synthetic://"} for name in dataset["providers"]}
+    utils.SUPPORTED_CURRENCY_PAIRS = list(dataset["pairs"])
+    utils.fetch_rate_from_external_api = fetch
+    utils.FETCH_MODE = 'simulate' # Plans per-pair requests without compiling adapters
+    try:
+        yield
+    finally:
+        (utils.PROVIDER_APIS_CONFIG, utils.SUPPORTED_CURRENCY_PAIRS, utils.fetch_rate_from_external_api,
+         utils.FETCH_MODE) = saved
+
+
+@scenario('refresh_cycle', number=1)
+def bench_refresh_cycle(ctx):
+    from ..utils import update_all_rates_from_apis
+
+    def call():
+        with synthetic_upstream(ctx.dataset), ctx.app.app_context():
+            update_all_rates_from_apis()
+    return call
+
+
+@scenario('anomaly_check_cycle', number=5)
+def bench_anomaly_check(ctx):
+    from ..anomaly import RateValidator
+
+    # One refresh cycle's worth of rates (every quote in the dataset) through the anomaly check
+    rng = random.Random(0)
+    base_rows = [(index + 1, pair, rate) for index, pair, rate in ctx.dataset["quotes"]]
+    validator = RateValidator()
+    validator.prime(base_rows)
+    cycles = [[(provider_id, pair, rate * (1 + rng.gauss(0, 0.001))) for provider_id, pair, rate in base_rows]
+              for _ in range(4)]
+    rows = itertools.cycle(cycles)
+    return lambda: validator.validate(next(rows))
+
+
+@scenario('cold_start_first_request', number=1)
+def bench_cold_start(ctx):
+    from .startup import cold_start
+
+    # A fresh interpreter per call: import, create_app and the first /api/rates response
+    return lambda: cold_start(ctx.app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+def _time_scenario(setup, ctx, repeat, number):
+    prepared = setup(ctx)
+    call, teardown = prepared if isinstance(prepared, tuple) else (prepared, None)
+    try:
+        call() # Warm-up: imports, first connection, query plan caches
+        per_call = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                call()
+            per_call.append((time.perf_counter() - start) / number)
+    finally:
+        if teardown is not None:
+            teardown()
+    median = statistics.median(per_call)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min": min(per_call),
+        "median": median,
+        "mean": statistics.fmean(per_call),
+        "stddev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "ops_per_sec": 1 / median if median else None
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(only=None, repeat=DEFAULT_REPEAT, number=DEFAULT_NUMBER, **spec_overrides):
+    """Builds the synthetic database, runs the scenarios and returns the results document."""
+    fd, db_path = tempfile.mkstemp(prefix='ratefinder-bench-', suffix='.db')
+    os.close(fd)
+    os.remove(db_path) # build_database wants a fresh file
+    spec = dict(DEFAULT_SPEC, **spec_overrides)
+    try:
+        _, dataset, load_timings = build_database(db_path, **spec)
+        # The shared app reads its database location when it is first created
+        os.environ['RATEFINDER_DATABASE_URI'] = 'sqlite:///' + db_path
+        from ..app import app
+
+        ctx = SuiteContext(app, dataset, spec["seed"])
+        results = {}
+        for name, (setup, scenario_number) in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            results[name] = _time_scenario(setup, ctx, repeat, scenario_number or number)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "spec": spec,
+        "load_seconds": load_timings,
+        "scenarios": results
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Rows of (scenario, baseline median, current median, ratio, regressed) for shared scenarios."""
+    rows = []
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else None
+        rows.append((name, before["median"], result["median"], ratio,
+                     ratio is not None and ratio > 1 + threshold))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the RateFinder benchmark suite on synthetic data')
+    parser.add_argument('--output', default='benchmark-results.json', help='JSON results file to write')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Median slowdown (fraction) that counts as a regression')
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), default=None)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--number', type=int, default=DEFAULT_NUMBER)
+    for key, value in DEFAULT_SPEC.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    document = run(args.only, args.repeat, args.number, **{key: getattr(args, key) for key in DEFAULT_SPEC})
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+
+    print(f"commit {document['commit']}, spec {document['spec']}")
+    print(f"{'scenario':<28} {'median ms':>10} {'min ms':>10} {'stddev ms':>10} {'ops/s':>10}")
+    for name, result in document["scenarios"].items():
+        print(f"{name:<28} {result['median'] * 1000:>10.3f} {result['min'] * 1000:>10.3f} "
+              f"{result['stddev'] * 1000:>10.3f} {result['ops_per_sec'] or 0:>10.1f}")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}):")
+        regressions = 0
+        for name, before, after, ratio, regressed in compare(baseline, document, args.threshold):
+            regressions += regressed
+            print(f"  {name:<28} {before * 1000:>10.3f} -> {after * 1000:>10.3f} ms "
+                  f"({ratio:.2f}x){'  REGRESSION' if regressed else ''}")
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,178 @@
+# Synthetic data generator for benchmarks.
+# Builds a RateFinder database with configurable numbers of providers, currencies and
+# pairs, plus any number of UserActivity clicks, deterministically from a seed.
+# Rows are bulk-loaded with sqlite3 executemany in large chunks (synchronous=OFF for
+# the load only) with the user_activity indexes rebuilt once at the end, so a million
+# clicks load in well under half a minute.
+# Usage: python -m backend.benchmarks.synthetic --db /tmp/synthetic.db [--clicks 1000000]
+
+import argparse
+import math
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from . import make_benchmark_app
+from ..models import db
+from ..migrations import run_migrations
+from ..analytics import rebuild_click_summary
+
+DEFAULT_SPEC = {
+    "providers": 50,
+    "currencies": 30,
+    "pairs": 200,
+    "coverage": 0.8,      # Fraction of pairs each provider quotes
+    "clicks": 100000,
+    "click_days": 30,     # Clicks are spread over this many days up to now
+    "seed": 42
+}
+
+LOAD_CHUNK_SIZE = 50000
+# Seeded first so the real pairs (USD_EUR, ...) exist in every synthetic dataset
+BASE_CURRENCIES = ["USD", "EUR", "GBP", "CAD"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0)",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X)",
+    "Mozilla/5.0 (Linux; Android 14)"
+]
+
+
+def currency_codes(count):
+    """BASE_CURRENCIES followed by generated three-letter codes (AAA, AAB, ...)."""
+    codes = list(BASE_CURRENCIES[:count])
+    index = 0
+    while len(codes) < count:
+        code = ''.join(chr(65 + (index // 26 ** power) % 26) for power in (2, 1, 0))
+        index += 1
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def generate_dataset(spec):
+    """
+    Pure-Python description of the dataset: provider names, currency pairs and the rate
+    each provider quotes. Rates come from one value per currency, so cross rates are
+    consistent (up to each provider's spread) and triangulated routes make sense.
+    """
+    rng = random.Random(spec["seed"])
+    currencies = currency_codes(spec["currencies"])
+    max_pairs = len(currencies) * (len(currencies) - 1)
+    if spec["pairs"] > max_pairs:
+        raise ValueError(f"{spec['currencies']} currencies allow at most {max_pairs} pairs")
+
+    pairs = [f"{a}_{b}" for a, b in (("USD", "EUR"), ("USD", "GBP"), ("EUR", "GBP"), ("CAD", "USD"))
+             if a in currencies and b in currencies][:spec["pairs"]]
+    seen = set(pairs)
+    while len(pairs) < spec["pairs"]:
+        source, target = rng.sample(currencies, 2)
+        pair = f"{source}_{target}"
+        if pair not in seen:
+            seen.add(pair)
+            pairs.append(pair)
+
+    value_in_usd = {code: math.exp(rng.gauss(0, 1.5)) for code in currencies}
+    value_in_usd["USD"] = 1.0
+    providers = [f"Synthetic Provider {i:04d}" for i in range(spec["providers"])]
+
+    quotes = [] # (provider index, pair, rate)
+    per_provider = max(1, int(len(pairs) * spec["coverage"]))
+    for provider_index in range(len(providers)):
+        spread = rng.uniform(-0.01, 0.01)
+        for pair in rng.sample(pairs, per_provider):
+            source, target = pair.split('_')
+            rate = value_in_usd[source] / value_in_usd[target] * (1 + spread + rng.uniform(-0.002, 0.002))
+            quotes.append((provider_index, pair, round(rate, 6)))
+    return {"currencies": currencies, "pairs": pairs, "providers": providers, "quotes": quotes}
+
+
+def _click_chunks(dataset, count, days, seed, chunk_size=LOAD_CHUNK_SIZE):
+    """UserActivity rows in lists of chunk_size, generated column-wise for speed."""
+    rng = random.Random(seed + 1)
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    span_us = int((now - start).total_seconds() * 1e6)
+    providers, pairs = dataset["providers"], dataset["pairs"]
+    while count > 0:
+        n = min(chunk_size, count)
+        count -= n
+        stamps = [(start + timedelta(microseconds=offset)).isoformat(sep=' ')
+                  for offset in sorted(rng.randrange(span_us) for _ in range(n))]
+        ips = [f"10.{bits >> 16}.{(bits >> 8) & 255}.{bits & 255}"
+               for bits in (rng.getrandbits(24) for _ in range(n))]
+        yield list(zip(['register_click'] * n, rng.choices(providers, k=n), rng.choices(pairs, k=n),
+                       ips, rng.choices(USER_AGENTS, k=n), stamps))
+
+
+def build_database(db_path, **overrides):
+    """
+    Creates the schema in db_path (which should be empty) and loads a synthetic dataset.
+    Returns (flask_app, dataset, timings) where timings holds the load time per table.
+    """
+    spec = dict(DEFAULT_SPEC, **overrides)
+    dataset = generate_dataset(spec)
+    bench_app, db_path = make_benchmark_app(db_path)
+    with bench_app.app_context():
+        db.create_all()
+        run_migrations(db.session)
+        db.engine.dispose() # Release pooled connections before the raw sqlite3 load
+
+    timings = {}
+    written_at = datetime.utcnow().isoformat(sep=' ')
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA synchronous=OFF")
+        start = time.perf_counter()
+        with conn:
+            conn.executemany("INSERT INTO providers (id, name, registration_link) VALUES (?, ?, ?)",
+                             [(i + 1, name, f"https://provider{i}.example.com/")
+                              for i, name in enumerate(dataset["providers"])])
+            conn.executemany("INSERT INTO exchange_rates (provider_id, currency_pair, rate, last_updated) "
+                             "VALUES (?, ?, ?, ?)",
+                             [(index + 1, pair, rate, written_at) for index, pair, rate in dataset["quotes"]])
+        timings["rates_seconds"] = time.perf_counter() - start
+
+        # Building the indexes once after the load beats maintaining them row by row
+        indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                               "AND tbl_name = 'user_activity' AND sql IS NOT NULL").fetchall()
+        start = time.perf_counter()
+        with conn:
+            for name, _ in indexes:
+                conn.execute(f"DROP INDEX {name}")
+        for chunk in _click_chunks(dataset, spec["clicks"], spec["click_days"], spec["seed"]):
+            with conn:
+                conn.executemany("INSERT INTO user_activity (action, provider_name, currency_pair_viewed, "
+                                 "ip_address, user_agent, timestamp) VALUES (?, ?, ?, ?, ?, ?)", chunk)
+        timings["clicks_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        with conn:
+            for _, create_sql in indexes:
+                conn.execute(create_sql)
+        timings["click_indexes_seconds"] = time.perf_counter() - start
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    start = time.perf_counter()
+    with bench_app.app_context():
+        rebuild_click_summary()
+    timings["click_summary_seconds"] = time.perf_counter() - start
+
+    dataset["spec"] = spec
+    return bench_app, dataset, timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a synthetic RateFinder database')
+    parser.add_argument('--db', required=True, help='Path of the (new) SQLite file to create')
+    for key, value in DEFAULT_SPEC.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    spec = {key: getattr(args, key) for key in DEFAULT_SPEC}
+    _, dataset, timings = build_database(args.db, **spec)
+    print(f"{len(dataset['providers'])} providers, {len(dataset['currencies'])} currencies, "
+          f"{len(dataset['pairs'])} pairs, {len(dataset['quotes'])} rates, {spec['clicks']} clicks")
+    print(f"  load times: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
@@ -0,0 +1,76 @@
+# Compares the per-row ORM write path with the bulk upsert used by the refresh job.
+# Usage: python -m backend.benchmarks.upsert [--providers 100] [--pairs 100]
+
+import argparse
+import os
+import random
+
+from . import make_benchmark_app, timed
+from ..models import db, Provider
+from ..utils import apply_rate_for_provider, bulk_upsert_exchange_rates
+
+
+def _seed_providers(count):
+    providers = [Provider(name=f"Provider {i}", registration_link=f"https://provider{i}.example.com/")
+                 for i in range(count)]
+    db.session.add_all(providers)
+    db.session.commit()
+    return providers
+
+
+def _pairs(count):
+    return [f"C{i:03d}_USD" for i in range(count)]
+
+
+def run(provider_count=100, pair_count=100):
+    results = {"rows": provider_count * pair_count}
+
+    # Per-row path: one SELECT plus one ORM add/mutation per provider/pair
+    bench_app, db_path = make_benchmark_app()
+    try:
+        with bench_app.app_context():
+            db.create_all()
+            providers = _seed_providers(provider_count)
+            pairs = _pairs(pair_count)
+            for phase in ("insert", "update"):
+                with timed(results, f"per_row_{phase}"):
+                    for provider in providers:
+                        for pair in pairs:
+                            apply_rate_for_provider(provider, pair, random.uniform(0.5, 1.5))
+                    db.session.commit()
+    finally:
+        os.remove(db_path)
+
+    # Bulk path: one existence query plus one executemany upsert
+    bench_app, db_path = make_benchmark_app()
+    try:
+        with bench_app.app_context():
+            db.create_all()
+            provider_ids = [provider.id for provider in _seed_providers(provider_count)]
+            pairs = _pairs(pair_count)
+            for phase in ("insert", "update"):
+                rows = [(provider_id, pair, random.uniform(0.5, 1.5))
+                        for provider_id in provider_ids for pair in pairs]
+                with timed(results, f"bulk_{phase}"):
+                    summary = bulk_upsert_exchange_rates(rows)
+                    db.session.commit()
+                results[f"bulk_{phase}_counts"] = {k: v for k, v in summary.items() if k != "changed"}
+    finally:
+        os.remove(db_path)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark exchange rate write paths')
+    parser.add_argument('--providers', type=int, default=100)
+    parser.add_argument('--pairs', type=int, default=100)
+    args = parser.parse_args()
+
+    results = run(args.providers, args.pairs)
+    print(f"Rows per phase: {results['rows']}")
+    for phase in ("insert", "update"):
+        per_row = results[f"per_row_{phase}"]
+        bulk = results[f"bulk_{phase}"]
+        print(f"  {phase:<6} per-row: {per_row:8.3f}s  bulk: {bulk:8.3f}s  speedup: {per_row / bulk:6.1f}x")
+        print(f"         bulk counts: {results[f'bulk_{phase}_counts']}")
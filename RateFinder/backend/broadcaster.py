@@ -0,0 +1,110 @@
+# In-process fan-out of rate changes to push subscribers (server-sent events).
+# The refresh job publishes the rows that changed after it commits; each subscriber
+# only receives changes for the currency pairs it asked for. Every subscriber has a
+# bounded queue, and one that falls too far behind is evicted instead of letting its
+# backlog grow without limit or slowing the publisher down.
+
+import itertools
+import queue
+import threading
+
+DEFAULT_QUEUE_SIZE = 64
+
+
+class Subscription:
+    def __init__(self, subscriber_id, pairs, max_queue):
+        self.id = subscriber_id
+        self.pairs = frozenset(pairs)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.evicted = False
+
+    def get(self, timeout=None):
+        """Next event dict, or None on timeout. Raises LookupError once evicted."""
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            event = None
+        if self.evicted and event is None:
+            raise LookupError("subscription evicted")
+        return event
+
+
+class RateBroadcaster:
+    """
+    Pair-indexed subscriber registry. publish() costs O(subscribers of the changed pairs)
+    and never blocks: a full subscriber queue means that client is evicted.
+    """
+
+    def __init__(self, max_queue=DEFAULT_QUEUE_SIZE):
+        self.max_queue = max_queue
+        self._by_pair = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    def subscribe(self, pairs):
+        subscription = Subscription(next(self._ids), pairs, self.max_queue)
+        with self._lock:
+            for pair in subscription.pairs:
+                self._by_pair.setdefault(pair, {})[subscription.id] = subscription
+            self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._remove(subscription)
+
+    def _remove(self, subscription):
+        removed = False
+        for pair in subscription.pairs:
+            subscribers = self._by_pair.get(pair)
+            if subscribers and subscribers.pop(subscription.id, None) is not None:
+                removed = True
+                if not subscribers:
+                    del self._by_pair[pair]
+        if removed:
+            self.subscribers -= 1
+
+    def publish(self, changes_by_pair):
+        """
+        changes_by_pair maps a currency pair to the list of changed rates for it.
+        Each interested subscriber gets one event per pair:
+        {'currency_pair': pair, 'changes': [...]}.
+        """
+        slow = []
+        with self._lock:
+            for pair, changes in changes_by_pair.items():
+                subscribers = self._by_pair.get(pair)
+                if not subscribers:
+                    continue
+                event = {'currency_pair': pair, 'changes': changes}
+                self.published += 1
+                for subscription in subscribers.values():
+                    try:
+                        subscription.queue.put_nowait(event)
+                        self.delivered += 1
+                    except queue.Full:
+                        slow.append(subscription)
+            for subscription in slow:
+                if not subscription.evicted:
+                    subscription.evicted = True
+                    self._remove(subscription)
+                    self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': self.subscribers,
+                'pairs_watched': len(self._by_pair),
+                'events_published': self.published,
+                'events_delivered': self.delivered,
+                'subscribers_evicted': self.evicted,
+                'max_queue': self.max_queue
+            }
+
+
+# Shared instance; the refresh job publishes into it and /api/stream/rates reads from it
+rate_broadcaster = RateBroadcaster()
@@ -0,0 +1,97 @@
+# In-process cache of serialized /api/rates/<currency_pair> responses.
+# Rates only change when the refresh job commits, so responses are cached until then
+# and the whole cache is swapped out in one step by invalidate(). An entry can also
+# carry a stale_at time: once a rate in it would be flagged stale, the body is out of
+# date even without a refresh, so the entry stops being served.
+
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+DEFAULT_MAX_ENTRIES = 256
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'status', 'etag', 'stale_at'], defaults=[None])
+
+
+class RateResponseCache:
+    """
+    Bounded LRU cache keyed by currency pair, holding ready-to-send JSON bodies.
+
+    Every entry belongs to a cache version. invalidate() bumps the version and replaces
+    the entry map atomically, and put() refuses entries computed against an older version,
+    so a response built from pre-refresh data can never be stored after the refresh.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stale_at is not None and datetime.utcnow() >= entry.stale_at:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body, status=200, stale_at=None):
+        """
+        Stores a serialized response and returns it as a CachedResponse.
+        version must be the value of .version read before the data was queried.
+        stale_at (naive UTC datetime) optionally expires the entry at that time.
+        """
+        # Content-only ETag: every worker serving the same body hands out the same tag,
+        # so a client's If-None-Match still matches behind a load balancer
+        etag = hashlib.blake2b(body.encode('utf-8'), digest_size=8).hexdigest()
+        entry = CachedResponse(body, status, etag, stale_at)
+        with self._lock:
+            if version != self._version:
+                return entry  # Data changed while we were building it; serve but don't keep
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self):
+        """Drops every entry; called after the refresh job commits new rates."""
+        with self._lock:
+            self._version += 1
+            self._entries = OrderedDict()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'expirations': self.expirations
+            }
+
+
+# Shared by the API routes and the refresh job
+rate_cache = RateResponseCache()
@@ -0,0 +1,101 @@
+# Cross-worker feed of committed rate refreshes.
+# Only the worker holding a refresh lease fetches and writes rates, but every worker
+# keeps in-memory views of them: the /api/rates response cache, the route graph and
+# the SSE subscribers. The refresh job appends a rate_refreshes row (the rows it
+# changed) in the same transaction as its upsert; every worker polls for rows newer
+# than the last one it applied and replays those it didn't write itself through the
+# same post-commit steps as the refresher (utils.sync_rate_changes).
+#
+# The poll is one primary-key range query, cheap enough to run every second. Rows
+# older than KEEP_REFRESHES versions are deleted by the writer; a worker that falls
+# further behind than that resyncs from exchange_rates instead.
+
+import json
+import logging
+import threading
+
+from sqlalchemy import delete, func, insert, select
+
+from .models import db, RateRefresh
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0     # Seconds between polls (a scheduler job in every worker)
+KEEP_REFRESHES = 1000   # Versions kept in rate_refreshes for workers that fall behind
+
+
+class RateChangeFeed:
+    """
+    Writer and reader side of rate_refreshes for one process.
+
+    record() is called by the refresh job before it commits and remembers the version
+    as written here, so poll() skips it. poll() returns the refreshes other processes
+    committed since the previous poll as (version, written_at, changed rows) tuples,
+    or None when rows were pruned before this process saw them (the caller resyncs).
+    """
+
+    def __init__(self, keep=KEEP_REFRESHES):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._own_versions = set()
+        self._last_seen = None
+        self.applied = 0
+        self.resyncs = 0
+
+    def record(self, changed_rows, written_at):
+        """Appends a refresh to the feed in the current session. The caller commits. Returns the version."""
+        version = db.session.execute(insert(RateRefresh).values(
+            written_at=written_at,
+            changed=json.dumps([list(row) for row in changed_rows])
+        )).inserted_primary_key[0]
+        db.session.execute(delete(RateRefresh).where(RateRefresh.version <= version - self.keep))
+        with self._lock:
+            self._own_versions.add(version)
+        return version
+
+    def forget(self, version):
+        """Drops a version recorded by a transaction that was rolled back."""
+        with self._lock:
+            self._own_versions.discard(version)
+
+    def poll(self):
+        """Refreshes committed by other processes since the last poll. Needs an app context."""
+        with self._poll_lock:
+            if self._last_seen is None:
+                # Views built from now on read the current rows; start after them
+                self._last_seen = db.session.execute(select(func.max(RateRefresh.version))).scalar() or 0
+                return []
+            rows = db.session.execute(
+                select(RateRefresh.version, RateRefresh.written_at, RateRefresh.changed)
+                .where(RateRefresh.version > self._last_seen)
+                .order_by(RateRefresh.version)
+            ).all()
+            if not rows:
+                return []
+            missed = rows[0].version > self._last_seen + 1
+            self._last_seen = rows[-1].version
+            with self._lock:
+                own = self._own_versions
+                self._own_versions = {version for version in own if version > self._last_seen}
+            if missed:
+                self.resyncs += 1
+                return None
+            refreshes = [
+                (version, written_at, [tuple(row) for row in json.loads(changed)])
+                for version, written_at, changed in rows if version not in own
+            ]
+            self.applied += len(refreshes)
+            return refreshes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'last_seen_version': self._last_seen,
+                'applied': self.applied,
+                'resyncs': self.resyncs
+            }
+
+
+# Shared instance; the refresh job records into it and the scheduler polls it
+rate_change_feed = RateChangeFeed()
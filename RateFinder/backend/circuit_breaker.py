@@ -0,0 +1,152 @@
+# Per-provider circuit breakers for the refresh job.
+# A provider whose fetches keep failing is "opened" and skipped for a cool-down period,
+# so a dead upstream stops costing a full timeout (plus retries) on every cycle. After
+# the cool-down a single trial fetch is let through ("half-open"); its outcome decides
+# whether the circuit closes again or stays open for another cool-down.
+#
+# Thresholds can be tuned per provider in PROVIDER_APIS_CONFIG:
+#   "failure_threshold": 3, "reset_timeout": 60.0
+
+import threading
+import time
+
+from .instrumentation import registry
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Exported on /metrics as a number so dashboards can graph it
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+DEFAULT_FAILURE_THRESHOLD = 3  # Consecutive failed fetches (after retries) that open the circuit
+DEFAULT_RESET_TIMEOUT = 60.0   # Seconds an open circuit waits before allowing a trial fetch
+
+circuit_state = registry.gauge(
+    'ratefinder_provider_circuit_state', 'Provider circuit breaker state: 0 closed, 1 half-open, 2 open',
+    ('provider',))
+circuit_transitions = registry.counter(
+    'ratefinder_provider_circuit_transitions_total', 'Provider circuit breaker state changes by new state',
+    ('provider', 'state'))
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one provider.
+
+    Callers ask allow() before each fetch and report the outcome with record_success()
+    or record_failure(). clock is injectable (like Scheduler's) so transitions can be
+    driven without sleeping.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.rejected = 0
+        circuit_state.set(STATE_VALUES[CLOSED], name)
+
+    def _transition(self, state):
+        # Caller holds self._lock
+        if state == self._state:
+            return
+        self._state = state
+        circuit_state.set(STATE_VALUES[state], self.name)
+        circuit_transitions.inc(self.name, state)
+
+    def _refresh_state(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+            self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh_state(self.clock())
+            return self._state
+
+    def allow(self):
+        """True if a fetch may go out now. In half-open state only one trial is let through."""
+        with self._lock:
+            self._refresh_state(self.clock())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            # A failed trial re-opens immediately; a closed circuit opens at the threshold
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._transition(OPEN)
+
+    def stats(self):
+        with self._lock:
+            now = self.clock()
+            self._refresh_state(now)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'retry_in_seconds': max(0.0, self._opened_at + self.reset_timeout - now)
+                                    if self._state == OPEN else None,
+                'rejected': self.rejected
+            }
+
+
+class ProviderBreakers:
+    """One CircuitBreaker per provider, created on first use from the provider's config."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider_name, config=None):
+        breaker = self._breakers.get(provider_name)
+        if breaker is None:
+            config = config or {}
+            with self._lock:
+                breaker = self._breakers.get(provider_name)
+                if breaker is None:
+                    breaker = self._breakers[provider_name] = CircuitBreaker(
+                        provider_name,
+                        failure_threshold=config.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD),
+                        reset_timeout=config.get('reset_timeout', DEFAULT_RESET_TIMEOUT),
+                        clock=self.clock
+                    )
+        return breaker
+
+    def is_open(self, provider_name):
+        """True while a provider is being skipped (half-open counts as not open)."""
+        breaker = self._breakers.get(provider_name)
+        return breaker is not None and breaker.state == OPEN
+
+    def stats(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+# Shared by the refresh job, stale-rate revalidation and /api/providers/status
+provider_breakers = ProviderBreakers()
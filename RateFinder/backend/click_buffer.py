@@ -0,0 +1,179 @@
+# Buffered ingestion for /api/track-click.
+# Click events are queued in memory and written by a background thread in batches,
+# so a request never waits on the SQLite write lock or an fsync.
+# Each app gets its own queue (init_app stores it in app.extensions), so events are
+# always written through the app that accepted them.
+
+import atexit
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+from flask import current_app
+
+from sqlalchemy import insert
+
+from .models import db, UserActivity
+from .analytics import increment_click_summary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 10000    # Hard cap on queued events (bounded memory)
+DEFAULT_BATCH_SIZE = 500       # Flush as soon as this many events are waiting...
+DEFAULT_FLUSH_INTERVAL = 1.0   # ...or after this many seconds, whichever comes first
+
+DROP_POLICIES = ('reject', 'drop_oldest')
+
+# Queues bound to an app; whatever they still hold is written at interpreter exit
+_bound_queues = weakref.WeakSet()
+
+
+class ClickIngestQueue:
+    """
+    Bounded in-memory queue of UserActivity rows flushed with one multi-row INSERT per batch.
+
+    When the queue is full the drop policy decides what happens: 'reject' refuses the
+    new event (the endpoint answers 503 so clients can back off), 'drop_oldest' discards
+    the oldest queued event to make room. Either way the loss is counted.
+    """
+
+    def __init__(self, flask_app=None, max_pending=DEFAULT_MAX_PENDING, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, drop_policy='reject'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.app = None
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped_oldest = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+        if flask_app is not None:
+            self.init_app(flask_app)
+
+    def init_app(self, flask_app):
+        self.app = flask_app
+        flask_app.extensions['click_queue'] = self
+        _bound_queues.add(self)
+
+    def submit(self, event):
+        """
+        Queues one UserActivity column dict. Returns False if it was rejected because
+        the queue is full.
+        """
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                if self.drop_policy == 'reject':
+                    self.rejected += 1
+                    return False
+                self._pending.popleft()
+                self.dropped_oldest += 1
+            self._pending.append(event)
+            self.accepted += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        self._ensure_worker()
+        return True
+
+    def flush(self):
+        """Writes everything queued so far. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    count = min(len(self._pending), self.batch_size)
+                    batch = [self._pending.popleft() for _ in range(count)]
+                if not batch:
+                    return written
+                written += self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(UserActivity).values(batch))
+                increment_click_summary(batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.failed += len(batch)
+                logger.exception("Error flushing %d click events", len(batch))
+                return 0
+        self.written += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None and not self._stopping:
+                    self._thread = threading.Thread(target=self._run, name='click-ingest', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def shutdown(self, timeout=5.0):
+        """Stops the worker and writes whatever is still queued."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.app is not None:
+            self.flush()
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'drop_policy': self.drop_policy,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'dropped_oldest': self.dropped_oldest,
+            'written': self.written,
+            'batches': self.batches,
+            'failed': self.failed
+        }
+
+
+def init_app(flask_app, **options):
+    """Creates flask_app's click queue (options as for ClickIngestQueue) and returns it."""
+    return ClickIngestQueue(flask_app, **options)
+
+
+def get_click_queue(flask_app=None):
+    """The click queue of flask_app, or of the current app."""
+    return (flask_app or current_app).extensions['click_queue']
+
+
+@atexit.register
+def _shutdown_bound_queues():
+    for queue in list(_bound_queues):
+        queue.shutdown()
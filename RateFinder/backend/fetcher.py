@@ -0,0 +1,179 @@
+# Concurrent fetch stage for the rate refresh job.
+# Every provider gets its own small set of worker "lanes" so a slow upstream only
+# delays its own pairs, and the whole cycle takes roughly as long as the slowest
+# provider instead of the sum of all of them.
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when a provider's entry in PROVIDER_APIS_CONFIG doesn't override them
+DEFAULT_MAX_CONCURRENCY = 4    # Parallel requests allowed against a single provider
+DEFAULT_TIMEOUT = 5.0          # Seconds per HTTP request
+DEFAULT_RETRIES = 2            # Extra attempts after the first failure
+DEFAULT_BACKOFF = 0.25         # Base delay (seconds) for exponential backoff
+MAX_WORKERS = 32               # Upper bound on threads used by a single cycle
+
+fetch_seconds = registry.histogram(
+    'ratefinder_provider_fetch_duration_seconds', 'Latency of each provider API call, including failed ones',
+    ('provider', 'kind'))
+fetch_attempts = registry.counter(
+    'ratefinder_provider_fetch_attempts_total', 'Provider API calls by outcome: ok, empty (no rate returned) or error',
+    ('provider', 'kind', 'outcome'))
+fetch_giveups = registry.counter(
+    'ratefinder_provider_fetch_giveups_total', 'Fetches that still failed after every retry', ('provider', 'kind'))
+fetch_skipped = registry.counter(
+    'ratefinder_provider_fetch_skipped_total', 'Fetches skipped because the provider circuit was open',
+    ('provider', 'kind'))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session(pool_size=MAX_WORKERS):
+    """
+    Returns the process-wide pooled HTTP session, creating it on first use.
+    Reusing one session keeps TCP/TLS connections alive between refresh cycles.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _provider_setting(config, key, default):
+    value = (config or {}).get(key)
+    return default if value is None else value
+
+
+def _fetch_with_retries(fetch_fn, provider_name, item, config, session):
+    """
+    Calls fetch_fn, retrying with exponential backoff (plus jitter) when it raises.
+    A None result means the provider has no rate for this item and is not retried.
+    Returns (result, succeeded); succeeded is False once every attempt has raised.
+    """
+    timeout = _provider_setting(config, 'timeout', DEFAULT_TIMEOUT)
+    retries = _provider_setting(config, 'retries', DEFAULT_RETRIES)
+    backoff = _provider_setting(config, 'backoff', DEFAULT_BACKOFF)
+
+    kind = 'batch' if isinstance(item, tuple) else 'pair'
+
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            result = fetch_fn(provider_name, item, config=config, session=session, timeout=timeout)
+        except Exception as e:
+            fetch_seconds.observe(time.perf_counter() - started, provider_name, kind)
+            fetch_attempts.inc(provider_name, kind, 'error')
+            if attempt == retries:
+                fetch_giveups.inc(provider_name, kind)
+                logger.warning("Giving up on %s - %s after %d attempts: %s", provider_name, item, attempt + 1, e,
+                               extra={'provider': provider_name, 'attempts': attempt + 1})
+                return None, False
+            logger.debug("Retrying %s - %s after error: %s", provider_name, item, e)
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+            continue
+        fetch_seconds.observe(time.perf_counter() - started, provider_name, kind)
+        fetch_attempts.inc(provider_name, kind, 'empty' if not result else 'ok')
+        return result, True
+
+
+def fetch_rates_concurrently(provider_pairs, fetch_fn, provider_configs=None, session=None,
+                             max_workers=MAX_WORKERS, deadline=None, batch_fetch_fn=None, breakers=None):
+    """
+    Fetches every (provider, pair) combination concurrently.
+
+    provider_pairs maps a provider name to the list of requests to make for it. Each
+    request is either a currency pair string or a tuple of pairs served by one batch call.
+    fetch_fn is called as fetch_fn(provider_name, pair, config=..., session=..., timeout=...)
+    and should return a float rate or None (raising triggers a retry). Tuples go to
+    batch_fetch_fn with the same signature, which returns {pair: rate or None}.
+    deadline optionally caps the wall time of the whole cycle in seconds; anything
+    still in flight at that point is reported as a failure.
+    breakers (a ProviderBreakers) optionally skips providers whose circuit is open and
+    is told about every fetch outcome; skipped requests are reported as failures.
+
+    Returns a dict of {(provider_name, pair): rate or None}.
+    """
+    provider_configs = provider_configs or {}
+    if session is None:
+        session = get_http_session()
+
+    results = {}
+    results_lock = threading.Lock()
+    stop = threading.Event()
+
+    def run_lane(provider_name, queue, config):
+        # Each lane drains the provider's queue; the number of lanes caps its concurrency
+        breaker = breakers.get(provider_name, config) if breakers is not None else None
+        while not stop.is_set():
+            try:
+                item = queue.popleft()
+            except IndexError:
+                return
+            is_batch = isinstance(item, tuple)
+            if breaker is not None and not breaker.allow():
+                # Left unset; the snapshot below reports it as a failure
+                fetch_skipped.inc(provider_name, 'batch' if is_batch else 'pair')
+                continue
+            result, succeeded = _fetch_with_retries(batch_fetch_fn if is_batch else fetch_fn,
+                                                    provider_name, item, config, session)
+            if breaker is not None:
+                if succeeded:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+            with results_lock:
+                if is_batch:
+                    for pair in item:
+                        results[(provider_name, pair)] = (result or {}).get(pair)
+                else:
+                    results[(provider_name, item)] = result
+
+    lanes = []
+    for provider_name, pairs in provider_pairs.items():
+        if not pairs:
+            continue
+        config = provider_configs.get(provider_name, {})
+        queue = deque(pairs)
+        lane_count = min(len(pairs), _provider_setting(config, 'max_concurrency', DEFAULT_MAX_CONCURRENCY))
+        lanes.extend((index, provider_name, queue, config) for index in range(lane_count))
+
+    if not lanes:
+        return results
+    # Interleave so every provider gets its first lane before any provider gets a second
+    lanes.sort(key=lambda lane: lane[0])
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(lanes)),
+                                  thread_name_prefix='rate-fetch')
+    try:
+        futures = [executor.submit(run_lane, *lane[1:]) for lane in lanes]
+        wait(futures, timeout=deadline)
+    finally:
+        stop.set()
+        # Don't block on stragglers past the deadline; their results are discarded
+        executor.shutdown(wait=deadline is None, cancel_futures=True)
+
+    with results_lock:
+        snapshot = dict(results)
+    for provider_name, items in provider_pairs.items():
+        for item in items:
+            for pair in (item if isinstance(item, tuple) else (item,)):
+                snapshot.setdefault((provider_name, pair), None)
+    return snapshot
@@ -0,0 +1,150 @@
+# Freshness of stored rates and background revalidation of stale ones.
+# A rate is stale once it is older than STALE_AFTER_INTERVALS refresh intervals of its
+# provider, i.e. at least one scheduled refresh failed or was skipped by the circuit
+# breaker. get_rates keeps serving it as the last known good value, flagged
+# "stale": true, and asks the revalidator to refresh that provider in the background
+# instead of fetching on the request thread. Revalidation takes the same lease as the
+# provider's scheduled refresh job, so it never runs beside (or outside) the refresher.
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from .circuit_breaker import provider_breakers
+from .provider_config import PROVIDER_APIS_CONFIG, DEFAULT_REFRESH_INTERVAL
+from .scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER_INTERVALS = 2         # Missed refreshes tolerated before a rate is flagged stale
+REVALIDATE_MIN_INTERVAL = 30.0    # Seconds between background refreshes of one provider
+
+
+def refresh_interval(provider_name):
+    """Seconds between scheduled refreshes of a provider."""
+    return PROVIDER_APIS_CONFIG.get(provider_name, {}).get('refresh_interval', DEFAULT_REFRESH_INTERVAL)
+
+
+def refresh_job_name(provider_name):
+    """Name of a provider's scheduled refresh job (and, via Scheduler.lease_name, of its lease)."""
+    return f"refresh:{provider_name}"
+
+
+def max_age(provider_name):
+    """How old a provider's rate may get before it counts as stale."""
+    return timedelta(seconds=refresh_interval(provider_name) * STALE_AFTER_INTERVALS)
+
+
+def stale_at(provider_name, last_updated):
+    """The (naive UTC) moment a rate written at last_updated becomes stale."""
+    return last_updated + max_age(provider_name)
+
+
+class RateRevalidator:
+    """
+    Runs update_all_rates_from_apis for stale providers on one background thread.
+
+    request() never blocks. A provider is skipped while a refresh for it is in flight,
+    if it was revalidated less than min_interval seconds ago, or while its circuit is
+    open (the breaker already knows the upstream is down). With a lock (set by
+    start_rate_scheduler to the scheduler's), a provider is only refreshed when this
+    process can take the lease of its refresh job; otherwise the worker holding it
+    owns that provider's refreshes.
+    """
+
+    def __init__(self, min_interval=REVALIDATE_MIN_INTERVAL, clock=time.monotonic, breakers=provider_breakers,
+                 lock=None):
+        self.app = None
+        self.min_interval = min_interval
+        self.clock = clock
+        self.breakers = breakers
+        self.lock = lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-revalidate')
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._last_started = {}
+        self.submitted = 0
+        self.skipped = 0
+        self.skipped_locked = 0
+        self.failures = 0
+
+    def init_app(self, flask_app):
+        self.app = flask_app
+
+    def request(self, provider_names):
+        """Schedules a background refresh of provider_names. Returns the names actually scheduled."""
+        if self.app is None:
+            return []
+        now = self.clock()
+        scheduled = []
+        with self._lock:
+            for name in sorted(set(provider_names)):
+                last = self._last_started.get(name)
+                if (name in self._in_flight or (last is not None and now - last < self.min_interval)
+                        or self.breakers.is_open(name)):
+                    self.skipped += 1
+                    continue
+                self._in_flight.add(name)
+                self._last_started[name] = now
+                scheduled.append(name)
+            if scheduled:
+                self.submitted += 1
+        if scheduled:
+            self._executor.submit(self._run, scheduled)
+        return scheduled
+
+    def _acquire_leases(self, provider_names):
+        """The providers whose refresh lease this process holds now."""
+        if self.lock is None:
+            return list(provider_names)
+        leased = []
+        for name in provider_names:
+            lease = Scheduler.lease_name(refresh_job_name(name))
+            if self.lock.acquire(lease, ttl=max(refresh_interval(name), 60)):
+                leased.append(name)
+            else:
+                self.skipped_locked += 1
+        return leased
+
+    def _run(self, provider_names):
+        from .utils import update_all_rates_from_apis # Keeps stale_at() importable without Flask (asgi.py)
+
+        leased = []
+        try:
+            leased = self._acquire_leases(provider_names)
+            if not leased:
+                return
+            started = time.time()
+            with self.app.app_context():
+                update_all_rates_from_apis(provider_names=leased)
+        except Exception:
+            self.failures += 1
+            logger.exception("Background revalidation of %s failed", provider_names)
+            if self.lock is not None:
+                for name in leased:
+                    self.lock.release(Scheduler.lease_name(refresh_job_name(name)))
+        else:
+            if self.lock is not None:
+                # Counts as the provider's refresh for this interval, like a scheduled run
+                for name in leased:
+                    self.lock.hold_until(Scheduler.lease_name(refresh_job_name(name)), started + refresh_interval(name))
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(provider_names)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': sorted(self._in_flight),
+                'revalidations_submitted': self.submitted,
+                'requests_skipped': self.skipped,
+                'skipped_locked': self.skipped_locked,
+                'failures': self.failures,
+                'min_interval_seconds': self.min_interval
+            }
+
+
+# Shared instance; get_rates asks it to refresh providers whose rates it served stale
+rate_revalidator = RateRevalidator()
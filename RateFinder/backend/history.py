@@ -0,0 +1,184 @@
+# Rate history: append-only raw ticks plus 1m/1h/1d OHLC rollups.
+# Rollups are updated in the same transaction as the refresh job's rate upsert, so
+# reading a downsampled series never has to touch (or aggregate) the raw history.
+
+import calendar
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import db, RateHistory, RateRollup
+
+# (name, bucket width in seconds), finest first
+RESOLUTIONS = (('1m', 60), ('1h', 3600), ('1d', 86400))
+DEFAULT_MAX_POINTS = 500
+MAX_POINTS_LIMIT = 2000
+RAW_HISTORY_RETENTION_DAYS = 30
+# Fine rollups are pruned like the raw ticks; '1d' rollups are kept forever
+ROLLUP_RETENTION_DAYS = {'1m': 7, '1h': 365}
+PRUNE_INTERVAL = 3600 # Seconds between scheduled prune_history runs
+# A query may read up to this many rollup buckets per returned point before it
+# switches to the next coarser resolution; this bounds rows read per provider.
+MAX_BUCKETS_PER_POINT = 4
+
+
+def to_epoch(dt):
+    """Naive UTC datetime -> Unix epoch seconds."""
+    return calendar.timegm(dt.utctimetuple())
+
+
+def record_rates(rate_rows, recorded_at=None):
+    """
+    Appends one tick per (provider_id, currency_pair, rate) row and folds it into the
+    rollups for every resolution. The caller commits the session.
+    """
+    rate_rows = list(rate_rows)
+    if not rate_rows:
+        return
+    ts = to_epoch(recorded_at or datetime.utcnow())
+
+    raw_stmt = sqlite_insert(RateHistory.__table__).on_conflict_do_nothing()
+    db.session.execute(raw_stmt, [
+        {"currency_pair": pair, "provider_id": provider_id, "recorded_at": ts, "rate": rate}
+        for provider_id, pair, rate in rate_rows
+    ])
+
+    rollups = RateRollup.__table__
+    stmt = sqlite_insert(rollups)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["resolution", "currency_pair", "provider_id", "bucket_start"],
+        set_={
+            # open keeps the first tick of the bucket; close always takes the latest
+            "high": func.max(rollups.c.high, stmt.excluded.high),
+            "low": func.min(rollups.c.low, stmt.excluded.low),
+            "close": stmt.excluded.close,
+            "sample_count": rollups.c.sample_count + 1
+        }
+    )
+    params = []
+    for resolution, width in RESOLUTIONS:
+        bucket_start = ts - ts % width
+        for provider_id, pair, rate in rate_rows:
+            params.append({
+                "resolution": resolution,
+                "currency_pair": pair,
+                "provider_id": provider_id,
+                "bucket_start": bucket_start,
+                "open": rate, "high": rate, "low": rate, "close": rate,
+                "sample_count": 1
+            })
+    db.session.execute(stmt, params)
+
+
+def prune_raw_history(retention_days=RAW_HISTORY_RETENTION_DAYS, now=None):
+    """Deletes raw ticks older than the retention window. Returns the number removed."""
+    cutoff = to_epoch(now or datetime.utcnow()) - retention_days * 86400
+    deleted = RateHistory.query.filter(RateHistory.recorded_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def prune_rollups(retention_days=None, now=None):
+    """
+    Deletes rollup buckets older than their resolution's retention window
+    (ROLLUP_RETENTION_DAYS by default). Returns {resolution: rows removed}.
+    """
+    retention_days = ROLLUP_RETENTION_DAYS if retention_days is None else retention_days
+    now_ts = to_epoch(now or datetime.utcnow())
+    deleted = {}
+    for resolution, days in retention_days.items():
+        deleted[resolution] = RateRollup.query.filter(
+            RateRollup.resolution == resolution,
+            RateRollup.bucket_start < now_ts - days * 86400
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def prune_history(now=None):
+    """
+    Applies every retention window: raw ticks and the fine rollups. Run by the
+    scheduler every PRUNE_INTERVAL seconds and by `flask --app backend.app prune-history`.
+    Returns {'raw': rows removed, resolution: rows removed, ...}.
+    """
+    deleted = {'raw': prune_raw_history(now=now)}
+    deleted.update(prune_rollups(now=now))
+    return deleted
+
+
+def choose_resolution(start_ts, end_ts, max_points, now_ts=None):
+    """
+    Finest resolution that needs at most MAX_BUCKETS_PER_POINT buckets per point
+    over the range (else the coarsest). With now_ts, resolutions whose retention
+    window no longer reaches back to start_ts are skipped.
+    """
+    span = max(end_ts - start_ts, 1)
+    for resolution, width in RESOLUTIONS:
+        retention_days = ROLLUP_RETENTION_DAYS.get(resolution)
+        if now_ts is not None and retention_days is not None and start_ts < now_ts - retention_days * 86400:
+            continue
+        if span / width <= max_points * MAX_BUCKETS_PER_POINT:
+            return resolution, width
+    return RESOLUTIONS[-1]
+
+
+def _merge_buckets(rows, start_ts, step):
+    """Merges consecutive OHLC rows into buckets of `step` seconds aligned to start_ts."""
+    merged = []
+    current_key = None
+    for row in rows:
+        key = (row.bucket_start - start_ts) // step
+        if key != current_key:
+            current_key = key
+            merged.append({
+                "bucket_start": start_ts + key * step,
+                "open": row.open, "high": row.high, "low": row.low, "close": row.close,
+                "sample_count": row.sample_count
+            })
+        else:
+            point = merged[-1]
+            point["high"] = max(point["high"], row.high)
+            point["low"] = min(point["low"], row.low)
+            point["close"] = row.close
+            point["sample_count"] += row.sample_count
+    return merged
+
+
+def get_history(currency_pair, start, end, max_points=DEFAULT_MAX_POINTS, provider_id=None):
+    """
+    Returns (resolution, {provider_id: [points]}) for the pair between start and end
+    (naive UTC datetimes), with at most max_points OHLC points per provider.
+
+    Reads only rollup rows, so the cost is bounded by range / resolution rather than
+    by how many raw ticks exist. Adjacent buckets are merged in memory when the chosen
+    resolution yields more than max_points.
+    """
+    max_points = max(1, min(max_points, MAX_POINTS_LIMIT))
+    start_ts, end_ts = to_epoch(start), to_epoch(end)
+    resolution, width = choose_resolution(start_ts, end_ts, max_points, to_epoch(datetime.utcnow()))
+
+    query = RateRollup.query.filter(
+        RateRollup.resolution == resolution,
+        RateRollup.currency_pair == currency_pair,
+        RateRollup.bucket_start >= start_ts - start_ts % width,
+        RateRollup.bucket_start <= end_ts
+    )
+    if provider_id is not None:
+        query = query.filter(RateRollup.provider_id == provider_id)
+
+    rows_by_provider = {}
+    for row in query.order_by(RateRollup.provider_id, RateRollup.bucket_start):
+        rows_by_provider.setdefault(row.provider_id, []).append(row)
+
+    # Buckets per point needed to stay within max_points
+    span_buckets = (end_ts - start_ts) // width + 1
+    factor = max(1, -(-span_buckets // max_points))
+    aligned_start = start_ts - start_ts % width
+    series = {
+        pid: _merge_buckets(rows, aligned_start, width * factor)
+        for pid, rows in rows_by_provider.items()
+    }
+    if factor > 1:
+        resolution = f"{factor}x{resolution}"
+    return resolution, series
@@ -0,0 +1,310 @@
+# Lightweight instrumentation shared by RateFinder and currency_exchange.
+# Counters, gauges and histograms live in a process-wide registry and are rendered in the
+# Prometheus text exposition format on /metrics. The Flask, SQLAlchemy and sqlite3
+# hooks are opt-in helpers that import their framework lazily, so this module stays
+# standard library only (like scheduler.py).
+#
+# Logging: configure_logging() sets up key=value log lines for this package's logger at
+# the level given by RATEFINDER_LOG_LEVEL (default INFO), once; the root logger is left
+# to the host application. Hot paths log at DEBUG with %-style arguments,
+# so a disabled level costs one isEnabledFor() check and no string formatting.
+
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LOG_LEVEL_ENV = 'RATEFINDER_LOG_LEVEL'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values (passed positionally)."""
+
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in values]
+
+
+class Gauge:
+    """Value that can go up and down, optionally split by label values (passed positionally)."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by label values (passed positionally)."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        with self._lock:
+            snapshot = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        lines = []
+        for labels, (bucket_counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics for one process. counter()/gauge()/histogram() return the existing metric on repeat calls."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type_name}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type_name}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# --- Flask / database hooks ---
+
+def instrument_flask_app(flask_app, metrics=registry):
+    """
+    Records per-route latency plus the number of database statements (and, for
+    SQLAlchemy, their time) issued while serving each request. Routes are labelled by
+    their URL rule, e.g. /api/rates/<currency_pair>, so label cardinality stays bounded.
+    """
+    from flask import g, request
+
+    request_seconds = metrics.histogram(
+        'http_request_duration_seconds', 'Time spent serving HTTP requests', ('method', 'route', 'status'))
+    queries_per_request = metrics.histogram(
+        'http_request_db_queries', 'Database statements executed per HTTP request', ('route',),
+        buckets=QUERY_COUNT_BUCKETS)
+    query_seconds_per_request = metrics.histogram(
+        'http_request_db_seconds', 'Time spent in database statements per HTTP request', ('route',))
+
+    @flask_app.before_request
+    def _start_request_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_db_queries = 0
+        g._metrics_db_seconds = 0.0
+
+    @flask_app.after_request
+    def _record_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            request_seconds.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+            queries_per_request.observe(g.pop('_metrics_db_queries', 0), route)
+            query_seconds_per_request.observe(g.pop('_metrics_db_seconds', 0.0), route)
+        return response
+
+
+def _record_request_query(elapsed):
+    from flask import g, has_request_context
+
+    if has_request_context() and '_metrics_started' in g:
+        g._metrics_db_queries += 1
+        if elapsed is not None:
+            g._metrics_db_seconds += elapsed
+
+
+def instrument_sqlalchemy_engine(engine, metrics=registry):
+    """Counts and times every statement on `engine` via SQLAlchemy cursor events."""
+    from sqlalchemy import event
+
+    queries_total = metrics.counter('db_queries_total', 'Database statements executed')
+    query_seconds = metrics.histogram('db_query_duration_seconds', 'Time spent per database statement')
+
+    # The start time lives on the statement's execution context, which is discarded with
+    # the statement, so one that raises (and never reaches after_cursor_execute) leaves
+    # nothing behind on the pooled connection
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_query_start', None)
+        elapsed = time.perf_counter() - started if started is not None else None
+        queries_total.inc()
+        if elapsed is not None:
+            query_seconds.observe(elapsed)
+        _record_request_query(elapsed)
+
+
+def instrument_sqlite_connection(conn, metrics=registry):
+    """
+    Counts statements on a raw sqlite3 connection through its trace callback. sqlite3
+    does not report statement time, so only counts are recorded.
+    """
+    queries_total = metrics.counter('db_queries_total', 'Database statements executed')
+
+    def _trace(statement):
+        queries_total.inc()
+        _record_request_query(None)
+
+    conn.set_trace_callback(_trace)
+    return conn
+
+
+# --- Logging ---
+
+_STANDARD_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    One line per record: timestamp, level, logger and message, followed by any
+    fields passed through `extra=` as key=value pairs.
+    """
+
+    def format(self, record):
+        line = (f"ts={self.formatTime(record)} level={record.levelname.lower()} "
+                f"logger={record.name} msg=\"{_escape(record.getMessage())}\"")
+        fields = [f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}"
+                  for key, value in vars(record).items() if key not in _STANDARD_RECORD_FIELDS]
+        if fields:
+            line += ' ' + ' '.join(fields)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+# 'backend', or 'RateFinder.backend' when imported from the repository root (currency_exchange)
+PACKAGE_LOGGER = __name__.rpartition('.')[0]
+
+_configured_loggers = set()
+_configure_lock = threading.Lock()
+
+
+def configure_logging(level=None, stream=None, logger_name=PACKAGE_LOGGER):
+    """
+    Sets the level of logger_name (this package's logger by default) to level, or
+    RATEFINDER_LOG_LEVEL, or INFO, and gives it the key=value handler unless the host
+    application has already configured the root logger. Only the first call per logger
+    does anything, so every create_app() can call it.
+    """
+    with _configure_lock:
+        if logger_name in _configured_loggers:
+            return
+        _configured_loggers.add(logger_name)
+    logger = logging.getLogger(logger_name)
+    logger.setLevel((level or os.environ.get(LOG_LEVEL_ENV) or 'INFO').upper())
+    if not logging.getLogger().handlers:
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(KeyValueFormatter())
+        logger.addHandler(handler)
@@ -0,0 +1,120 @@
+# Versioned schema migrations and SQLite connection tuning.
+# db.create_all() only creates missing tables, so anything added to an existing table
+# (indexes for now) goes through a numbered migration here. The current schema version
+# is kept in SQLite's built-in PRAGMA user_version.
+
+import logging
+
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# (version, description, statements) in order; statements must be safe to re-run on
+# a database created from the current models (hence IF NOT EXISTS everywhere).
+MIGRATIONS = [
+    (1, "Unique (provider_id, currency_pair) index for the rate upsert", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_exchange_rates_provider_pair "
+        "ON exchange_rates (provider_id, currency_pair)",
+    ]),
+    (2, "Index exchange_rates by pair and rate for get_rates and the DISTINCT pair list", [
+        "CREATE INDEX IF NOT EXISTS ix_exchange_rates_pair_rate "
+        "ON exchange_rates (currency_pair, rate)",
+    ]),
+    (3, "Index user_activity by timestamp and provider for exports and analytics", [
+        "CREATE INDEX IF NOT EXISTS ix_user_activity_timestamp ON user_activity (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_user_activity_provider_name ON user_activity (provider_name)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",       # Readers don't block the writer (and vice versa)
+    "PRAGMA synchronous=NORMAL",     # Safe with WAL; fsync at checkpoints instead of every commit
+    "PRAGMA mmap_size=268435456",    # Read pages through a 256 MB memory map
+    "PRAGMA busy_timeout=5000",      # Wait for the write lock instead of failing immediately
+)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def install_sqlite_pragmas(engine):
+    """Registers the connect hook that tunes every SQLite connection of this engine."""
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _apply_sqlite_pragmas):
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+
+
+def get_schema_version(session):
+    return session.execute(text("PRAGMA user_version")).scalar()
+
+
+def run_migrations(session):
+    """
+    Applies every migration newer than the database's user_version, each in its own
+    transaction. Returns the list of versions applied.
+    """
+    current = get_schema_version(session)
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info("Applying migration %d: %s", version, description)
+        try:
+            for statement in statements:
+                session.execute(text(statement))
+            # PRAGMA can't take bound parameters; version is an int from MIGRATIONS
+            session.execute(text(f"PRAGMA user_version = {int(version)}"))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# --- Query plan checks ---
+
+# The hot queries, written the way the ORM emits them, with the index each must use.
+HOT_QUERY_PLANS = [
+    ("get_rates",
+     "SELECT exchange_rates.id FROM exchange_rates JOIN providers ON providers.id = exchange_rates.provider_id "
+     "WHERE exchange_rates.currency_pair = :pair ORDER BY exchange_rates.rate",
+     {"pair": "USD_EUR"}, "ix_exchange_rates_pair_rate"),
+    ("get_currency_pairs",
+     "SELECT DISTINCT exchange_rates.currency_pair FROM exchange_rates",
+     {}, "ix_exchange_rates_pair_rate"),
+    ("rate_upsert_lookup",
+     "SELECT exchange_rates.rate FROM exchange_rates "
+     "WHERE exchange_rates.provider_id = :provider_id AND exchange_rates.currency_pair = :pair",
+     {"provider_id": 1, "pair": "USD_EUR"}, "uq_exchange_rates_provider_pair"),
+    ("clicks_by_time",
+     "SELECT user_activity.id FROM user_activity WHERE user_activity.timestamp >= :since",
+     {"since": "2024-01-01"}, "ix_user_activity_timestamp"),
+    ("clicks_export_by_provider",
+     "SELECT user_activity.id FROM user_activity WHERE user_activity.provider_name = :provider "
+     "AND user_activity.id > :after_id ORDER BY user_activity.id LIMIT 1000",
+     {"provider": "Wise", "after_id": 0}, "ix_user_activity_provider_name"),
+    ("quote_fee_bands",
+     "SELECT fee_schedules.provider_id, fee_schedules.min_amount FROM fee_schedules "
+     "WHERE fee_schedules.currency_pair = :pair ORDER BY fee_schedules.provider_id, fee_schedules.min_amount",
+     {"pair": "USD_EUR"}, "PRIMARY KEY"),
+]
+
+
+def explain_query_plans(session):
+    """
+    Runs EXPLAIN QUERY PLAN for every hot query.
+    Returns a list of (name, plan_text, expected_index, ok) tuples.
+    """
+    results = []
+    for name, sql, params, expected_index in HOT_QUERY_PLANS:
+        rows = session.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+        plan = "; ".join(row[-1] for row in rows)
+        results.append((name, plan, expected_index, expected_index in plan))
+    return results
@@ -26,6 +26,13 @@ class Provider(db.Model):
 
 class ExchangeRate(db.Model):
     __tablename__ = 'exchange_rates'
+    # Keep in sync with migrations.py, which adds these to databases created earlier
+    __table_args__ = (
+        # One row per provider/pair; the bulk upsert in utils.py relies on this index
+        db.Index('uq_exchange_rates_provider_pair', 'provider_id', 'currency_pair', unique=True),
+        # get_rates filters by pair and sorts by rate; also covers the DISTINCT pair list
+        db.Index('ix_exchange_rates_pair_rate', 'currency_pair', 'rate'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), nullable=False)
     currency_pair = db.Column(db.String(10), nullable=False)  # e.g., USD_EUR
@@ -45,8 +52,66 @@ class ExchangeRate(db.Model):
     def __repr__(self):
         return f'<ExchangeRate {self.currency_pair} for {self.provider.name if self.provider else "N/A"} - {self.rate}>'
 
+class RateHistory(db.Model):
+    """Append-only raw rate ticks, one per provider/pair per refresh cycle."""
+    __tablename__ = 'rate_history'
+    # Clustered on (pair, provider, time) so range scans read contiguous pages;
+    # WITHOUT ROWID avoids storing a second copy of the key.
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    currency_pair = db.Column(db.String(10), primary_key=True)
+    provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), primary_key=True)
+    recorded_at = db.Column(db.Integer, primary_key=True) # Unix epoch seconds
+    rate = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<RateHistory {self.currency_pair} provider={self.provider_id} @ {self.recorded_at} - {self.rate}>'
+
+class RateRollup(db.Model):
+    """Pre-aggregated OHLC buckets (1m/1h/1d) per provider/pair, maintained on every refresh."""
+    __tablename__ = 'rate_rollups'
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    resolution = db.Column(db.String(3), primary_key=True) # '1m', '1h' or '1d'
+    currency_pair = db.Column(db.String(10), primary_key=True)
+    provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), primary_key=True)
+    bucket_start = db.Column(db.Integer, primary_key=True) # Unix epoch seconds
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    sample_count = db.Column(db.Integer, nullable=False, default=1)
+
+    def to_dict(self):
+        return {
+            'bucket_start': datetime.utcfromtimestamp(self.bucket_start).isoformat(),
+            'open': self.open,
+            'high': self.high,
+            'low': self.low,
+            'close': self.close,
+            'sample_count': self.sample_count
+        }
+
+    def __repr__(self):
+        return f'<RateRollup {self.resolution} {self.currency_pair} provider={self.provider_id} @ {self.bucket_start}>'
+
+class RateRefresh(db.Model):
+    """
+    One row per committed rate refresh, written in the same transaction as the upsert.
+    Workers that didn't run the refresh poll it to update their in-memory views.
+    """
+    __tablename__ = 'rate_refreshes'
+    version = db.Column(db.Integer, primary_key=True)
+    written_at = db.Column(db.DateTime, nullable=False)
+    changed = db.Column(db.Text, nullable=False) # JSON list of [provider_id, currency_pair, rate]
+
+    def __repr__(self):
+        return f'<RateRefresh {self.version} @ {self.written_at}>'
+
 class UserActivity(db.Model):
     __tablename__ = 'user_activity'
+    __table_args__ = (
+        db.Index('ix_user_activity_timestamp', 'timestamp'),
+        db.Index('ix_user_activity_provider_name', 'provider_name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     action = db.Column(db.String(50), nullable=False) # e.g., 'register_click'
     provider_name = db.Column(db.String(100), nullable=True)
@@ -69,6 +134,59 @@ class UserActivity(db.Model):
     def __repr__(self):
         return f'<UserActivity {self.action} - {self.provider_name} at {self.timestamp}>'
 
+class ClickDailySummary(db.Model):
+    """Click counts per day/provider/pair, kept up to date as clicks are written."""
+    __tablename__ = 'click_daily_summary'
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    day = db.Column(db.String(10), primary_key=True) # YYYY-MM-DD (UTC)
+    provider_name = db.Column(db.String(100), primary_key=True)
+    currency_pair = db.Column(db.String(10), primary_key=True) # '' when no pair was recorded
+    clicks = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'day': self.day,
+            'provider_name': self.provider_name,
+            'currency_pair': self.currency_pair or None,
+            'clicks': self.clicks
+        }
+
+    def __repr__(self):
+        return f'<ClickDailySummary {self.day} {self.provider_name} {self.currency_pair} - {self.clicks}>'
+
+class FeeSchedule(db.Model):
+    """
+    Amount bands for a provider/pair: a transfer of at least min_amount (in the source
+    currency) up to the next band's min_amount pays fixed_fee plus percent_fee of the
+    amount, and converts at the provider's rate scaled by (1 + rate_adjustment).
+    Providers without rows for a pair quote their plain rate with no fees.
+    """
+    __tablename__ = 'fee_schedules'
+    # Clustered by pair first: the quote engine loads every provider's bands for one pair
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    currency_pair = db.Column(db.String(10), primary_key=True)
+    provider_id = db.Column(db.Integer, db.ForeignKey('providers.id'), primary_key=True)
+    min_amount = db.Column(db.Float, primary_key=True, default=0.0)
+    fixed_fee = db.Column(db.Float, nullable=False, default=0.0) # In the source currency
+    percent_fee = db.Column(db.Float, nullable=False, default=0.0) # Fraction, e.g. 0.005 for 0.5%
+    rate_adjustment = db.Column(db.Float, nullable=False, default=0.0) # Fraction of the base rate, e.g. -0.002
+
+    def to_dict(self):
+        return {
+            'provider_id': self.provider_id,
+            'currency_pair': self.currency_pair,
+            'min_amount': self.min_amount,
+            'fixed_fee': self.fixed_fee,
+            'percent_fee': self.percent_fee,
+            'rate_adjustment': self.rate_adjustment
+        }
+
+    def __repr__(self):
+        return f'<FeeSchedule {self.currency_pair} provider={self.provider_id} from {self.min_amount}>'
+
 def init_app(flask_app):
     """Initializes the database with the Flask app."""
+    from .migrations import install_sqlite_pragmas
     db.init_app(flask_app)
+    with flask_app.app_context():
+        install_sqlite_pragmas(db.engine) # WAL, synchronous=NORMAL, mmap on every connection
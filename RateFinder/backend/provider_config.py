@@ -0,0 +1,51 @@
+# Provider API configuration, shared by the refresh job (utils.py) and the freshness
+# rules (freshness.py). Plain data with no imports, so the async app (asgi.py) can
+# compute "stale" flags without loading the Flask/SQLAlchemy stack.
+
+# Placeholder for actual API URLs and keys - these would be in environment variables or a config file
+PROVIDER_APIS_CONFIG = {
+    "TapTap Send": {
+        "api_url": "https://api.taptapsend.example.com/rates",
+        "params_template": {"pair": "{source}{target}"}, # e.g., USDEUR
+        "rate_path": ["data", "rate"], # How to access rate in JSON response
+        "name_in_api": "TapTap Send", # If the API uses a specific name identifier
+        # Optional fetch tuning (defaults live in fetcher.py):
+        # "max_concurrency": 4, "timeout": 5.0, "retries": 2, "backoff": 0.25
+        # Optional refresh interval in seconds (default DEFAULT_REFRESH_INTERVAL):
+        # "refresh_interval": 300
+        # Optional circuit breaker tuning (defaults live in circuit_breaker.py):
+        # "failure_threshold": 3, "reset_timeout": 60.0
+    },
+    "Revolut": {
+        "api_url": "https://api.revolut.example.com/exchange",
+        "params_template": {"from": "{source}", "to": "{target}", "amount": "1"},
+        "rate_path": ["rates", "{target}"], # Example: response.rates.EUR
+        "name_in_api": "Revolut",
+        # Omitting "to" returns every target for the source: one request per source currency
+        "batch": {
+            "params_template": {"from": "{source}", "amount": "1"},
+            "rates_map_path": ["rates"]
+        }
+    },
+    "Remitly": {
+        "api_url": "https://api.remitly.example.com/v1/rates",
+        "params_template": {"sourceCurrency": "{source}", "destinationCurrency": "{target}"},
+        "rate_path": ["data", 0, "rate"], # Example: response.data[0].rate
+        "name_in_api": "Remitly",
+        "batch": {
+            "items_path": ["data"],
+            "source_key": "sourceCurrency", "target_key": "destinationCurrency", "rate_key": "rate"
+        }
+    },
+    "Wise (TransferWise)": {
+        "api_url": "https://api.wise.com/v1/rates", # This is a guess, Wise has a public API
+        "params_template": {"source": "{source}", "target": "{target}"},
+        "rate_path": ["rate"],
+        "name_in_api": "Wise",
+        # Without source/target the endpoint lists every rate: one request per cycle
+        "batch": {"items_path": []}
+    }
+}
+
+# Seconds between scheduled refreshes for providers without their own "refresh_interval"
+DEFAULT_REFRESH_INTERVAL = 300
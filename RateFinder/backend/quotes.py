@@ -0,0 +1,139 @@
+# Amount-aware quotes: what the recipient actually gets from each provider.
+# Raw rates alone rank providers wrongly once fees and tiered rates come in, so a quote
+# applies the provider's FeeSchedule band for the send amount:
+#   received = max(amount - fixed_fee - amount * percent_fee, 0) * rate * (1 + rate_adjustment)
+# One pair's providers and bands are loaded into padded NumPy arrays, and any number of
+# amounts is quoted for every provider in a single vectorized pass.
+
+import numpy as np
+
+from .models import db, ExchangeRate, FeeSchedule, Provider
+
+MAX_BATCH_AMOUNTS = 500
+
+
+class PairQuoteTable:
+    """
+    Providers quoting one pair plus their fee bands as (providers x bands) arrays.
+
+    Band columns are sorted by min_amount and padded with +inf bounds, so the band for
+    an amount is the number of bounds <= amount, minus one. A provider without fee rows
+    gets a single free band starting at 0.
+    """
+
+    def __init__(self, currency_pair, providers, rates, last_updated, bands):
+        # providers: Provider rows; rates/last_updated: parallel lists;
+        # bands: {provider_id: [(min_amount, fixed_fee, percent_fee, rate_adjustment), ...]}
+        self.currency_pair = currency_pair
+        self.providers = providers
+        self.last_updated = last_updated
+        self.rates = np.asarray(rates, dtype=float)
+
+        width = max([len(bands.get(p.id, ())) for p in providers] + [1])
+        shape = (len(providers), width)
+        self.min_amount = np.full(shape, np.inf)
+        self.fixed_fee = np.zeros(shape)
+        self.percent_fee = np.zeros(shape)
+        self.rate_adjustment = np.zeros(shape)
+        for row, provider in enumerate(providers):
+            provider_bands = sorted(bands.get(provider.id) or [(0.0, 0.0, 0.0, 0.0)])
+            for column, (min_amount, fixed_fee, percent_fee, rate_adjustment) in enumerate(provider_bands):
+                self.min_amount[row, column] = min_amount
+                self.fixed_fee[row, column] = fixed_fee
+                self.percent_fee[row, column] = percent_fee
+                self.rate_adjustment[row, column] = rate_adjustment
+
+    def quote(self, amounts):
+        """
+        Quotes every amount at every provider. Returns a dict of (providers x amounts)
+        arrays: 'received', 'fee', 'effective_rate' (received per unit sent) and 'band'
+        (-1 where the amount is below the provider's first band, which is not quotable).
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        # band[p, a] = index of the last band whose min_amount <= amounts[a]
+        band = (self.min_amount[:, None, :] <= amounts[None, :, None]).sum(axis=2) - 1
+        quotable = band >= 0
+        index = np.where(quotable, band, 0)
+
+        fixed_fee = np.take_along_axis(self.fixed_fee, index, axis=1)
+        percent_fee = np.take_along_axis(self.percent_fee, index, axis=1)
+        rate_adjustment = np.take_along_axis(self.rate_adjustment, index, axis=1)
+
+        fee = fixed_fee + amounts[None, :] * percent_fee
+        received = np.maximum(amounts[None, :] - fee, 0.0) * self.rates[:, None] * (1 + rate_adjustment)
+        received = np.where(quotable, received, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effective_rate = np.where(amounts[None, :] > 0, received / amounts[None, :], np.nan)
+        return {'received': received, 'fee': np.where(quotable, fee, np.nan),
+                'effective_rate': effective_rate, 'band': np.where(quotable, band, -1)}
+
+    @staticmethod
+    def ranking(received):
+        """Provider indices per amount, most received first; unquotable providers are left out."""
+        # NaN sorts last, so each column's quotable providers are a prefix of its order
+        order = np.argsort(-np.nan_to_num(received, nan=-np.inf), axis=0, kind='stable')
+        quotable = (~np.isnan(received)).sum(axis=0)
+        return [order[:count, a].tolist() for a, count in enumerate(quotable)]
+
+
+def load_quote_table(currency_pair):
+    """Builds the PairQuoteTable for a pair with two indexed queries (rates, then fee bands)."""
+    rows = db.session.query(Provider, ExchangeRate.rate, ExchangeRate.last_updated)\
+                     .join(ExchangeRate, ExchangeRate.provider_id == Provider.id)\
+                     .filter(ExchangeRate.currency_pair == currency_pair)\
+                     .order_by(Provider.id)\
+                     .all()
+    bands = {}
+    for fee in FeeSchedule.query.filter(FeeSchedule.currency_pair == currency_pair)\
+                                .order_by(FeeSchedule.provider_id, FeeSchedule.min_amount):
+        bands.setdefault(fee.provider_id, []).append(
+            (fee.min_amount, fee.fixed_fee, fee.percent_fee, fee.rate_adjustment))
+    return PairQuoteTable(
+        currency_pair,
+        [provider for provider, _, _ in rows],
+        [rate for _, rate, _ in rows],
+        [last_updated for _, _, last_updated in rows],
+        bands
+    )
+
+
+def _number(value):
+    return None if np.isnan(value) else round(float(value), 6)
+
+
+def _matrix(values):
+    """Rounded nested lists with NaN as None, converted in bulk rather than per element."""
+    return [[None if v != v else v for v in row] for row in np.round(values, 6).tolist()]
+
+
+def quote_amount(table, amount):
+    """Ranked per-provider quotes for one amount, as JSON-ready dicts."""
+    result = table.quote([amount])
+    quotes = []
+    for p in PairQuoteTable.ranking(result['received'])[0]:
+        provider = table.providers[p]
+        quotes.append({
+            "provider": provider.name,
+            "register_link": provider.registration_link,
+            "rate": float(table.rates[p]),
+            "fee": _number(result['fee'][p, 0]),
+            "effective_rate": _number(result['effective_rate'][p, 0]),
+            "received": _number(result['received'][p, 0]),
+            "last_updated": table.last_updated[p].isoformat()
+        })
+    return quotes
+
+
+def quote_amounts(table, amounts):
+    """
+    Column-oriented quotes for many amounts (one row per provider, one column per amount),
+    so a slider can re-rank locally without another round trip.
+    """
+    result = table.quote(amounts)
+    return {
+        "providers": [{"provider": p.name, "register_link": p.registration_link, "rate": float(rate)}
+                      for p, rate in zip(table.providers, table.rates)],
+        "received": _matrix(result['received']),
+        "fee": _matrix(result['fee']),
+        "ranking": PairQuoteTable.ranking(result['received'])
+    }
@@ -0,0 +1,210 @@
+# Best-rate routing over the ExchangeRate table.
+# Each provider's quotes form a graph of currencies weighted by -log(rate), so the best
+# conversion is the cheapest path. Routes are limited to one intermediate currency
+# (direct or triangulated, e.g. CAD->USD->EUR), which also keeps arbitrage cycles from
+# making the answer ill-defined.
+
+import math
+import threading
+
+import numpy as np
+
+from .models import ExchangeRate
+
+
+class RateGraph:
+    """
+    Per-provider matrices of log-rates with precomputed best routes for every pair.
+
+    direct[p, i, j] is -log(rate) for converting currency i to j at provider p (inf if
+    neither i_j nor j_i is quoted; a missing direction is derived as the inverse).
+    best[p, i, j] is the cheapest one- or two-leg route and via[p, i, j] its intermediate
+    currency index, or -1 for a direct conversion.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.built = False
+        self._reset()
+
+    def _reset(self):
+        self.currencies = []
+        self.currency_index = {}
+        self.provider_ids = []
+        self.provider_index = {}
+        self.direct = np.zeros((0, 0, 0))
+        self.quoted = np.zeros((0, 0, 0), dtype=bool)
+        self.best = np.zeros((0, 0, 0))
+        self.via = np.zeros((0, 0, 0), dtype=np.int32)
+
+    # --- Construction ---
+
+    def _grow(self, provider_count, currency_count):
+        """Pads the matrices to hold the given number of providers and currencies."""
+        old_p, old_n = self.direct.shape[0], self.direct.shape[1]
+        if provider_count <= old_p and currency_count <= old_n:
+            return
+        p, n = max(provider_count, old_p), max(currency_count, old_n)
+
+        direct = np.full((p, n, n), np.inf)
+        direct[:old_p, :old_n, :old_n] = self.direct
+        idx = np.arange(n)
+        direct[:, idx, idx] = 0.0
+        quoted = np.zeros((p, n, n), dtype=bool)
+        quoted[:old_p, :old_n, :old_n] = self.quoted
+        best = np.full((p, n, n), np.inf)
+        best[:old_p, :old_n, :old_n] = self.best
+        best[:, idx, idx] = 0.0
+        via = np.full((p, n, n), -1, dtype=np.int32)
+        via[:old_p, :old_n, :old_n] = self.via
+
+        self.direct, self.quoted, self.best, self.via = direct, quoted, best, via
+
+    def _register(self, provider_id, pair, grow=True):
+        source, target = pair.split('_')
+        for code in (source, target):
+            if code not in self.currency_index:
+                self.currency_index[code] = len(self.currencies)
+                self.currencies.append(code)
+        if provider_id not in self.provider_index:
+            self.provider_index[provider_id] = len(self.provider_ids)
+            self.provider_ids.append(provider_id)
+        if grow:
+            self._grow(len(self.provider_ids), len(self.currencies))
+        return self.provider_index[provider_id], self.currency_index[source], self.currency_index[target]
+
+    def _set_edge(self, p, i, j, rate):
+        weight = -math.log(rate)
+        self.direct[p, i, j] = weight
+        self.quoted[p, i, j] = True
+        if not self.quoted[p, j, i]:
+            self.direct[p, j, i] = -weight # Derived inverse until j_i itself is quoted
+
+    def rebuild(self, rate_rows):
+        """Builds everything from scratch from (provider_id, currency_pair, rate) rows."""
+        with self._lock:
+            self._reset()
+            edges = [(self._register(provider_id, pair, grow=False), rate)
+                     for provider_id, pair, rate in rate_rows if rate and rate > 0]
+            self._grow(len(self.provider_ids), len(self.currencies))
+            for (p, i, j), rate in edges:
+                self._set_edge(p, i, j, rate)
+
+            # best = min over k of direct[:, i, k] + direct[:, k, j]; the zero diagonal
+            # means k == i or k == j covers the direct conversion
+            n = len(self.currencies)
+            self.best = self.direct.copy()
+            self.via = np.full(self.direct.shape, -1, dtype=np.int32)
+            for k in range(n):
+                candidate = self.direct[:, :, k, None] + self.direct[:, None, k, :]
+                better = candidate < self.best
+                self.best[better] = candidate[better]
+                self.via[better] = k
+            self.built = True
+
+    def apply_updates(self, rate_rows):
+        """
+        Applies changed (provider_id, currency_pair, rate) rows incrementally.
+        Only routes that can use a changed edge (rows and columns of its two
+        currencies) are recomputed, which is O(n^2) per edge instead of O(n^3).
+        """
+        with self._lock:
+            for provider_id, pair, rate in rate_rows:
+                if not rate or rate <= 0:
+                    continue
+                p, i, j = self._register(provider_id, pair)
+                self._set_edge(p, i, j, rate)
+                for c in (i, j):
+                    self._recompute_row(p, c)
+                    self._recompute_column(p, c)
+
+    def _recompute_row(self, p, r):
+        # candidates[k, j] = direct[r, k] + direct[k, j]
+        candidates = self.direct[p, r, :, None] + self.direct[p]
+        k = candidates.argmin(axis=0)
+        self._store(p, (r, slice(None)), candidates[k, np.arange(len(k))], k, r, None)
+
+    def _recompute_column(self, p, c):
+        # candidates[i, k] = direct[i, k] + direct[k, c]
+        candidates = self.direct[p] + self.direct[p, :, c][None, :]
+        k = candidates.argmin(axis=1)
+        self._store(p, (slice(None), c), candidates[np.arange(len(k)), k], k, None, c)
+
+    def _store(self, p, index, weights, k, row, column):
+        n = len(weights)
+        starts = np.full(n, row) if row is not None else np.arange(n)
+        ends = np.full(n, column) if column is not None else np.arange(n)
+        # Prefer the direct conversion on ties; an intermediate equal to either
+        # endpoint is the direct conversion anyway
+        direct = self.direct[(p,) + index]
+        use_direct = (direct <= weights) | (k == starts) | (k == ends) | ~np.isfinite(weights)
+        weights = np.where(use_direct, direct, weights)
+        via = np.where(use_direct, -1, k).astype(np.int32)
+        self.best[(p,) + index] = weights
+        self.via[(p,) + index] = via
+
+    # --- Queries ---
+
+    def _leg(self, p, i, j):
+        rate = math.exp(-self.direct[p, i, j])
+        return {
+            "from": self.currencies[i],
+            "to": self.currencies[j],
+            "rate": rate,
+            "derived_inverse": not bool(self.quoted[p, i, j])
+        }
+
+    def routes(self, source, target):
+        """
+        Best route per provider for converting source into target, best first.
+        Each entry is {'provider_id', 'effective_rate', 'path', 'legs'}.
+        """
+        with self._lock:
+            i = self.currency_index.get(source)
+            j = self.currency_index.get(target)
+            if i is None or j is None or i == j:
+                return []
+            weights = self.best[:, i, j]
+            results = []
+            for p in np.argsort(weights, kind='stable'):
+                if not np.isfinite(weights[p]):
+                    break
+                k = int(self.via[p, i, j])
+                hops = [i, j] if k < 0 else [i, k, j]
+                results.append({
+                    "provider_id": self.provider_ids[p],
+                    "effective_rate": math.exp(-weights[p]),
+                    "path": [self.currencies[c] for c in hops],
+                    "legs": [self._leg(p, a, b) for a, b in zip(hops, hops[1:])]
+                })
+            return results
+
+    def reachable_pairs(self):
+        """Every SOURCE_TARGET pair at least one provider can convert (directly or via one hop)."""
+        with self._lock:
+            if not self.currencies:
+                return []
+            reachable = np.isfinite(self.best).any(axis=0)
+            np.fill_diagonal(reachable, False)
+            return [f"{self.currencies[a]}_{self.currencies[b]}" for a, b in zip(*np.nonzero(reachable))]
+
+
+def load_rate_rows():
+    """All stored rates as (provider_id, currency_pair, rate) rows. Needs an app context."""
+    return ExchangeRate.query.with_entities(
+        ExchangeRate.provider_id, ExchangeRate.currency_pair, ExchangeRate.rate
+    ).all()
+
+
+# Shared instance; built lazily by ensure_built() and kept current by the refresh job
+rate_graph = RateGraph()
+
+
+def ensure_built():
+    if not rate_graph.built:
+        from .utils import rate_change_listeners
+
+        rate_graph.rebuild(load_rate_rows())
+        if rate_graph.apply_updates not in rate_change_listeners:
+            rate_change_listeners.append(rate_graph.apply_updates) # Only routes touching changed rates
+    return rate_graph
@@ -0,0 +1,225 @@
+# Background job scheduler shared by RateFinder and currency_exchange.
+# Jobs run on their own interval (plus jitter), never overlap with themselves, and
+# can take a lease in the SQLite database so that when N gunicorn workers all run a
+# scheduler, only one of them actually executes each job per interval.
+# Standard library only, so currency_exchange can use it without Flask-SQLAlchemy.
+
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobLock:
+    """
+    Cross-process job leases stored in a job_locks table.
+
+    acquire() grants the lease when nobody holds it or the holder's lease expired, so a
+    crashed worker can never block a job for longer than one lease.
+    """
+
+    def __init__(self, db_path, owner=None):
+        self.db_path = db_path
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_locks ("
+                "name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def acquire(self, name, ttl, now=None):
+        """Takes (or renews) the lease on `name` for ttl seconds. Returns True on success."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO job_locks (name, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE job_locks.expires_at <= ? OR job_locks.owner = ?",
+                    (name, self.owner, now + ttl, now, self.owner)
+                )
+                return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def hold_until(self, name, expires_at):
+        """Keeps our lease until expires_at (used to stop other workers rerunning a finished job)."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE job_locks SET expires_at = ? WHERE name = ? AND owner = ?",
+                             (expires_at, name, self.owner))
+        finally:
+            conn.close()
+
+    def release(self, name):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM job_locks WHERE name = ? AND owner = ?", (name, self.owner))
+        finally:
+            conn.close()
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter, leased=True, lock=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.leased = leased
+        self.lock = lock
+        self.next_run = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped_overlap = 0
+        self.skipped_locked = 0
+        self.last_started = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_lag = None
+        self.last_error = None
+
+    def schedule_next(self, now):
+        # Jitter spreads runs out so workers and providers don't all fire at once
+        self.next_run = now + self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+class Scheduler:
+    """
+    Runs registered jobs on a pool of worker threads.
+
+    A job that is still running when it comes due again is skipped, not queued. With a
+    lock, each run first takes a lease named after the job; after a successful run the
+    lease is held until one interval after the start, so other processes skip that slot.
+    Jobs added with leased=False (per-process housekeeping) run in every process, and
+    a job added with its own lock takes its lease there instead of the scheduler's.
+    """
+
+    def __init__(self, lock=None, clock=time.time, tick=1.0, max_workers=4):
+        self.lock = lock
+        self.clock = clock
+        self.tick = tick
+        self.jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scheduler-job')
+        self._jobs_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def lease_name(job_name):
+        """Name of the lock lease a job takes (other code can take the same lease)."""
+        return f"job:{job_name}"
+
+    def add_job(self, name, func, interval, jitter=0.1, run_immediately=True, leased=True, lock=None):
+        job = Job(name, func, interval, jitter, leased, lock)
+        if run_immediately:
+            job.next_run = self.clock()
+        else:
+            job.schedule_next(self.clock())
+        with self._jobs_lock:
+            self.jobs[name] = job
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(self.tick)
+
+    def run_pending(self):
+        """Submits every job that is due. Returns the names of the jobs submitted."""
+        now = self.clock()
+        submitted = []
+        with self._jobs_lock:
+            for job in self.jobs.values():
+                if now < job.next_run:
+                    continue
+                due_at = job.next_run
+                job.schedule_next(now)
+                if job.running:
+                    job.skipped_overlap += 1
+                    continue
+                job.running = True
+                self._executor.submit(self._run_job, job, due_at)
+                submitted.append(job.name)
+        return submitted
+
+    def _run_job(self, job, due_at):
+        lock_name = self.lease_name(job.name)
+        lock = (job.lock or self.lock) if job.leased else None
+        try:
+            started = self.clock()
+            if lock is not None and not lock.acquire(lock_name, ttl=max(job.interval, 60), now=started):
+                job.skipped_locked += 1
+                return
+            job.last_started = started
+            job.last_lag = max(0.0, started - due_at)
+            try:
+                job.func()
+            except Exception as e:
+                job.failures += 1
+                job.last_error = f"{type(e).__name__}: {e}"
+                logger.error("Scheduled job %s failed: %s", job.name, job.last_error, extra={'job': job.name})
+                if lock is not None:
+                    lock.release(lock_name) # Let any worker retry on its next tick
+                return
+            finished = self.clock()
+            job.runs += 1
+            job.last_success = finished
+            job.last_duration = finished - started
+            job.last_error = None
+            if lock is not None:
+                lock.hold_until(lock_name, started + job.interval)
+        finally:
+            job.running = False
+
+    def metrics(self):
+        """Per-job counters, last duration/success and lag (seconds) as a JSON-friendly dict."""
+        now = self.clock()
+
+        def iso(ts):
+            return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+        with self._jobs_lock:
+            return {
+                job.name: {
+                    'interval_seconds': job.interval,
+                    'leased': job.leased,
+                    'running': job.running,
+                    'runs': job.runs,
+                    'failures': job.failures,
+                    'skipped_overlap': job.skipped_overlap,
+                    'skipped_locked': job.skipped_locked,
+                    'last_started': iso(job.last_started),
+                    'last_success': iso(job.last_success),
+                    'last_duration_seconds': job.last_duration,
+                    'last_start_lag_seconds': job.last_lag,
+                    'seconds_since_success': now - job.last_success if job.last_success else None,
+                    'next_run_in_seconds': max(0.0, job.next_run - now),
+                    'last_error': job.last_error
+                }
+                for job in self.jobs.values()
+            }
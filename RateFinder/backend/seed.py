@@ -0,0 +1,85 @@
+# Initial providers, rates and fee schedules for a fresh RateFinder database.
+# Seeding is an explicit step (`flask --app backend.app seed-db`) rather than something
+# every process does at boot. It is one transaction of bulk INSERT ... ON CONFLICT DO
+# NOTHING statements, so running it again, or against a database the refresh job has
+# already filled, leaves existing rows alone.
+
+import logging
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import db, Provider, ExchangeRate, FeeSchedule
+
+logger = logging.getLogger(__name__)
+
+SEED_PROVIDERS = [
+    ("TapTap Send", "https://www.taptapsend.com/"),
+    ("Revolut", "https://www.revolut.com/"),
+    ("Remitly", "https://www.remitly.com/"),
+    ("Wise (TransferWise)", "https://wise.com/"),
+]
+
+# (provider, currency_pair, rate)
+SEED_RATES = [
+    ("TapTap Send", "USD_EUR", 0.9210),
+    ("Revolut", "USD_EUR", 0.9255),
+    ("Remitly", "USD_EUR", 0.9180),
+    ("Wise (TransferWise)", "USD_EUR", 0.9230),
+    ("TapTap Send", "USD_GBP", 0.7905),
+    ("Revolut", "USD_GBP", 0.7950),
+    ("Remitly", "USD_GBP", 0.7880),
+    ("Wise (TransferWise)", "USD_GBP", 0.7920),
+    ("Revolut", "EUR_GBP", 0.8580),
+    ("Wise (TransferWise)", "EUR_GBP", 0.8590),
+]
+
+# (provider, min_amount, fixed_fee, percent_fee, rate_adjustment) for every seeded pair
+SEED_FEE_BANDS = [
+    ("TapTap Send", 0, 0.0, 0.0, 0.0),
+    ("Revolut", 0, 0.0, 0.0, 0.0),
+    ("Revolut", 1000, 0.0, 0.005, 0.0),      # Fair-usage fee above the free allowance
+    ("Remitly", 0, 3.99, 0.0, -0.004),
+    ("Remitly", 1000, 0.0, 0.0, -0.001),     # No fee and a better rate for larger transfers
+    ("Wise (TransferWise)", 0, 0.5, 0.0043, 0.0),
+]
+
+
+def seed_database(session=None):
+    """
+    Inserts the seed rows that are missing and commits. Needs an app context.
+    Returns the number of rows inserted per table.
+    """
+    session = session or db.session
+    now = datetime.utcnow()
+    inserted = {}
+    try:
+        connection = session.connection() # Core executemany, which reports rowcount
+        inserted['providers'] = connection.execute(
+            sqlite_insert(Provider).on_conflict_do_nothing(index_elements=['name']),
+            [{"name": name, "registration_link": link} for name, link in SEED_PROVIDERS]
+        ).rowcount
+
+        provider_ids = dict(connection.execute(
+            db.select(Provider.name, Provider.id).where(Provider.name.in_([name for name, _ in SEED_PROVIDERS]))
+        ).all())
+        inserted['exchange_rates'] = connection.execute(
+            sqlite_insert(ExchangeRate).on_conflict_do_nothing(index_elements=['provider_id', 'currency_pair']),
+            [{"provider_id": provider_ids[name], "currency_pair": pair, "rate": rate, "last_updated": now}
+             for name, pair, rate in SEED_RATES]
+        ).rowcount
+
+        pairs = sorted({pair for _, pair, _ in SEED_RATES})
+        inserted['fee_schedules'] = connection.execute(
+            sqlite_insert(FeeSchedule).on_conflict_do_nothing(),
+            [{"provider_id": provider_ids[name], "currency_pair": pair, "min_amount": min_amount,
+              "fixed_fee": fixed_fee, "percent_fee": percent_fee, "rate_adjustment": rate_adjustment}
+             for pair in pairs
+             for name, min_amount, fixed_fee, percent_fee, rate_adjustment in SEED_FEE_BANDS]
+        ).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    logger.info("Seed data applied", extra=inserted)
+    return inserted
@@ -0,0 +1,347 @@
+# Shared rate cache tier for running several RateFinder instances.
+# One elected instance (the holder of the refresher lease) fetches from the providers
+# and publishes the latest rates of every refreshed pair as a versioned snapshot; every
+# instance serves /api/rates from those snapshots. When the cache is not configured,
+# has no snapshot for a pair or cannot be reached, callers fall back to their own
+# SQLite database.
+#
+# Configure with RATEFINDER_SHARED_CACHE_URL:
+#   redis://host:6379/0   Redis (or anything speaking its protocol); needs `pip install redis`
+#   memory://             In-process backend, for tests and single-node runs
+# RedisCacheBackend also accepts a ready-made client, e.g. fakeredis.FakeRedis().
+#
+# Snapshots are struct-packed rather than JSON: a header
+#   (format, version, published_at, row count)
+# then per provider row (rate, last_updated in epoch microseconds, name length, link
+# length) followed by the UTF-8 name and registration link. Rows are stored cheapest
+# first, the order get_rates serves them in.
+
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from .instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+KEY_PREFIX = 'ratefinder:'
+RETRY_AFTER_SECONDS = 5.0      # After a backend error, serve from SQLite this long before trying again
+VERSION_CHECK_INTERVAL = 1.0   # Seconds between checks of the published version (local cache invalidation)
+REDIS_TIMEOUT = 0.25           # Socket timeouts; a slow cache must not be slower than SQLite
+
+_HEADER = struct.Struct('<BQdH')
+_ROW = struct.Struct('<dqHH')
+_EPOCH = datetime(1970, 1, 1)
+
+SnapshotRow = namedtuple('SnapshotRow', ['provider', 'register_link', 'rate', 'last_updated'])
+RateSnapshot = namedtuple('RateSnapshot', ['version', 'published_at', 'rows'])
+
+shared_cache_reads = registry.counter(
+    'ratefinder_shared_cache_reads_total', 'Shared rate cache lookups by outcome (hit, miss, error, skipped)',
+    ('outcome',))
+shared_cache_publishes = registry.counter(
+    'ratefinder_shared_cache_publishes_total', 'Rate snapshots published to the shared cache by outcome',
+    ('outcome',))
+
+
+def pack_snapshot(version, rows, published_at=None):
+    """Serializes SnapshotRow-like tuples (naive UTC last_updated) into a snapshot blob."""
+    published_at = time.time() if published_at is None else published_at
+    parts = [_HEADER.pack(SNAPSHOT_FORMAT, version, published_at, len(rows))]
+    for provider, register_link, rate, last_updated in rows:
+        name = provider.encode('utf-8')
+        link = (register_link or '').encode('utf-8')
+        micros = (last_updated - _EPOCH) // timedelta(microseconds=1)
+        parts.append(_ROW.pack(rate, micros, len(name), len(link)))
+        parts.append(name)
+        parts.append(link)
+    return b''.join(parts)
+
+
+def unpack_snapshot(blob):
+    """Inverse of pack_snapshot. Returns None for a blob written in another format."""
+    snapshot_format, version, published_at, count = _HEADER.unpack_from(blob, 0)
+    if snapshot_format != SNAPSHOT_FORMAT:
+        return None
+    offset = _HEADER.size
+    rows = []
+    for _ in range(count):
+        rate, micros, name_length, link_length = _ROW.unpack_from(blob, offset)
+        offset += _ROW.size
+        name = blob[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+        link = blob[offset:offset + link_length].decode('utf-8')
+        offset += link_length
+        rows.append(SnapshotRow(name, link, rate, _EPOCH + timedelta(microseconds=micros)))
+    return RateSnapshot(version, published_at, rows)
+
+
+class MemoryCacheBackend:
+    """Dict-backed stand-in for Redis with the same semantics (leases expire on the wall clock)."""
+
+    name = 'memory'
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._values = {}
+        self._leases = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._values.get(key)
+
+    def set_many(self, mapping):
+        with self._lock:
+            self._values.update(mapping)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._values.get(key, 0)) + 1
+            self._values[key] = str(value).encode()
+            return value
+
+    def acquire_lease(self, key, owner, ttl):
+        with self._lock:
+            now = self.clock()
+            holder = self._leases.get(key)
+            if holder is not None and holder[0] != owner and holder[1] > now:
+                return False
+            self._leases[key] = (owner, now + ttl)
+            return True
+
+    def extend_lease(self, key, owner, expires_at):
+        with self._lock:
+            holder = self._leases.get(key)
+            if holder is not None and holder[0] == owner:
+                self._leases[key] = (owner, max(holder[1], expires_at))
+
+
+class RedisCacheBackend:
+    """Redis backend. redis-py is imported only when this backend is created."""
+
+    name = 'redis'
+
+    # Take the lease if it is free or already ours (renewing it), atomically
+    _ACQUIRE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+    _EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] and redis.call('pttl', KEYS[1]) < tonumber(ARGV[2]) then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+    def __init__(self, url=None, client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set_many(self, mapping):
+        # MULTI/EXEC so readers never see half of a publish
+        pipeline = self.client.pipeline(transaction=True)
+        for key, value in mapping.items():
+            pipeline.set(key, value)
+        pipeline.execute()
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def acquire_lease(self, key, owner, ttl):
+        return bool(self.client.eval(self._ACQUIRE_SCRIPT, 1, key, owner, int(ttl * 1000)))
+
+    def extend_lease(self, key, owner, expires_at):
+        remaining_ms = int((expires_at - time.time()) * 1000)
+        if remaining_ms > 0:
+            self.client.eval(self._EXTEND_SCRIPT, 1, key, owner, remaining_ms)
+
+
+def backend_from_url(url):
+    """The backend for a RATEFINDER_SHARED_CACHE_URL value, or None when it is empty."""
+    if not url:
+        return None
+    if url.startswith('memory://'):
+        return MemoryCacheBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Unsupported shared cache URL: {url}")
+
+
+class SharedLeaderLock:
+    """
+    Scheduler lock (same interface as SQLiteJobLock) that elects one refresher across
+    all instances: the provider refresh jobs of the lease holder run and are skipped
+    everywhere else, so only one instance calls the provider APIs and publishes
+    snapshots. Per-instance jobs (prune-history) must not use it.
+
+    The lease is taken for the job's ttl and extended to the next run after each job,
+    so it lapses (and another instance takes over) only when the leader stops running
+    jobs. A failed job keeps the lease: the leader retries on its own schedule.
+    """
+
+    def __init__(self, shared_cache, owner=None):
+        self.shared_cache = shared_cache
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.key = shared_cache.prefix + 'refresher'
+
+    def acquire(self, name, ttl, now=None):
+        try:
+            return self.shared_cache.backend.acquire_lease(self.key, self.owner, ttl)
+        except Exception:
+            # Without the cache there is no election; refreshing from every instance
+            # beats serving ever older rates
+            logger.warning("Refresher election unavailable, running %s locally", name, exc_info=True)
+            return True
+
+    def hold_until(self, name, expires_at):
+        try:
+            self.shared_cache.backend.extend_lease(self.key, self.owner, expires_at)
+        except Exception:
+            logger.warning("Could not extend the refresher lease", exc_info=True)
+
+    def release(self, name):
+        pass
+
+
+class SharedRateCache:
+    """
+    Latest rate snapshot per currency pair in a shared backend.
+
+    publish() is called by the refresher after it commits; read() returns a pair's
+    snapshot or None (not configured, no snapshot, or the backend is failing, in which
+    case it is left alone for RETRY_AFTER_SECONDS). sync_local() drops an instance's
+    local response cache when a newer version has been published elsewhere.
+    """
+
+    def __init__(self, backend=None, prefix=KEY_PREFIX, clock=time.monotonic):
+        self.backend = backend
+        self.prefix = prefix
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self._next_version_check = 0.0
+        self._seen_version = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.publishes = 0
+
+    def init_app(self, flask_app):
+        self.backend = backend_from_url(flask_app.config.get('SHARED_CACHE_URL'))
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _key(self, currency_pair):
+        return f"{self.prefix}rates:{currency_pair}"
+
+    def _available(self):
+        return self.backend is not None and self.clock() >= self._unavailable_until
+
+    def _failed(self, action):
+        with self._lock:
+            self.errors += 1
+            self._unavailable_until = self.clock() + RETRY_AFTER_SECONDS
+        logger.warning("Shared cache %s failed, using SQLite for %.0fs", action, RETRY_AFTER_SECONDS, exc_info=True)
+
+    def publish(self, snapshots):
+        """
+        Writes {currency_pair: rows} as one new version. Snapshots and the version key
+        go out together, so a reader that sees the new version also sees the new rows.
+        Returns the version, or None if nothing was published.
+        """
+        if not snapshots or not self._available():
+            return None
+        try:
+            version = self.backend.incr(self.prefix + 'rates:sequence')
+            published_at = time.time()
+            payload = {self._key(pair): pack_snapshot(version, rows, published_at) for pair, rows in snapshots.items()}
+            payload[self.prefix + 'rates:version'] = str(version).encode()
+            self.backend.set_many(payload)
+        except Exception:
+            shared_cache_publishes.inc('error')
+            self._failed('publish')
+            return None
+        shared_cache_publishes.inc('ok')
+        with self._lock:
+            self.publishes += 1
+        return version
+
+    def read(self, currency_pair):
+        """The RateSnapshot for currency_pair, or None when the caller should use SQLite."""
+        if not self._available():
+            if self.backend is not None:
+                shared_cache_reads.inc('skipped')
+            return None
+        try:
+            blob = self.backend.get(self._key(currency_pair))
+            snapshot = unpack_snapshot(blob) if blob is not None else None
+        except Exception:
+            shared_cache_reads.inc('error')
+            self._failed('read')
+            return None
+        shared_cache_reads.inc('hit' if snapshot is not None else 'miss')
+        with self._lock:
+            if snapshot is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return snapshot
+
+    def sync_local(self, local_cache):
+        """Invalidates local_cache once per new published version (checked at most every VERSION_CHECK_INTERVAL)."""
+        now = self.clock()
+        with self._lock:
+            if not self._available() or now < self._next_version_check:
+                return
+            self._next_version_check = now + VERSION_CHECK_INTERVAL
+        try:
+            raw = self.backend.get(self.prefix + 'rates:version')
+        except Exception:
+            self._failed('version check')
+            return
+        version = int(raw) if raw is not None else None
+        with self._lock:
+            changed = version != self._seen_version
+            self._seen_version = version
+        if changed:
+            local_cache.invalidate()
+
+    def leader_lock(self):
+        return SharedLeaderLock(self)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.backend.name if self.backend is not None else None,
+                'available': self._available(),
+                'seen_version': self._seen_version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'publishes': self.publishes
+            }
+
+
+# Shared instance; configured by create_app from RATEFINDER_SHARED_CACHE_URL
+shared_rate_cache = SharedRateCache()
@@ -0,0 +1,43 @@
+# Shared fixtures. Every test app gets its own SQLite file under tmp_path, so the
+# tracked backend/ratefinder.db is never opened for writing.
+# Run from the RateFinder directory: python -m pytest -q
+
+import os
+import shutil
+
+import pytest
+
+from ..app import create_app, init_db_with_data
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Database as shipped by the first release: tables only, no indexes, user_version 0
+BASELINE_DB = os.path.join(BACKEND_DIR, 'ratefinder.db')
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Builds an app on tmp_path/<name> (optionally a copy of an existing database file)."""
+    def make(name='ratefinder.db', copy_from=None, **config):
+        db_path = tmp_path / name
+        if copy_from is not None:
+            shutil.copyfile(copy_from, db_path)
+        return create_app(dict({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'CLICK_BUFFER_ENABLED': False,
+            'RATE_SCHEDULER_ENABLED': False,
+            'SHARED_CACHE_URL': None
+        }, **config))
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    """A migrated and seeded app."""
+    flask_app = make_app()
+    init_db_with_data(flask_app)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
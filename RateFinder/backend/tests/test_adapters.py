@@ -0,0 +1,92 @@
+# Every provider adapter against the recorded responses in fixtures/providers.
+
+import pytest
+import requests
+
+from .. import utils
+from ..adapters import FixtureSession, ProviderAdapter, compile_path
+from ..fetcher import fetch_rates_concurrently
+from ..utils import (PROVIDER_APIS_CONFIG, SUPPORTED_CURRENCY_PAIRS, fetch_batch_from_external_api,
+                     fetch_rate_from_external_api, plan_provider_requests)
+
+# Requests per refresh cycle over SUPPORTED_CURRENCY_PAIRS when batching
+BATCH_REQUESTS = {
+    "TapTap Send": 4,          # No batch endpoint: one request per pair
+    "Revolut": 3,              # One per source currency (USD, EUR, CAD)
+    "Remitly": 1,
+    "Wise (TransferWise)": 1,
+}
+
+
+@pytest.fixture
+def session():
+    return FixtureSession()
+
+
+@pytest.mark.parametrize('name', sorted(PROVIDER_APIS_CONFIG))
+def test_per_pair_requests_return_every_rate(name, session):
+    adapter = ProviderAdapter(name, PROVIDER_APIS_CONFIG[name])
+    rates = {pair: adapter.fetch_rate(pair, session, timeout=1) for pair in SUPPORTED_CURRENCY_PAIRS}
+
+    assert all(isinstance(rate, float) and rate > 0 for rate in rates.values())
+    assert session.request_count == len(SUPPORTED_CURRENCY_PAIRS)
+
+
+@pytest.mark.parametrize('name', sorted(PROVIDER_APIS_CONFIG))
+def test_batch_plan_returns_the_same_rates_in_fewer_requests(name):
+    adapter = ProviderAdapter(name, PROVIDER_APIS_CONFIG[name])
+    plan = adapter.plan_requests(SUPPORTED_CURRENCY_PAIRS)
+    assert len(plan) == BATCH_REQUESTS[name]
+    assert sorted(pair for item in plan for pair in (item if isinstance(item, tuple) else (item,))) \
+        == sorted(SUPPORTED_CURRENCY_PAIRS)
+
+    per_pair_session, batch_session = FixtureSession(), FixtureSession()
+    expected = {pair: adapter.fetch_rate(pair, per_pair_session, timeout=1) for pair in SUPPORTED_CURRENCY_PAIRS}
+    rates = {}
+    for item in plan:
+        if isinstance(item, tuple):
+            rates.update(adapter.fetch_batch(item, batch_session, timeout=1))
+        else:
+            rates[item] = adapter.fetch_rate(item, batch_session, timeout=1)
+
+    assert rates == expected
+    assert batch_session.request_count == BATCH_REQUESTS[name]
+
+
+def test_refresh_cycle_request_counts(monkeypatch):
+    providers = sorted(PROVIDER_APIS_CONFIG)
+    per_pair_plan = {name: list(SUPPORTED_CURRENCY_PAIRS) for name in providers}
+    batch_plan = plan_provider_requests(providers, SUPPORTED_CURRENCY_PAIRS, fetch_mode='fixtures')
+    monkeypatch.setattr(utils, 'FETCH_MODE', 'fixtures')
+
+    def run(plan):
+        session = FixtureSession()
+        rates = fetch_rates_concurrently(plan, fetch_rate_from_external_api, provider_configs=PROVIDER_APIS_CONFIG,
+                                         session=session, batch_fetch_fn=fetch_batch_from_external_api)
+        return session.request_count, rates
+
+    per_pair_requests, per_pair_rates = run(per_pair_plan)
+    batch_requests, batch_rates = run(batch_plan)
+
+    assert per_pair_requests == len(providers) * len(SUPPORTED_CURRENCY_PAIRS)
+    assert batch_requests == sum(BATCH_REQUESTS.values())
+    assert batch_rates == per_pair_rates
+    assert None not in batch_rates.values()
+
+
+def test_pairs_missing_from_a_batch_response_are_none(session):
+    adapter = ProviderAdapter("Remitly", PROVIDER_APIS_CONFIG["Remitly"])
+    assert adapter.fetch_batch(('USD_EUR', 'USD_JPY'), session, timeout=1)['USD_JPY'] is None
+
+
+def test_unrecorded_requests_raise_for_retry(session):
+    adapter = ProviderAdapter("TapTap Send", PROVIDER_APIS_CONFIG["TapTap Send"])
+    with pytest.raises(requests.HTTPError):
+        adapter.fetch_rate('USD_JPY', session, timeout=1)
+
+
+def test_compiled_paths_fill_in_currencies_and_tolerate_missing_steps():
+    extract = compile_path(["rates", "{target}"])
+    assert extract({"rates": {"EUR": 0.9}}, {"source": "USD", "target": "EUR"}) == 0.9
+    assert extract({"rates": {}}, {"source": "USD", "target": "EUR"}) is None
+    assert compile_path(["data", 0, "rate"])({"data": []}, {}) is None
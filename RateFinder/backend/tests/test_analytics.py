@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from .. import analytics
+from ..models import db, ClickDailySummary, UserActivity
+
+START = datetime(2024, 3, 1, 9, 30)
+
+
+def _add_clicks(count, first=0, action='register_click'):
+    """Writes clicks the way the click queue does: rows plus the daily summary."""
+    providers, pairs = ['Wise (TransferWise)', 'Revolut', 'Remitly'], ['USD_EUR', 'USD_GBP']
+    events = [{
+        "action": action,
+        "provider_name": providers[index % len(providers)],
+        "currency_pair_viewed": pairs[index % len(pairs)] if index % 5 else None,
+        "ip_address": '10.0.0.1',
+        "user_agent": 'pytest',
+        "timestamp": START + timedelta(hours=7 * index)
+    } for index in range(first, first + count)]
+    db.session.execute(insert(UserActivity).values(events))
+    if action == 'register_click':
+        analytics.increment_click_summary(events)
+    db.session.commit()
+
+
+def _walk(client, limit, **params):
+    ids, after_id = [], 0
+    while after_id is not None:
+        body = client.get('/api/analytics/clicks', query_string=dict(params, after_id=after_id, limit=limit)).get_json()
+        ids.extend(click['id'] for click in body['clicks'])
+        after_id = body['next_after_id']
+    return ids
+
+
+@pytest.mark.parametrize('limit', [1, 7, 25, 100])
+def test_pages_cover_every_row_once(app, client, limit):
+    with app.app_context():
+        _add_clicks(25)
+        expected = [row.id for row in UserActivity.query.order_by(UserActivity.id)]
+    assert _walk(client, limit) == expected
+
+
+def test_pages_leave_out_personal_data(app, client):
+    with app.app_context():
+        _add_clicks(3)
+    clicks = client.get('/api/analytics/clicks').get_json()['clicks']
+    assert {frozenset(click) for click in clicks} == {frozenset(analytics.PUBLIC_COLUMNS)}
+
+
+def test_cursor_is_stable_while_rows_change(app, client):
+    with app.app_context():
+        _add_clicks(20)
+        first_page = client.get('/api/analytics/clicks?limit=8').get_json()
+        seen = [click['id'] for click in first_page['clicks']]
+        # Rows removed before the cursor and rows appended after it don't shift later pages
+        UserActivity.query.filter(UserActivity.id.in_(seen[:3])).delete(synchronize_session=False)
+        db.session.commit()
+        _add_clicks(5, first=20)
+        expected = [row.id for row in UserActivity.query.filter(UserActivity.id > seen[-1]).order_by(UserActivity.id)]
+
+    after_id, rest = first_page['next_after_id'], []
+    while after_id is not None:
+        body = client.get(f'/api/analytics/clicks?limit=8&after_id={after_id}').get_json()
+        rest.extend(click['id'] for click in body['clicks'])
+        after_id = body['next_after_id']
+    assert rest == expected
+    assert not set(rest) & set(seen)
+
+
+def test_filtered_pages_match_the_filter(app, client):
+    with app.app_context():
+        _add_clicks(30)
+        expected = [row.id for row in UserActivity.query.filter_by(provider_name='Revolut').order_by(UserActivity.id)]
+    assert _walk(client, 4, provider='Revolut') == expected
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/api/analytics/clicks?after_id=abc').status_code == 400
+
+
+def test_iter_activity_streams_the_same_rows(app):
+    with app.app_context():
+        _add_clicks(11)
+        rows = list(analytics.iter_activity(page_size=4, columns=analytics.PUBLIC_COLUMNS))
+        assert [row[0] for row in rows] == [row.id for row in UserActivity.query.order_by(UserActivity.id)]
+
+
+def test_rebuild_click_summary_matches_the_maintained_summary(app, client):
+    with app.app_context():
+        _add_clicks(40)
+        _add_clicks(6, first=40, action='view') # Not clicks; neither path counts them
+    maintained = client.get('/api/analytics/clicks/summary').get_json()
+    assert sum(row['clicks'] for row in maintained) == 40
+
+    with app.app_context():
+        ClickDailySummary.query.filter(ClickDailySummary.day < '2024-03-05').delete()
+        db.session.commit()
+    assert client.get('/api/analytics/clicks/summary').get_json() != maintained
+
+    result = app.test_cli_runner().invoke(args=['rebuild-click-summary'])
+    assert result.exit_code == 0
+    assert f'{len(maintained)} rows' in result.output
+    assert client.get('/api/analytics/clicks/summary').get_json() == maintained
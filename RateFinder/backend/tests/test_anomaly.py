@@ -0,0 +1,105 @@
+from ..anomaly import HISTORY, INVALID, MEDIAN, RateValidator
+
+PROVIDERS = (1, 2, 3, 4)
+
+
+def _cycle(validator, rates, pair='USD_NGN'):
+    """Validates one cycle of {provider_id: rate}. Returns (accepted {provider_id: rate}, rejections by provider)."""
+    accepted, rejections = validator.validate([(provider_id, pair, rate) for provider_id, rate in rates.items()])
+    return ({provider_id: rate for provider_id, _, rate in accepted},
+            {rejection['provider_id']: rejection for rejection in rejections})
+
+
+def _warm_up(validator, level=1000.0, cycles=10):
+    validator.prime([(provider_id, 'USD_NGN', level) for provider_id in PROVIDERS])
+    for step in range(cycles):
+        _cycle(validator, {provider_id: level * (1 + 0.0001 * ((step + provider_id) % 3 - 1)) for provider_id in PROVIDERS})
+
+
+def test_all_providers_moving_together_is_accepted():
+    validator = RateValidator()
+    _warm_up(validator)
+
+    accepted, rejected = _cycle(validator, {provider_id: 1300.0 + provider_id for provider_id in PROVIDERS})
+    assert rejected == {}
+    assert sorted(accepted) == list(PROVIDERS)
+
+    # The new level is the reference from now on, not a huge return in the history
+    accepted, rejected = _cycle(validator, {provider_id: 1301.0 for provider_id in PROVIDERS})
+    assert rejected == {}
+    assert validator.stats()['quarantined'] == []
+
+
+def test_market_move_is_accepted_after_a_restart_primed_with_old_rates():
+    validator = RateValidator()
+    validator.prime([(provider_id, 'USD_NGN', 1000.0) for provider_id in PROVIDERS])
+    accepted, rejected = _cycle(validator, {provider_id: 1300.0 for provider_id in PROVIDERS})
+    assert rejected == {} and len(accepted) == len(PROVIDERS)
+
+
+def test_one_provider_off_the_market_is_quarantined():
+    validator = RateValidator()
+    _warm_up(validator)
+    accepted, rejected = _cycle(validator, {1: 1000.0, 2: 1001.0, 3: 999.0, 4: 1.0 / 1000})
+    assert sorted(accepted) == [1, 2, 3]
+    assert rejected[4]['reason'] == MEDIAN
+    assert rejected[4]['reference'] == 1000.0
+
+
+def test_missing_peers_count_with_their_last_accepted_rate():
+    validator = RateValidator()
+    _warm_up(validator)
+    # Only provider 4 is fetched this cycle; its peers are still at ~1000
+    accepted, rejected = _cycle(validator, {4: 1300.0})
+    assert rejected[4]['reason'] == MEDIAN
+
+
+def test_median_quarantine_is_promoted_after_consistent_ticks():
+    validator = RateValidator(median_confirmations=3)
+    _warm_up(validator)
+    for _ in range(2):
+        _, rejected = _cycle(validator, {1: 1000.0, 2: 1000.0, 3: 1000.0, 4: 1150.0})
+        assert rejected[4]['reason'] == MEDIAN
+    accepted, rejected = _cycle(validator, {1: 1000.0, 2: 1000.0, 3: 1000.0, 4: 1151.0})
+    assert accepted[4] == 1151.0 and rejected == {}
+    assert validator.stats()['promoted'] == 1
+
+
+def test_inconsistent_median_outliers_are_not_promoted():
+    validator = RateValidator(median_confirmations=3)
+    _warm_up(validator)
+    for rate in (1150.0, 1500.0, 1150.0, 1500.0):
+        _, rejected = _cycle(validator, {1: 1000.0, 2: 1000.0, 3: 1000.0, 4: rate})
+        assert 4 in rejected
+    assert validator.stats()['promoted'] == 0
+
+
+def test_history_outlier_without_peers_is_promoted_after_confirmations():
+    validator = RateValidator(quarantine_confirmations=3)
+    for step in range(10):
+        _cycle(validator, {1: 1000.0 * (1 + 0.0001 * (step % 2))}, pair='USD_XOF')
+    for _ in range(2):
+        _, rejected = _cycle(validator, {1: 1100.0}, pair='USD_XOF')
+        assert rejected[1]['reason'] == HISTORY
+    accepted, _ = _cycle(validator, {1: 1100.0}, pair='USD_XOF')
+    assert accepted == {1: 1100.0}
+
+
+def test_invalid_rates_are_never_promoted():
+    validator = RateValidator(quarantine_confirmations=2, median_confirmations=2)
+    for _ in range(5):
+        accepted, rejected = _cycle(validator, {1: float('nan'), 2: -1.0, 3: 0})
+        assert accepted == {}
+        assert {rejection['reason'] for rejection in rejected.values()} == {INVALID}
+
+
+def test_order_within_a_cycle_does_not_matter():
+    rows = [(1, 'USD_NGN', 1300.0), (2, 'USD_NGN', 1301.0), (3, 'USD_NGN', 1299.0), (4, 'USD_NGN', 1.0)]
+    results = []
+    for ordered in (rows, rows[::-1]):
+        validator = RateValidator()
+        _warm_up(validator)
+        accepted, rejections = validator.validate(ordered)
+        results.append((sorted(accepted), sorted(r['provider_id'] for r in rejections)))
+    assert results[0] == results[1]
+    assert results[0][1] == [4]
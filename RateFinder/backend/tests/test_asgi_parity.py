@@ -0,0 +1,79 @@
+# The Starlette app (asgi.py) must answer like the Flask blueprint: the same requests
+# go through both apps against one database and must get the same status and body.
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('httpx') # Needed by starlette.testclient
+from starlette.testclient import TestClient
+
+from .. import asgi
+from ..cache import rate_cache
+from ..models import UserActivity, ClickDailySummary
+
+REQUESTS = [
+    ('GET', '/', None),
+    ('GET', '/api/currency-pairs', None),
+    ('GET', '/api/rates/USD_EUR', None),
+    ('GET', '/api/rates/usd_gbp', None),
+    ('GET', '/api/rates/AAA_BBB', None),
+    ('POST', '/api/track-click', {'json': {'provider': 'Wise', 'currency_pair_viewed': 'USD_EUR'}}),
+    ('POST', '/api/track-click', {'json': {'currency_pair_viewed': 'USD_EUR'}}),
+    ('POST', '/api/track-click', {'json': ['Wise']}),
+    ('POST', '/api/track-click', {'json': 'Wise'}),
+    ('POST', '/api/track-click', {'content': b'{not json', 'headers': {'Content-Type': 'application/json'}}),
+]
+
+
+def _flask_kwargs(kwargs):
+    kwargs = dict(kwargs or {})
+    if 'content' in kwargs:
+        kwargs['data'] = kwargs.pop('content')
+    return kwargs
+
+
+def _body(response, data):
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        return response.json() if callable(response.json) else response.json
+    return data
+
+
+@pytest.fixture
+def clients(app, monkeypatch):
+    rate_cache.invalidate()
+    database = asgi.AsyncDatabase(app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):])
+    monkeypatch.setattr(asgi, 'database', database)
+    monkeypatch.setattr(asgi, 'click_buffer', asgi.AsyncClickBuffer(database))
+    with TestClient(asgi.app) as asgi_client:
+        yield app.test_client(), asgi_client
+    rate_cache.invalidate()
+
+
+@pytest.mark.parametrize('buffered', [True, False])
+@pytest.mark.parametrize('method, path, kwargs', REQUESTS)
+def test_routes_answer_like_the_flask_app(app, clients, monkeypatch, buffered, method, path, kwargs):
+    app.config['CLICK_BUFFER_ENABLED'] = buffered
+    monkeypatch.setattr(asgi, 'CLICK_BUFFER_ENABLED', buffered)
+    flask_client, asgi_client = clients
+
+    expected = flask_client.open(path, method=method, **_flask_kwargs(kwargs))
+    actual = asgi_client.request(method, path, **(kwargs or {}))
+
+    assert actual.status_code == expected.status_code
+    assert _body(actual, actual.text) == _body(expected, expected.get_data(as_text=True))
+
+
+def test_unbuffered_clicks_write_the_same_rows(app, clients, monkeypatch):
+    app.config['CLICK_BUFFER_ENABLED'] = False
+    monkeypatch.setattr(asgi, 'CLICK_BUFFER_ENABLED', False)
+    flask_client, asgi_client = clients
+    click = {'provider': 'Wise', 'currency_pair_viewed': 'USD_EUR'}
+
+    assert flask_client.post('/api/track-click', json=click).status_code == 200
+    assert asgi_client.post('/api/track-click', json=click).status_code == 200
+
+    with app.app_context():
+        rows = [(row.action, row.provider_name, row.currency_pair_viewed) for row in UserActivity.query.all()]
+        assert rows == [('register_click', 'Wise', 'USD_EUR')] * 2
+        assert [(row.provider_name, row.currency_pair, row.clicks) for row in ClickDailySummary.query.all()] \
+            == [('Wise', 'USD_EUR', 2)]
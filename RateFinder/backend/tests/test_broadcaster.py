@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from .. import app as app_module
+from ..broadcaster import RateBroadcaster
+
+
+def _change(rate):
+    return [{"provider": 'Wise', "rate": rate}]
+
+
+def test_subscribers_only_get_their_pairs():
+    broadcaster = RateBroadcaster()
+    usd_eur, both = broadcaster.subscribe({'USD_EUR'}), broadcaster.subscribe({'USD_EUR', 'USD_GBP'})
+
+    broadcaster.publish({'USD_GBP': _change(0.79)})
+    assert usd_eur.get(timeout=0) is None
+    assert both.get(timeout=0) == {'currency_pair': 'USD_GBP', 'changes': _change(0.79)}
+    assert broadcaster.stats()['events_delivered'] == 1
+
+
+def test_slow_subscriber_is_evicted_without_blocking_the_others():
+    broadcaster = RateBroadcaster(max_queue=2)
+    slow, fast = broadcaster.subscribe({'USD_EUR'}), broadcaster.subscribe({'USD_EUR'})
+
+    for rate in (0.91, 0.92):
+        broadcaster.publish({'USD_EUR': _change(rate)})
+        assert fast.get(timeout=0)['changes'] == _change(rate)
+    broadcaster.publish({'USD_EUR': _change(0.93)}) # slow's queue is full
+
+    assert slow.evicted and not fast.evicted
+    assert slow.queue.qsize() == 2 # Bounded: the overflowing event was never queued
+    assert fast.get(timeout=0)['changes'] == _change(0.93)
+
+    # What was queued is still delivered, then the subscriber learns it was dropped
+    assert [slow.get(timeout=0)['changes'] for _ in range(2)] == [_change(0.91), _change(0.92)]
+    with pytest.raises(LookupError):
+        slow.get(timeout=0)
+
+    broadcaster.publish({'USD_EUR': _change(0.94)})
+    assert slow.queue.empty()
+    stats = broadcaster.stats()
+    assert (stats['subscribers'], stats['subscribers_evicted']) == (1, 1)
+
+
+def test_unsubscribe_releases_every_pair():
+    broadcaster = RateBroadcaster()
+    subscription = broadcaster.subscribe({'USD_EUR', 'USD_GBP'})
+    broadcaster.unsubscribe(subscription)
+    broadcaster.unsubscribe(subscription) # Idempotent, e.g. after an eviction
+    assert broadcaster.stats()['subscribers'] == 0
+    assert broadcaster.stats()['pairs_watched'] == 0
+
+
+@pytest.mark.parametrize('pairs', ['', ',, ,', ','.join(f'P{index}_EUR' for index in range(51))])
+def test_stream_rejects_missing_or_too_many_pairs(client, pairs):
+    response = client.get(f'/api/stream/rates?pairs={pairs}')
+    assert response.status_code == 400
+    assert 'pairs' in response.get_json()['error']
+
+
+def test_stream_sends_changes_then_the_eviction(client, monkeypatch):
+    broadcaster = RateBroadcaster(max_queue=1)
+    monkeypatch.setattr(app_module, 'rate_broadcaster', broadcaster)
+    monkeypatch.setattr(app_module, 'SSE_HEARTBEAT_SECONDS', 0.05)
+
+    response = client.get('/api/stream/rates?pairs=usd_eur, USD_EUR', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 5000\n\n'
+    assert broadcaster.stats()['pairs_watched'] == 1
+
+    assert next(chunks) == b': keepalive\n\n'
+    broadcaster.publish({'USD_EUR': _change(0.91)})
+    broadcaster.publish({'USD_EUR': _change(0.92)}) # Nobody read the first one yet
+    assert next(chunks) == b'event: rates\ndata: ' + json.dumps(
+        {'currency_pair': 'USD_EUR', 'changes': _change(0.91)}).encode() + b'\n\n'
+    assert next(chunks) == b'event: evicted\ndata: {}\n\n'
+    with pytest.raises(StopIteration):
+        next(chunks)
+    response.close()
+    assert broadcaster.stats()['subscribers'] == 0
@@ -0,0 +1,83 @@
+import pytest
+
+from .. import utils
+from ..cache import RateResponseCache, rate_cache
+from ..models import db, ExchangeRate
+
+
+@pytest.fixture(autouse=True)
+def empty_rate_cache():
+    # rate_cache is process-wide; don't let responses from another test's database leak in
+    rate_cache.invalidate()
+    yield
+    rate_cache.invalidate()
+
+
+def test_put_against_an_old_version_is_served_but_not_kept():
+    cache = RateResponseCache()
+    version = cache.version
+    cache.invalidate() # A refresh committed while the response was being built
+
+    entry = cache.put('USD_EUR', version, '[]')
+    assert entry.body == '[]'
+    assert cache.get('USD_EUR') is None
+
+    cache.put('USD_EUR', cache.version, '[]')
+    assert cache.get('USD_EUR').body == '[]'
+    cache.invalidate()
+    assert cache.get('USD_EUR') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RateResponseCache(max_entries=2)
+    cache.put('USD_EUR', cache.version, '"a"')
+    cache.put('USD_GBP', cache.version, '"b"')
+    cache.get('USD_EUR') # Now USD_GBP is the oldest
+    cache.put('EUR_GBP', cache.version, '"c"')
+
+    assert cache.get('USD_GBP') is None
+    assert cache.get('USD_EUR') is not None
+    assert cache.get('EUR_GBP') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_etag_depends_only_on_the_body():
+    first, second = RateResponseCache(), RateResponseCache()
+    second.invalidate()
+    tag = first.put('USD_EUR', first.version, '[1]').etag
+    assert second.put('USD_EUR', second.version, '[1]').etag == tag
+    assert first.put('USD_EUR', first.version, '[2]').etag != tag
+
+
+def test_rates_are_served_from_cache_with_a_matching_etag(client):
+    first = client.get('/api/rates/USD_EUR')
+    assert first.status_code == 200
+    etag = first.headers['ETag'].strip('"')
+
+    second = client.get('/api/rates/usd_eur')
+    assert second.get_data() == first.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert client.get('/api/cache/stats').get_json()['hits'] == 1
+
+    not_modified = client.get('/api/rates/USD_EUR', headers={'If-None-Match': f'"{etag}"'})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+    assert not_modified.headers['ETag'] == first.headers['ETag']
+
+
+def test_refresh_invalidates_cached_responses_and_etags(app, client):
+    first = client.get('/api/rates/USD_EUR')
+    etag = first.headers['ETag']
+
+    with app.app_context():
+        row = ExchangeRate.query.filter_by(currency_pair='USD_EUR').order_by(ExchangeRate.rate).first()
+        new_rate = row.rate - 0.01
+        changed = [(row.provider_id, 'USD_EUR', new_rate)]
+        summary = utils.bulk_upsert_exchange_rates(changed)
+        db.session.commit()
+        utils.apply_rate_changes(changed, {row.provider_id: row.provider}, summary['written_at'])
+
+    refreshed = client.get('/api/rates/USD_EUR', headers={'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers['ETag'] != etag
+    assert refreshed.get_json()[0]['rate'] == new_rate
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from .. import utils
+from ..broadcaster import rate_broadcaster
+from ..cache import rate_cache
+from ..change_feed import RateChangeFeed
+from ..models import db, ExchangeRate
+
+
+def _commit_refresh(feed, changed_rows):
+    """What another worker's refresh job leaves behind: new rates plus a feed row."""
+    written_at = datetime.utcnow()
+    for provider_id, currency_pair, rate in changed_rows:
+        ExchangeRate.query.filter_by(provider_id=provider_id, currency_pair=currency_pair).update(
+            {'rate': rate, 'last_updated': written_at})
+    version = feed.record(changed_rows, written_at)
+    db.session.commit()
+    return version
+
+
+def test_poll_skips_own_refreshes_and_returns_others(app):
+    with app.app_context():
+        ours, theirs = RateChangeFeed(), RateChangeFeed()
+        assert ours.poll() == [] # First poll only finds the starting point
+        _commit_refresh(ours, [(1, 'USD_EUR', 0.93)])
+        _commit_refresh(theirs, [(2, 'USD_EUR', 0.94)])
+        _commit_refresh(ours, [])
+
+        refreshes = ours.poll()
+        assert [changed for _, _, changed in refreshes] == [[(2, 'USD_EUR', 0.94)]]
+        assert ours.poll() == []
+
+
+def test_poll_reports_a_gap_after_pruning(app):
+    with app.app_context():
+        reader, writer = RateChangeFeed(), RateChangeFeed(keep=2)
+        reader.poll()
+        for rate in (0.93, 0.94, 0.95, 0.96):
+            _commit_refresh(writer, [(1, 'USD_EUR', rate)])
+        assert reader.poll() is None
+        assert reader.stats()['resyncs'] == 1
+        assert reader.poll() == []
+
+
+def test_sync_applies_other_workers_refreshes(app, monkeypatch):
+    monkeypatch.setattr(utils, 'rate_change_feed', RateChangeFeed())
+    applied = []
+    monkeypatch.setattr(utils, 'rate_change_listeners', [applied.extend])
+    client = app.test_client()
+    subscription = rate_broadcaster.subscribe({'USD_EUR'})
+    try:
+        with app.app_context():
+            utils.sync_rate_changes()
+            assert client.get('/api/rates/USD_EUR').status_code == 200
+            version = rate_cache.version
+
+            _commit_refresh(RateChangeFeed(), [(1, 'USD_EUR', 0.5)])
+            assert utils.sync_rate_changes() == 1
+
+        assert rate_cache.version == version + 1
+        assert applied == [(1, 'USD_EUR', 0.5)]
+        assert subscription.get(timeout=1)['changes'][0]['rate'] == 0.5
+        assert client.get('/api/rates/USD_EUR').json[0]['rate'] == 0.5
+    finally:
+        rate_broadcaster.unsubscribe(subscription)
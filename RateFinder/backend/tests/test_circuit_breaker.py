@@ -0,0 +1,127 @@
+import pytest
+
+from .. import utils
+from ..circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderBreakers
+from ..freshness import RateRevalidator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('test-provider', failure_threshold=3, reset_timeout=60.0, clock=clock)
+
+
+def _trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_opens_after_threshold_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success() # Resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_lets_exactly_one_trial_through(breaker, clock):
+    _trip(breaker)
+    clock.advance(59.9)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.advance(0.1)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow() # Trial in flight
+    assert not breaker.allow()
+
+
+def test_successful_trial_closes(breaker, clock):
+    _trip(breaker)
+    clock.advance(60)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.stats()['consecutive_failures'] == 0
+
+
+def test_failed_trial_reopens_for_another_timeout(breaker, clock):
+    _trip(breaker)
+    clock.advance(60)
+    assert breaker.allow()
+    breaker.record_failure() # One failure is enough in half-open
+    assert breaker.state == OPEN
+    assert breaker.stats()['retry_in_seconds'] == 60.0
+
+    clock.advance(30)
+    assert not breaker.allow()
+    clock.advance(30)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_provider_breakers_use_provider_config(clock):
+    breakers = ProviderBreakers(clock=clock)
+    breaker = breakers.get('Remitly', {'failure_threshold': 1, 'reset_timeout': 5.0})
+    assert breakers.get('Remitly') is breaker
+    breaker.record_failure()
+    assert breakers.is_open('Remitly')
+    clock.advance(5)
+    assert not breakers.is_open('Remitly') # Half-open counts as not open
+    assert not breakers.is_open('Unknown')
+
+
+class FakeLock:
+    def __init__(self, granted):
+        self.granted = granted
+        self.calls = []
+
+    def acquire(self, name, ttl, now=None):
+        self.calls.append(('acquire', name))
+        return name in self.granted
+
+    def hold_until(self, name, expires_at):
+        self.calls.append(('hold_until', name))
+
+    def release(self, name):
+        self.calls.append(('release', name))
+
+
+def test_revalidation_only_refreshes_providers_whose_lease_it_gets(app, monkeypatch, clock):
+    refreshed = []
+    monkeypatch.setattr(utils, 'update_all_rates_from_apis', lambda provider_names: refreshed.append(provider_names))
+    lock = FakeLock(granted={'job:refresh:Revolut'})
+    revalidator = RateRevalidator(clock=clock, breakers=ProviderBreakers(clock=clock), lock=lock)
+    revalidator.init_app(app)
+
+    revalidator._run(['Remitly', 'Revolut'])
+    assert refreshed == [['Revolut']]
+    assert ('hold_until', 'job:refresh:Revolut') in lock.calls
+    assert revalidator.stats()['skipped_locked'] == 1
+
+    lock.granted = set()
+    revalidator._run(['Revolut'])
+    assert refreshed == [['Revolut']]
@@ -0,0 +1,125 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from ..app import init_db_with_data
+from ..click_buffer import ClickIngestQueue, get_click_queue
+from ..models import UserActivity
+
+
+def _click(index):
+    return {
+        "action": 'register_click',
+        "provider_name": f'provider-{index}',
+        "currency_pair_viewed": 'USD_EUR',
+        "ip_address": '127.0.0.1',
+        "user_agent": 'pytest',
+        "timestamp": datetime.utcnow()
+    }
+
+
+def _stored_providers(flask_app):
+    with flask_app.app_context():
+        return sorted(row.provider_name for row in UserActivity.query.all())
+
+
+@pytest.fixture
+def make_queue(app):
+    """ClickIngestQueues bound to the test app whose worker only flushes full batches."""
+    queues = []
+
+    def make(**options):
+        options.setdefault('flush_interval', 60)
+        queue = ClickIngestQueue(app, **options)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.shutdown()
+
+
+def test_full_queue_rejects_new_events(app, make_queue):
+    queue = make_queue(max_pending=2, batch_size=10)
+    assert queue.submit(_click(1))
+    assert queue.submit(_click(2))
+    assert not queue.submit(_click(3))
+
+    assert queue.flush() == 2
+    assert _stored_providers(app) == ['provider-1', 'provider-2']
+    assert (queue.stats()['accepted'], queue.stats()['rejected']) == (2, 1)
+
+
+def test_full_queue_drops_the_oldest_event(app, make_queue):
+    queue = make_queue(max_pending=2, batch_size=10, drop_policy='drop_oldest')
+    for index in (1, 2, 3):
+        assert queue.submit(_click(index))
+
+    assert queue.flush() == 2
+    assert _stored_providers(app) == ['provider-2', 'provider-3']
+    assert queue.stats()['dropped_oldest'] == 1
+
+
+def test_unknown_drop_policy_is_refused():
+    with pytest.raises(ValueError):
+        ClickIngestQueue(drop_policy='drop_newest')
+
+
+def test_full_batch_is_flushed_without_waiting_for_the_interval(app, make_queue):
+    queue = make_queue(batch_size=3)
+    for index in range(7):
+        queue.submit(_click(index))
+
+    deadline = time.monotonic() + 5
+    while queue.stats()['written'] < 6 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue.stats()['written'] >= 6 # The remainder may wait for the interval or the next batch
+
+    queue.flush()
+    stats = queue.stats()
+    assert (stats['written'], stats['pending']) == (7, 0)
+    assert stats['batches'] >= 3
+    assert len(_stored_providers(app)) == 7
+
+
+def test_shutdown_writes_whatever_is_queued(app, make_queue):
+    queue = make_queue(batch_size=100)
+    queue.submit(_click(1))
+    queue.submit(_click(2))
+
+    queue.shutdown()
+    assert not queue._thread.is_alive()
+    assert _stored_providers(app) == ['provider-1', 'provider-2']
+
+
+def test_each_app_writes_through_its_own_queue(make_app):
+    first, second = make_app('first.db'), make_app('second.db')
+    init_db_with_data(first)
+    init_db_with_data(second)
+    assert get_click_queue(first) is not get_click_queue(second)
+
+    get_click_queue(first).submit(_click(1))
+    get_click_queue(second).submit(_click(2))
+    get_click_queue(first).shutdown()
+    get_click_queue(second).shutdown()
+
+    assert _stored_providers(first) == ['provider-1']
+    assert _stored_providers(second) == ['provider-2']
+
+
+def test_buffered_track_click_is_queued_on_the_app(app, client):
+    app.config['CLICK_BUFFER_ENABLED'] = True
+    response = client.post('/api/track-click', json={"provider": 'Wise', "currency_pair_viewed": 'USD_EUR'})
+    assert response.status_code == 202
+    assert client.get('/api/track-click/stats').get_json()['accepted'] == 1
+
+    get_click_queue(app).shutdown()
+    assert _stored_providers(app) == ['Wise']
+
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"Wise"', '3', 'null', '{not json'])
+def test_track_click_rejects_bodies_that_are_not_objects(client, body):
+    response = client.post('/api/track-click', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
@@ -0,0 +1,158 @@
+# fetch_rates_concurrently against a stub provider API on 127.0.0.1. Each provider's
+# requests are delayed by its own amount, so the tests can tell overlap from sums.
+
+import json
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ..fetcher import fetch_rates_concurrently
+
+
+class StubProviders:
+    """Serves GET /<provider>/<pair> as {"rate": 1.0} after the provider's delay."""
+
+    def __init__(self):
+        self.delays = {}
+        self.failures = {}          # provider -> attempts per pair answered with a 500 first
+        self.requests = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def handle(self, handler):
+        _, provider, pair = handler.path.split('/')
+        with self.lock:
+            self.requests[(provider, pair)] += 1
+            attempt = self.requests[(provider, pair)]
+            self.in_flight[provider] += 1
+            self.peak[provider] = max(self.peak[provider], self.in_flight[provider])
+        try:
+            time.sleep(self.delays.get(provider, 0))
+            if attempt <= self.failures.get(provider, 0):
+                handler.send_response(500)
+                body = b'{}'
+            else:
+                handler.send_response(200)
+                body = json.dumps({'rate': 1.0}).encode()
+            handler.send_header('Content-Type', 'application/json')
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # The client timed out and hung up
+        finally:
+            with self.lock:
+                self.in_flight[provider] -= 1
+
+
+@pytest.fixture
+def stub():
+    providers = StubProviders()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            providers.handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    providers.base_url = 'http://127.0.0.1:%d' % server.server_address[1]
+    yield providers
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def _fetch_fn(base_url):
+    def fetch(provider_name, pair, config=None, session=None, timeout=None):
+        response = session.get(f'{base_url}/{provider_name}/{pair}', timeout=timeout)
+        response.raise_for_status()
+        return response.json()['rate']
+    return fetch
+
+
+PAIRS = ['USD_EUR', 'USD_GBP', 'EUR_GBP', 'GBP_USD']
+
+
+def test_wall_time_follows_the_slowest_provider(stub, session):
+    stub.delays = {'fast': 0.1, 'medium': 0.2, 'slow': 0.4}
+    configs = {name: {'max_concurrency': len(PAIRS)} for name in stub.delays}
+
+    started = time.perf_counter()
+    results = fetch_rates_concurrently({name: PAIRS for name in stub.delays}, _fetch_fn(stub.base_url),
+                                       provider_configs=configs, session=session)
+    elapsed = time.perf_counter() - started
+
+    assert results == {(name, pair): 1.0 for name in stub.delays for pair in PAIRS}
+    # Sequential providers would take 0.7s, sequential requests 2.8s
+    assert 0.4 <= elapsed < 0.65
+
+
+def test_per_provider_max_concurrency_is_respected(stub, session):
+    stub.delays = {'narrow': 0.1, 'wide': 0.1}
+    pairs = [f'P{index}_EUR' for index in range(6)]
+    configs = {'narrow': {'max_concurrency': 2}, 'wide': {'max_concurrency': 6}}
+
+    results = fetch_rates_concurrently({'narrow': pairs, 'wide': pairs}, _fetch_fn(stub.base_url),
+                                       provider_configs=configs, session=session)
+
+    assert all(rate == 1.0 for rate in results.values())
+    assert stub.peak['narrow'] == 2
+    assert stub.peak['wide'] == 6
+
+
+def test_errors_are_retried_with_backoff(stub, session):
+    stub.failures = {'flaky': 2}
+    configs = {'flaky': {'retries': 2, 'backoff': 0.05}}
+
+    started = time.perf_counter()
+    results = fetch_rates_concurrently({'flaky': ['USD_EUR']}, _fetch_fn(stub.base_url),
+                                       provider_configs=configs, session=session)
+    elapsed = time.perf_counter() - started
+
+    assert results == {('flaky', 'USD_EUR'): 1.0}
+    assert stub.requests[('flaky', 'USD_EUR')] == 3
+    # Backoff sleeps at least 0.05s then 0.1s between the three attempts
+    assert elapsed >= 0.15
+
+
+def test_timeouts_give_up_after_the_last_retry(stub, session):
+    stub.delays = {'hung': 1.0, 'healthy': 0}
+    configs = {'hung': {'timeout': 0.1, 'retries': 1, 'backoff': 0.01}}
+
+    started = time.perf_counter()
+    results = fetch_rates_concurrently({'hung': ['USD_EUR'], 'healthy': ['USD_EUR']}, _fetch_fn(stub.base_url),
+                                       provider_configs=configs, session=session)
+    elapsed = time.perf_counter() - started
+
+    assert results == {('hung', 'USD_EUR'): None, ('healthy', 'USD_EUR'): 1.0}
+    assert stub.requests[('hung', 'USD_EUR')] == 2
+    assert elapsed < 0.8
+
+
+def test_deadline_reports_in_flight_work_as_failed(stub, session):
+    stub.delays = {'slow': 1.0, 'fast': 0}
+    configs = {'slow': {'retries': 0}}
+
+    started = time.perf_counter()
+    results = fetch_rates_concurrently({'slow': PAIRS, 'fast': ['USD_EUR']}, _fetch_fn(stub.base_url),
+                                       provider_configs=configs, session=session, deadline=0.2)
+    elapsed = time.perf_counter() - started
+
+    assert results[('fast', 'USD_EUR')] == 1.0
+    assert all(results[('slow', pair)] is None for pair in PAIRS)
+    assert elapsed < 0.6
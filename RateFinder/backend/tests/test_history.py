@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from ..history import choose_resolution, get_history, prune_history, record_rates, to_epoch
+from ..models import db, RateHistory, RateRollup
+
+PAIR = 'AAA_BBB' # Not seeded, so only the ticks recorded here exist
+
+
+def _hour_ago():
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    return now.replace(minute=0) - timedelta(hours=1)
+
+
+def test_choose_resolution_keeps_buckets_per_point_bounded():
+    now_ts = to_epoch(datetime.utcnow())
+    day, month, years = 86400, 30 * 86400, 3 * 365 * 86400
+
+    assert choose_resolution(now_ts - day, now_ts, 500, now_ts) == ('1m', 60)
+    assert choose_resolution(now_ts - month, now_ts, 500, now_ts) == ('1h', 3600)
+    assert choose_resolution(now_ts - years, now_ts, 500, now_ts) == ('1d', 86400)
+
+
+def test_choose_resolution_skips_rollups_pruned_before_the_start():
+    now_ts = to_epoch(datetime.utcnow())
+    start = now_ts - 10 * 86400 # Past the 7-day '1m' retention
+    assert choose_resolution(start, start + 3600, 500) == ('1m', 60)
+    assert choose_resolution(start, start + 3600, 500, now_ts) == ('1h', 3600)
+
+
+def test_adjacent_buckets_merge_into_ohlc_points(app):
+    base = _hour_ago()
+    with app.app_context():
+        for offset, rate in ((0, 1.0), (30, 1.5), (70, 0.8), (130, 1.2), (190, 1.1)):
+            record_rates([(1, PAIR, rate)], recorded_at=base + timedelta(seconds=offset))
+        db.session.commit()
+
+        resolution, series = get_history(PAIR, base, base + timedelta(seconds=239), max_points=2)
+
+    assert resolution == '2x1m'
+    start = to_epoch(base)
+    assert series == {1: [
+        {"bucket_start": start, "open": 1.0, "high": 1.5, "low": 0.8, "close": 0.8, "sample_count": 3},
+        {"bucket_start": start + 120, "open": 1.2, "high": 1.2, "low": 1.1, "close": 1.1, "sample_count": 2},
+    ]}
+
+
+def test_points_are_clamped_to_the_limit(app):
+    base = _hour_ago() - timedelta(hours=23)
+    with app.app_context():
+        record_rates([(1, PAIR, 1.0)], recorded_at=base)
+        db.session.commit()
+        # 4000 one-minute buckets need two per point at the 2000-point limit
+        resolution, _ = get_history(PAIR, base, base + timedelta(minutes=3999), max_points=10 ** 6)
+    assert resolution == '2x1m'
+
+
+@pytest.mark.parametrize('points', ['0', '-5', 'many'])
+def test_history_rejects_points_that_are_not_positive_integers(client, points):
+    response = client.get(f'/api/rates/USD_EUR/history?points={points}')
+    assert response.status_code == 400
+    assert 'points' in response.get_json()['error']
+
+
+def test_history_endpoint_returns_series_by_provider_name(app, client):
+    base = _hour_ago()
+    with app.app_context():
+        record_rates([(1, PAIR, 1.0), (2, PAIR, 2.0)], recorded_at=base)
+        db.session.commit()
+
+    end = (base + timedelta(minutes=30)).isoformat()
+    body = client.get(f'/api/rates/{PAIR}/history?start={base.isoformat()}&end={end}&provider=Revolut').get_json()
+    assert body['resolution'] == '1m'
+    assert body['series'] == [{"provider": 'Revolut', "points": [{
+        "bucket_start": base.isoformat(), "open": 2.0, "high": 2.0, "low": 2.0, "close": 2.0, "sample_count": 1
+    }]}]
+
+
+def test_prune_applies_each_retention_window(app):
+    now = datetime.utcnow()
+    with app.app_context():
+        for days in (400, 40, 10, 0):
+            record_rates([(1, PAIR, 1.0)], recorded_at=now - timedelta(days=days))
+        db.session.commit()
+
+        assert prune_history(now=now) == {'raw': 2, '1m': 3, '1h': 1}
+        assert RateHistory.query.count() == 2
+        remaining = {}
+        for row in RateRollup.query.all():
+            remaining[row.resolution] = remaining.get(row.resolution, 0) + 1
+        assert remaining == {'1m': 1, '1h': 3, '1d': 4} # Daily rollups are never pruned
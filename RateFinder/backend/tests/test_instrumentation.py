@@ -0,0 +1,111 @@
+import io
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from ..instrumentation import (PROMETHEUS_CONTENT_TYPE, MetricsRegistry, configure_logging,
+                               instrument_sqlalchemy_engine)
+
+
+def test_counter_adds_per_label_set_and_renders_escaped_labels():
+    metrics = MetricsRegistry()
+    requests = metrics.counter('requests_total', 'Requests served', ('route',))
+    requests.inc('/a')
+    requests.inc('/a', amount=2)
+    requests.inc('say "hi"\n')
+
+    assert requests.value('/a') == 3
+    assert requests.value('/b') == 0
+    assert metrics.counter('requests_total', 'ignored') is requests
+    assert metrics.render().splitlines() == [
+        '# HELP requests_total Requests served',
+        '# TYPE requests_total counter',
+        'requests_total{route="/a"} 3',
+        'requests_total{route="say \\"hi\\"\\n"} 1',
+    ]
+
+
+def test_a_name_keeps_its_metric_type():
+    metrics = MetricsRegistry()
+    metrics.counter('jobs', 'Jobs')
+    with pytest.raises(ValueError):
+        metrics.histogram('jobs', 'Jobs')
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    metrics = MetricsRegistry()
+    latency = metrics.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    assert latency.count() == 4
+    assert metrics.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2', # A value on a bound counts in that bucket
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 3.65',
+        'latency_seconds_count 4',
+    ]
+
+
+def test_labelled_histogram_puts_le_last():
+    metrics = MetricsRegistry()
+    metrics.histogram('fetch_seconds', 'Fetches', ('provider',), buckets=(1.0,)).observe(0.5, 'Wise')
+    assert 'fetch_seconds_bucket{provider="Wise",le="1.0"} 1' in metrics.render().splitlines()
+
+
+def test_metrics_endpoint_serves_the_exposition_format(client):
+    client.get('/api/rates/USD_EUR')
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == PROMETHEUS_CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/rates/<currency_pair>",status="200"}' in body
+    assert '# TYPE db_queries_total counter' in body
+
+
+def test_failed_statements_leave_no_timing_state_on_the_connection():
+    metrics = MetricsRegistry()
+    engine = create_engine('sqlite://')
+    instrument_sqlalchemy_engine(engine, metrics=metrics)
+    query_seconds = metrics.histogram('db_query_duration_seconds', '')
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM missing_table'))
+        conn.execute(text('SELECT 1'))
+        assert not [key for key in conn.info if key.startswith('_metrics')]
+
+    assert metrics.counter('db_queries_total', '').value() == 1
+    assert query_seconds.count() == 1
+    assert 0 <= query_seconds._series[()][1] < 1.0
+
+
+def test_configure_logging_only_touches_its_logger_once(monkeypatch):
+    root = logging.getLogger()
+    # pytest's log capture handler sits on the root logger; act as if nothing configured it
+    monkeypatch.setattr(root, 'handlers', [])
+    root_level = root.level
+    stream = io.StringIO()
+
+    configure_logging('debug', stream=stream, logger_name='ratefinder-test-once')
+    configure_logging('error', logger_name='ratefinder-test-once') # Ignored
+    logger = logging.getLogger('ratefinder-test-once')
+    assert logger.level == logging.DEBUG
+    assert len(logger.handlers) == 1
+    assert root.level == root_level and root.handlers == []
+
+    logger.debug("refreshed", extra={'provider': 'Wise'})
+    assert stream.getvalue().endswith('level=debug logger=ratefinder-test-once msg="refreshed" provider=\'Wise\'\n')
+
+
+def test_configure_logging_leaves_output_to_a_configured_host():
+    configure_logging('info', logger_name='ratefinder-test-host') # Root already has pytest's handler
+    logger = logging.getLogger('ratefinder-test-host')
+    assert logger.level == logging.INFO
+    assert logger.handlers == []
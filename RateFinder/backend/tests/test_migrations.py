@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import text
+
+from ..migrations import (HOT_QUERY_PLANS, LATEST_VERSION, MIGRATIONS, explain_query_plans, get_schema_version,
+                          run_migrations)
+from ..models import db
+from .conftest import BASELINE_DB
+
+MIGRATION_INDEXES = {
+    'uq_exchange_rates_provider_pair', 'ix_exchange_rates_pair_rate',
+    'ix_user_activity_timestamp', 'ix_user_activity_provider_name'
+}
+
+
+def _index_names():
+    rows = db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+    return {name for name, in rows}
+
+
+@pytest.mark.parametrize('copy_from', [None, BASELINE_DB], ids=['fresh', 'baseline'])
+def test_migrations_apply_once_and_rerun_cleanly(make_app, copy_from):
+    flask_app = make_app(copy_from=copy_from)
+    with flask_app.app_context():
+        if copy_from is not None:
+            assert get_schema_version(db.session) == 0
+            assert not MIGRATION_INDEXES & _index_names()
+        db.create_all()
+        assert run_migrations(db.session) == [version for version, _, _ in MIGRATIONS]
+        assert get_schema_version(db.session) == LATEST_VERSION
+        assert MIGRATION_INDEXES <= _index_names()
+
+        # Nothing pending the second time
+        assert run_migrations(db.session) == []
+
+        # Every statement is safe to re-run, e.g. after a crash before user_version was written
+        db.session.execute(text("PRAGMA user_version = 0"))
+        db.session.commit()
+        assert run_migrations(db.session) == [version for version, _, _ in MIGRATIONS]
+        assert MIGRATION_INDEXES <= _index_names()
+
+
+@pytest.mark.parametrize('name', [name for name, _, _, _ in HOT_QUERY_PLANS])
+def test_hot_query_uses_its_index(app, name):
+    with app.app_context():
+        plans = {plan_name: (plan, expected_index, ok)
+                 for plan_name, plan, expected_index, ok in explain_query_plans(db.session)}
+    plan, expected_index, ok = plans[name]
+    assert ok, f"{name} should use {expected_index}, plan was: {plan}"
+
+
+def test_baseline_queries_miss_the_indexes_until_migrated(make_app):
+    flask_app = make_app(copy_from=BASELINE_DB)
+    with flask_app.app_context():
+        db.create_all() # Adds the newer tables, but no indexes to the existing ones
+        before = {name: ok for name, _, _, ok in explain_query_plans(db.session) if name != 'quote_fee_bands'}
+        assert not any(before.values())
+        run_migrations(db.session)
+        assert all(ok for _, _, _, ok in explain_query_plans(db.session))
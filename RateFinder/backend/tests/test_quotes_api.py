@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('amount', ['inf', '-inf', 'nan', 'NaN', '0', '-5', 'abc'])
+def test_quote_rejects_non_finite_or_non_positive_amounts(client, amount):
+    assert client.get(f'/api/quotes/USD_EUR?amount={amount}').status_code == 400
+
+
+@pytest.mark.parametrize('amounts', [[100, float('inf')], [float('nan')], [100, -1]])
+def test_batch_quote_rejects_non_finite_or_non_positive_amounts(client, amounts):
+    # json.dumps writes Infinity/NaN, which the JSON parser accepts as floats
+    response = client.post('/api/quotes/USD_EUR/batch', json={'amounts': amounts})
+    assert response.status_code == 400
+    assert client.get('/api/quotes/USD_EUR/batch?amounts=' + ','.join(map(str, amounts))).status_code == 400
+
+
+def test_quote_and_batch_accept_finite_amounts(client):
+    assert client.get('/api/quotes/USD_EUR?amount=250').status_code == 200
+    response = client.post('/api/quotes/USD_EUR/batch', json={'amounts': [100, 2500]})
+    assert response.status_code == 200
+    assert response.json['amounts'] == [100, 2500]
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from ..models import db, ExchangeRate
+from ..rate_graph import RateGraph, rate_graph
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'CAD', 'JPY', 'CHF']
+PROVIDERS = [1, 2, 3]
+
+
+@pytest.fixture
+def fresh_rate_graph():
+    # The shared graph is built once per process; make the next request rebuild it
+    rate_graph.built = False
+    yield rate_graph
+    rate_graph.built = False
+
+
+def _random_row(rng):
+    source, target = rng.sample(CURRENCIES, 2)
+    return rng.choice(PROVIDERS), f'{source}_{target}', rng.uniform(0.5, 2.0)
+
+
+def _all_routes(graph):
+    routes = {}
+    for source in CURRENCIES:
+        for target in CURRENCIES:
+            for route in graph.routes(source, target):
+                routes[(source, target, route['provider_id'])] = (route['effective_rate'], route['path'])
+    return routes
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_updates_match_a_full_rebuild(seed):
+    rng = random.Random(seed)
+    latest = {}
+    initial = [_random_row(rng) for _ in range(8)]
+    for provider_id, pair, rate in initial:
+        latest[(provider_id, pair)] = rate
+
+    incremental = RateGraph()
+    incremental.rebuild(initial)
+    for _ in range(20):
+        batch = [_random_row(rng) for _ in range(rng.randint(1, 4))]
+        incremental.apply_updates(batch)
+        for provider_id, pair, rate in batch:
+            latest[(provider_id, pair)] = rate
+
+        rebuilt = RateGraph()
+        rebuilt.rebuild([(provider_id, pair, rate) for (provider_id, pair), rate in latest.items()])
+        expected, actual = _all_routes(rebuilt), _all_routes(incremental)
+        assert actual.keys() == expected.keys()
+        for key, (rate, path) in expected.items():
+            assert actual[key][0] == pytest.approx(rate)
+            assert actual[key][1] == path
+
+
+def test_routes_endpoint_goes_through_an_intermediate_currency(app, client, fresh_rate_graph):
+    with app.app_context():
+        usd_eur = ExchangeRate.query.filter_by(provider_id=1, currency_pair='USD_EUR').one().rate
+        db.session.add(ExchangeRate(provider_id=1, currency_pair='CAD_USD', rate=0.73))
+        db.session.commit()
+
+    response = client.get('/api/routes/cad_eur')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [route['provider'] for route in body['providers']] == ['TapTap Send'] # Only one quotes CAD
+    best = body['best']
+    assert best['path'] == ['CAD', 'USD', 'EUR']
+    assert [(leg['from'], leg['to']) for leg in best['legs']] == [('CAD', 'USD'), ('USD', 'EUR')]
+    assert best['effective_rate'] == pytest.approx(0.73 * usd_eur)
+
+
+def test_routes_endpoint_rejects_malformed_pairs(client):
+    assert client.get('/api/routes/USDEUR').status_code == 400
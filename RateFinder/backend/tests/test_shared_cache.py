@@ -0,0 +1,161 @@
+from datetime import datetime
+
+from .. import shared_cache
+from ..app import start_rate_scheduler
+from ..cache import RateResponseCache, rate_cache
+from ..freshness import rate_revalidator, refresh_job_name
+from ..scheduler import Scheduler, SQLiteJobLock
+from ..shared_cache import (MemoryCacheBackend, SharedLeaderLock, SharedRateCache, SnapshotRow, pack_snapshot,
+                            shared_rate_cache, unpack_snapshot)
+
+ROWS = [
+    SnapshotRow('Wise', 'https://wise.com/register', 0.9123, datetime(2024, 5, 1, 12, 30, 15, 250000)),
+    SnapshotRow('Rémitly', '', 0.95, datetime(2024, 5, 1, 12, 31)),
+]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FailingBackend:
+    name = 'failing'
+
+    def _fail(self, *args):
+        raise ConnectionError("cache is down")
+
+    get = set_many = incr = acquire_lease = extend_lease = _fail
+
+
+def test_snapshot_round_trip():
+    snapshot = unpack_snapshot(pack_snapshot(7, ROWS, published_at=1714566615.5))
+    assert snapshot == (7, 1714566615.5, ROWS)
+
+
+def test_snapshot_in_another_format_is_ignored():
+    blob = bytearray(pack_snapshot(1, ROWS))
+    blob[0] = shared_cache.SNAPSHOT_FORMAT + 1
+    assert unpack_snapshot(bytes(blob)) is None
+
+
+def test_publish_bumps_the_version_and_read_returns_the_rows():
+    backend = MemoryCacheBackend()
+    cache = SharedRateCache(backend)
+    assert cache.read('USD_EUR') is None # Nothing published yet
+
+    assert cache.publish({'USD_EUR': ROWS, 'USD_GBP': ROWS[:1]}) == 1
+    assert cache.publish({'USD_EUR': ROWS[1:]}) == 2
+    assert backend.get(cache.prefix + 'rates:version') == b'2'
+
+    snapshot = cache.read('USD_EUR')
+    assert (snapshot.version, snapshot.rows) == (2, ROWS[1:])
+    assert cache.read('USD_GBP').rows == ROWS[:1] # Pairs left out of a publish keep their snapshot
+    stats = cache.stats()
+    assert (stats['backend'], stats['hits'], stats['misses'], stats['publishes']) == ('memory', 2, 1, 2)
+
+
+def test_local_cache_is_invalidated_once_per_new_version(monkeypatch):
+    clock = FakeClock()
+    backend = MemoryCacheBackend()
+    publisher, reader = SharedRateCache(backend), SharedRateCache(backend, clock=clock)
+    local = RateResponseCache()
+
+    reader.sync_local(local) # First check: nothing seen before
+    version = local.version
+    local.put('USD_EUR', version, '[]', 200)
+
+    publisher.publish({'USD_EUR': ROWS})
+    reader.sync_local(local) # Checked less than VERSION_CHECK_INTERVAL ago
+    assert local.get('USD_EUR') is not None
+
+    clock.advance(shared_cache.VERSION_CHECK_INTERVAL)
+    reader.sync_local(local)
+    assert local.get('USD_EUR') is None and local.version > version
+
+    version = local.version
+    clock.advance(shared_cache.VERSION_CHECK_INTERVAL)
+    reader.sync_local(local) # Same version: the local cache is left alone
+    assert local.version == version
+
+
+def test_failing_backend_is_left_alone_for_a_while():
+    clock = FakeClock()
+    cache = SharedRateCache(FailingBackend(), clock=clock)
+
+    assert cache.read('USD_EUR') is None
+    assert cache.publish({'USD_EUR': ROWS}) is None # Not even tried
+    assert cache.stats()['errors'] == 1 and not cache.stats()['available']
+
+    clock.advance(shared_cache.RETRY_AFTER_SECONDS)
+    assert cache.read('USD_EUR') is None
+    assert cache.stats()['errors'] == 2
+
+
+def test_rates_are_served_from_sqlite_when_the_backend_fails(client, monkeypatch):
+    monkeypatch.setattr(shared_rate_cache, 'backend', FailingBackend())
+    monkeypatch.setattr(shared_rate_cache, '_unavailable_until', 0.0)
+    monkeypatch.setattr(shared_rate_cache, '_next_version_check', 0.0)
+    monkeypatch.setattr(shared_rate_cache, 'errors', 0)
+    rate_cache.invalidate()
+
+    response = client.get('/api/rates/USD_EUR')
+    assert response.status_code == 200
+    assert response.get_json()
+    assert shared_rate_cache.errors >= 1
+    rate_cache.invalidate()
+
+
+def test_one_leader_until_its_lease_lapses():
+    clock = FakeClock()
+    backend = MemoryCacheBackend(clock=clock)
+    cache = SharedRateCache(backend)
+    first, second = SharedLeaderLock(cache, owner='first'), SharedLeaderLock(cache, owner='second')
+
+    assert first.acquire('job:refresh', ttl=60)
+    assert first.acquire('job:refresh', ttl=60) # Renewing our own lease
+    assert not second.acquire('job:refresh', ttl=60)
+    assert not second.acquire('job:other', ttl=60) # One lease for every refresh job
+
+    first.hold_until('job:refresh', clock.now + 300) # The leader finished a run
+    clock.advance(120)
+    assert not second.acquire('job:refresh', ttl=60)
+    second.hold_until('job:refresh', clock.now + 3600) # Only the holder can extend it
+
+    clock.advance(181) # The leader stopped running jobs
+    assert second.acquire('job:refresh', ttl=60)
+    assert not first.acquire('job:refresh', ttl=60)
+
+
+def test_every_instance_refreshes_without_an_election():
+    assert SharedLeaderLock(SharedRateCache(FailingBackend())).acquire('job:refresh', ttl=60)
+
+
+def test_instances_that_lost_the_election_still_prune_their_history(app, monkeypatch):
+    monkeypatch.setattr(shared_rate_cache, 'backend', MemoryCacheBackend())
+    monkeypatch.setattr(rate_revalidator, 'lock', rate_revalidator.lock)
+    monkeypatch.setattr(Scheduler, 'start', lambda self: None) # Run the jobs by hand
+    leader = SharedLeaderLock(shared_rate_cache, owner='another-instance')
+    assert leader.acquire('job:refresh', ttl=3600)
+
+    scheduler = start_rate_scheduler(app)
+    try:
+        assert isinstance(scheduler.lock, SharedLeaderLock)
+        prune_job = scheduler.jobs['prune-history']
+        assert prune_job.leased and isinstance(prune_job.lock, SQLiteJobLock)
+
+        refresh_job = scheduler.jobs[refresh_job_name('TapTap Send')]
+        scheduler._run_job(refresh_job, due_at=scheduler.clock())
+        assert (refresh_job.runs, refresh_job.skipped_locked) == (0, 1)
+
+        scheduler._run_job(prune_job, due_at=scheduler.clock())
+        assert (prune_job.runs, prune_job.skipped_locked, prune_job.failures) == (1, 0, 0)
+    finally:
+        scheduler.stop()
+        app.extensions.pop('rate_scheduler')
@@ -0,0 +1,36 @@
+# Startup guarantees of the app factory, checked in a fresh interpreter: the test
+# process itself has long imported everything.
+
+import json
+import os
+import subprocess
+import sys
+
+from .conftest import BACKEND_DIR
+
+STARTUP_SCRIPT = """
+import json, socket, sys
+
+def no_network(*args, **kwargs):
+    raise AssertionError("network access during startup")
+socket.socket.connect = no_network
+socket.create_connection = no_network
+
+import backend.app
+heavy_after_import = sorted(m for m in ('numpy', 'requests') if m in sys.modules)
+flask_app = backend.app.create_app()
+heavy_after_create = sorted(m for m in ('numpy', 'requests') if m in sys.modules)
+print(json.dumps({"after_import": heavy_after_import, "after_create_app": heavy_after_create}))
+"""
+
+
+def test_import_and_create_app_stay_light_and_offline(tmp_path):
+    db_path = tmp_path / 'ratefinder.db'
+    env = dict(os.environ, RATEFINDER_DATABASE_URI=f'sqlite:///{db_path}', RATEFINDER_SCHEDULER='0')
+    env.pop('RATEFINDER_SHARED_CACHE_URL', None)
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=os.path.dirname(BACKEND_DIR), env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    modules = json.loads(result.stdout.strip().splitlines()[-1])
+    assert modules == {"after_import": [], "after_create_app": []}
+    assert not db_path.exists() # create_app doesn't touch the database either
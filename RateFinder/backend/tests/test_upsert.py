@@ -0,0 +1,67 @@
+from ..models import db, ExchangeRate
+from ..utils import bulk_upsert_exchange_rates
+
+
+def _rows():
+    return {
+        (row.provider_id, row.currency_pair): (row.id, row.rate)
+        for row in ExchangeRate.query.all()
+    }
+
+
+def test_counts_inserts_updates_and_unchanged_rows(app):
+    with app.app_context():
+        before = _rows()
+        (provider_id, pair), (_, rate) = sorted(before.items())[0]
+        (other_id, other_pair), (_, other_rate) = sorted(before.items())[1]
+
+        summary = bulk_upsert_exchange_rates([
+            (provider_id, pair, rate + 0.01),
+            (other_id, other_pair, other_rate),
+            (provider_id, 'EUR_JPY', 160.0),
+        ])
+        db.session.commit()
+
+        assert (summary['inserted'], summary['updated'], summary['unchanged']) == (1, 1, 1)
+        assert sorted(summary['changed']) == sorted([
+            (provider_id, pair, rate + 0.01),
+            (provider_id, 'EUR_JPY', 160.0),
+        ])
+        after = _rows()
+        assert len(after) == len(before) + 1
+        assert after[(provider_id, pair)] == (before[(provider_id, pair)][0], rate + 0.01)
+        assert after[(provider_id, 'EUR_JPY')][1] == 160.0
+
+
+def test_last_value_wins_for_repeated_keys(app):
+    with app.app_context():
+        (provider_id, pair), _ = sorted(_rows().items())[0]
+
+        summary = bulk_upsert_exchange_rates([(provider_id, pair, 1.5), (provider_id, pair, 1.25)])
+        db.session.commit()
+
+        assert summary['changed'] == [(provider_id, pair, 1.25)]
+        assert _rows()[(provider_id, pair)][1] == 1.25
+
+
+def test_noop_upsert_leaves_rows_untouched(app):
+    with app.app_context():
+        before = _rows()
+
+        summary = bulk_upsert_exchange_rates(
+            [(provider_id, pair, rate) for (provider_id, pair), (_, rate) in before.items()])
+        db.session.commit()
+
+        assert summary['unchanged'] == len(before)
+        assert (summary['inserted'], summary['updated'], summary['changed']) == (0, 0, [])
+        # Same row ids and rates; only last_updated moves to the fetch time
+        assert _rows() == before
+        assert {row.last_updated for row in ExchangeRate.query.all()} == {summary['written_at']}
+
+
+def test_empty_input_writes_nothing(app):
+    with app.app_context():
+        before = _rows()
+        summary = bulk_upsert_exchange_rates([])
+        assert (summary['inserted'], summary['updated'], summary['unchanged'], summary['changed']) == (0, 0, 0, [])
+        assert _rows() == before
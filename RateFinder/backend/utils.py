@@ -2,49 +2,50 @@
 # For example, functions to fetch data from external exchange rate APIs
 # and to update the database.
 
-import requests # Keep for potential future use, even if dummying now
+import logging
+import os
 from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .models import db, Provider, ExchangeRate # Import necessary models
+from .fetcher import fetch_rates_concurrently, get_http_session
+from .adapters import get_adapter, FixtureSession
+from .cache import rate_cache
+from .history import record_rates
+from .broadcaster import rate_broadcaster
+from .circuit_breaker import provider_breakers
+from .shared_cache import shared_rate_cache
+from .anomaly import rate_validator, rate_anomalies
+from .change_feed import rate_change_feed
+# Provider settings live in provider_config.py; re-exported for callers of this module
+from .provider_config import PROVIDER_APIS_CONFIG, DEFAULT_REFRESH_INTERVAL
 
-# Placeholder for actual API URLs and keys - these would be in environment variables or a config file
-PROVIDER_APIS_CONFIG = {
-    "TapTap Send": {
-        "api_url": "https://api.taptapsend.example.com/rates",
-        "params_template": {"pair": "{source}{target}"}, # e.g., USDEUR
-        "rate_path": ["data", "rate"], # How to access rate in JSON response
-        "name_in_api": "TapTap Send" # If the API uses a specific name identifier
-    },
-    "Revolut": {
-        "api_url": "https://api.revolut.example.com/exchange",
-        "params_template": {"from": "{source}", "to": "{target}", "amount": "1"},
-        "rate_path": ["rates", "{target}"], # Example: response.rates.EUR
-        "name_in_api": "Revolut"
-    },
-    "Remitly": {
-        "api_url": "https://api.remitly.example.com/v1/rates",
-        "params_template": {"sourceCurrency": "{source}", "destinationCurrency": "{target}"},
-        "rate_path": ["data", 0, "rate"], # Example: response.data[0].rate
-        "name_in_api": "Remitly"
-    },
-    "Wise (TransferWise)": {
-        "api_url": "https://api.wise.com/v1/rates", # This is a guess, Wise has a public API
-        "params_template": {"source": "{source}", "target": "{target}"},
-        "rate_path": ["rate"],
-        "name_in_api": "Wise"
-    }
-}
+logger = logging.getLogger(__name__)
+
+# Called with write_summary['changed'] after each refresh commits, in the worker that ran
+# it and (through the change feed) in every other worker. In-memory views of the rates
+# (e.g. the route graph, once something has built it) register here, so this module
+# doesn't import them and their dependencies up front.
+rate_change_listeners = []
+
+# 'simulate' (default) returns dummy rates; 'live' calls the provider APIs over HTTP;
+# 'fixtures' replays the recorded responses in fixtures/providers (offline runs and tests)
+FETCH_MODE = os.environ.get('RATEFINDER_FETCH_MODE', 'simulate')
 
 # List of currency pairs your app will support
 SUPPORTED_CURRENCY_PAIRS = ["USD_EUR", "USD_GBP", "EUR_GBP", "CAD_USD"]
 
 
-def fetch_rate_from_external_api(provider_name, currency_pair_str):
+def fetch_rate_from_external_api(provider_name, currency_pair_str, config=None, session=None, timeout=None):
     """
-    Simulates fetching an exchange rate for a given currency pair from a specific provider's API.
-    In a real application, this function would make an HTTP request to the provider's API
-    and parse the response. For now, it returns a dummy rate or None.
+    Fetches an exchange rate for a given currency pair from a specific provider's API.
+    In 'live'/'fixtures' fetch mode this makes a request through the provider's compiled
+    adapter; otherwise it simulates the call and returns a dummy rate or None.
     """
-    print(f"Attempting to fetch rate for {provider_name} - {currency_pair_str} from external API (simulation)...")
+    if FETCH_MODE != 'simulate':
+        adapter = get_adapter(provider_name, config or PROVIDER_APIS_CONFIG[provider_name])
+        return adapter.fetch_rate(currency_pair_str, session or get_http_session(), timeout)
+
+    logger.debug("Attempting to fetch rate for %s - %s from external API (simulation)", provider_name, currency_pair_str)
 
     # Simulate some variability and potential failures
     # This is highly simplified. Real API integration is complex.
@@ -60,7 +61,7 @@ def fetch_rate_from_external_api(provider_name, currency_pair_str):
     }
 
     if currency_pair_str not in base_rates:
-        print(f"  Unsupported currency pair for simulation: {currency_pair_str}")
+        logger.debug("Unsupported currency pair for simulation: %s", currency_pair_str)
         return None
 
     # Simulate slight variations per provider
@@ -76,19 +77,50 @@ def fetch_rate_from_external_api(provider_name, currency_pair_str):
     # Simulate a small chance of API failure for a provider/pair
     import random
     if random.random() < 0.1: # 10% chance of "API failure"
-        print(f"  SIMULATED API FAILURE for {provider_name} - {currency_pair_str}")
+        logger.debug("Simulated API failure for %s - %s", provider_name, currency_pair_str)
         return None
 
-    print(f"  Successfully fetched (simulated) rate for {provider_name} - {currency_pair_str}: {simulated_rate}")
+    logger.debug("Fetched (simulated) rate for %s - %s: %s", provider_name, currency_pair_str, simulated_rate)
     return simulated_rate
 
 
+def fetch_batch_from_external_api(provider_name, currency_pairs, config=None, session=None, timeout=None):
+    """
+    Fetches several pairs with one call to the provider's batch endpoint.
+    Returns {pair: rate or None}.
+    """
+    adapter = get_adapter(provider_name, config or PROVIDER_APIS_CONFIG[provider_name])
+    return adapter.fetch_batch(currency_pairs, session or get_http_session(), timeout)
+
+
+def plan_provider_requests(provider_names, currency_pairs, fetch_mode=None):
+    """
+    The requests one refresh cycle makes per provider: batch tuples where the provider
+    has a batch endpoint, single pairs otherwise (always single pairs when simulating).
+    """
+    fetch_mode = fetch_mode or FETCH_MODE
+    plan = {}
+    for name in provider_names:
+        if fetch_mode == 'simulate':
+            plan[name] = list(currency_pairs)
+        else:
+            plan[name] = get_adapter(name, PROVIDER_APIS_CONFIG[name]).plan_requests(currency_pairs)
+    return plan
+
+
 def update_rates_for_provider(provider_obj, currency_pair_str):
     """
     Fetches and updates/creates the exchange rate for a specific provider and currency pair.
     """
     rate_value = fetch_rate_from_external_api(provider_obj.name, currency_pair_str)
+    return apply_rate_for_provider(provider_obj, currency_pair_str, rate_value)
 
+
+def apply_rate_for_provider(provider_obj, currency_pair_str, rate_value):
+    """
+    Updates/creates the exchange rate row for a provider and pair with an already fetched value.
+    Returns False when there is no rate to store.
+    """
     if rate_value is not None:
         # Check if a rate already exists for this provider and pair
         exchange_rate_entry = ExchangeRate.query.filter_by(
@@ -100,7 +132,7 @@ def update_rates_for_provider(provider_obj, currency_pair_str):
             # Update existing rate
             exchange_rate_entry.rate = rate_value
             exchange_rate_entry.last_updated = datetime.utcnow()
-            print(f"  Updating rate for {provider_obj.name} - {currency_pair_str} to {rate_value}")
+            logger.debug("Updating rate for %s - %s to %s", provider_obj.name, currency_pair_str, rate_value)
         else:
             # Create new rate entry
             exchange_rate_entry = ExchangeRate(
@@ -110,57 +142,246 @@ def update_rates_for_provider(provider_obj, currency_pair_str):
                 last_updated=datetime.utcnow()
             )
             db.session.add(exchange_rate_entry)
-            print(f"  Creating new rate for {provider_obj.name} - {currency_pair_str}: {rate_value}")
+            logger.debug("Creating new rate for %s - %s: %s", provider_obj.name, currency_pair_str, rate_value)
 
         # db.session.commit() will be called once at the end of update_all_rates
         return True
     return False
 
 
-def update_all_rates_from_apis():
+def bulk_upsert_exchange_rates(rate_rows):
+    """
+    Writes many fetched rates in one INSERT ... ON CONFLICT DO UPDATE statement.
+
+    rate_rows is an iterable of (provider_id, currency_pair, rate) tuples; if the same
+    provider/pair appears more than once, the last value wins. Existing rates are read
+    with a single query so the result can report what actually changed.
+
+    Returns a dict with 'inserted', 'updated' and 'unchanged' counts, 'changed': the list
+    of (provider_id, currency_pair, rate) tuples that were inserted or updated, and
+    'written_at': the last_updated timestamp given to every row.
+    The caller is responsible for committing the session.
+    """
+    latest = {}
+    for provider_id, currency_pair, rate in rate_rows:
+        latest[(provider_id, currency_pair)] = rate
+
+    now = datetime.utcnow()
+    summary = {"inserted": 0, "updated": 0, "unchanged": 0, "changed": [], "written_at": now}
+    if not latest:
+        return summary
+
+    provider_ids = {key[0] for key in latest}
+    pairs = {key[1] for key in latest}
+    existing = {
+        (provider_id, currency_pair): rate
+        for provider_id, currency_pair, rate in db.session.query(
+            ExchangeRate.provider_id, ExchangeRate.currency_pair, ExchangeRate.rate
+        ).filter(
+            ExchangeRate.provider_id.in_(provider_ids),
+            ExchangeRate.currency_pair.in_(pairs)
+        )
+    }
+
+    params = []
+    for (provider_id, currency_pair), rate in latest.items():
+        old_rate = existing.get((provider_id, currency_pair))
+        if old_rate is None:
+            summary["inserted"] += 1
+            summary["changed"].append((provider_id, currency_pair, rate))
+        elif old_rate != rate:
+            summary["updated"] += 1
+            summary["changed"].append((provider_id, currency_pair, rate))
+        else:
+            summary["unchanged"] += 1
+        params.append({
+            "provider_id": provider_id,
+            "currency_pair": currency_pair,
+            "rate": rate,
+            "last_updated": now
+        })
+
+    # Unchanged rows are written too so their last_updated reflects the successful fetch
+    stmt = sqlite_insert(ExchangeRate.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["provider_id", "currency_pair"],
+        set_={"rate": stmt.excluded.rate, "last_updated": stmt.excluded.last_updated}
+    )
+    db.session.execute(stmt, params)
+    return summary
+
+
+def publish_rate_changes(changed_rows, providers_by_id, updated_at):
+    """Pushes committed rate changes to stream subscribers, grouped by currency pair."""
+    changes_by_pair = {}
+    for provider_id, currency_pair, rate in changed_rows:
+        provider = providers_by_id.get(provider_id)
+        if provider is None:
+            continue
+        changes_by_pair.setdefault(currency_pair, []).append({
+            "provider": provider.name,
+            "rate": rate,
+            "register_link": provider.registration_link,
+            "last_updated": updated_at.isoformat()
+        })
+    rate_broadcaster.publish(changes_by_pair)
+
+
+def publish_rate_snapshots(currency_pairs):
+    """
+    Publishes the committed rates of currency_pairs to the shared cache (if configured),
+    each pair as its full provider list cheapest first, like get_rates serves it.
+    """
+    if not shared_rate_cache.enabled or not currency_pairs:
+        return None
+    rows = db.session.query(ExchangeRate.currency_pair, Provider.name, Provider.registration_link,
+                            ExchangeRate.rate, ExchangeRate.last_updated)\
+                     .join(Provider, ExchangeRate.provider_id == Provider.id)\
+                     .filter(ExchangeRate.currency_pair.in_(sorted(currency_pairs)))\
+                     .order_by(ExchangeRate.currency_pair, ExchangeRate.rate)\
+                     .all()
+    snapshots = {}
+    for currency_pair, name, registration_link, rate, last_updated in rows:
+        snapshots.setdefault(currency_pair, []).append((name, registration_link, rate, last_updated))
+    return shared_rate_cache.publish(snapshots)
+
+
+def apply_rate_changes(changed_rows, providers_by_id, updated_at):
+    """
+    Updates this process's in-memory views after a refresh commits: drops cached
+    /api/rates responses, runs rate_change_listeners and pushes the changes to stream
+    subscribers.
+    """
+    rate_cache.invalidate() # Cached /api/rates responses now hold stale data
+    for listener in rate_change_listeners:
+        listener(changed_rows)
+    publish_rate_changes(changed_rows, providers_by_id, updated_at)
+
+
+def sync_rate_changes():
+    """
+    Applies the refreshes other workers committed since the last call (see
+    change_feed.py). Run every change_feed.POLL_INTERVAL seconds by the scheduler in
+    every worker. Needs an app context. Returns the number of refreshes applied.
+    """
+    refreshes = rate_change_feed.poll()
+    if refreshes == []:
+        return 0
+    providers_by_id = {p.id: p for p in Provider.query.all()}
+    if refreshes is None:
+        # Fell behind the feed's retention: treat every stored rate as changed
+        logger.warning("Rate change feed pruned past this worker, resyncing from exchange_rates")
+        rows = db.session.query(ExchangeRate.provider_id, ExchangeRate.currency_pair, ExchangeRate.rate).all()
+        refreshes = [(None, datetime.utcnow(), [tuple(row) for row in rows])]
+    for _, written_at, changed_rows in refreshes:
+        apply_rate_changes(changed_rows, providers_by_id, written_at)
+    return len(refreshes)
+
+
+def validate_rate_rows(rate_rows, providers_by_id):
+    """
+    Runs fetched (provider_id, currency_pair, rate) rows through the anomaly check and
+    returns the accepted ones. Rejected rates are quarantined by rate_validator, counted
+    on /metrics and logged; the previously stored rate stays in place.
+    """
+    if not rate_validator.primed:
+        # Last stored rates give the median check its peers from the first cycle on
+        rate_validator.prime(db.session.query(
+            ExchangeRate.provider_id, ExchangeRate.currency_pair, ExchangeRate.rate).all())
+    accepted, rejections = rate_validator.validate(rate_rows)
+    for rejection in rejections:
+        provider = providers_by_id.get(rejection['provider_id'])
+        provider_name = provider.name if provider is not None else str(rejection['provider_id'])
+        rate_anomalies.inc(provider_name, rejection['reason'])
+        logger.warning("Quarantined anomalous rate %s for %s from %s (reference %s)", rejection['rate'],
+                       rejection['currency_pair'], provider_name, rejection['reference'],
+                       extra={'reason': rejection['reason']})
+    return accepted
+
+
+def update_all_rates_from_apis(provider_names=None):
     """
     Scheduled job to fetch rates from all external APIs for all configured providers
     and supported currency pairs, then updates the database.
+    provider_names optionally restricts the run to those providers (the scheduler runs
+    one job per provider on its own interval).
     This function needs to be called within a Flask app context if it interacts with the DB.
     """
-    print(f"[{datetime.utcnow()}] Starting scheduled rate update job...")
+    logger.info("Starting rate update job", extra={'providers': ','.join(provider_names or ['all'])})
 
-    providers = Provider.query.all()
+    providers_query = Provider.query
+    if provider_names is not None:
+        providers_query = providers_query.filter(Provider.name.in_(provider_names))
+    providers = providers_query.all()
     if not providers:
-        print("No providers found in the database. Cannot update rates.")
+        logger.warning("No providers found in the database. Cannot update rates.")
         return
 
     successful_updates = 0
     failed_updates = 0
 
+    configured_providers = []
     for provider in providers:
         # Check if this provider is in our API config (optional, good for flexibility)
         if provider.name not in PROVIDER_APIS_CONFIG:
-            print(f"  Skipping {provider.name}: No API configuration found.")
+            logger.warning("Skipping %s: no API configuration found", provider.name)
             continue
+        configured_providers.append(provider)
+
+    # Fetch everything concurrently first; DB writes stay on this thread/session
+    fetched_rates = fetch_rates_concurrently(
+        plan_provider_requests([provider.name for provider in configured_providers], SUPPORTED_CURRENCY_PAIRS),
+        fetch_rate_from_external_api,
+        provider_configs=PROVIDER_APIS_CONFIG,
+        session=FixtureSession() if FETCH_MODE == 'fixtures' else None,
+        batch_fetch_fn=fetch_batch_from_external_api,
+        breakers=provider_breakers # Known-dead providers are skipped instead of timing out
+    )
 
-        print(f"Fetching rates for provider: {provider.name}")
+    rate_rows = []
+    for provider in configured_providers:
         for pair_str in SUPPORTED_CURRENCY_PAIRS:
-            try:
-                if update_rates_for_provider(provider, pair_str):
-                    successful_updates += 1
-                else:
-                    failed_updates +=1
-            except Exception as e:
-                print(f"  ERROR processing {provider.name} - {pair_str}: {e}")
+            rate_value = fetched_rates.get((provider.name, pair_str))
+            if rate_value is not None:
+                rate_rows.append((provider.id, pair_str, rate_value))
+                successful_updates += 1
+            else:
                 failed_updates += 1
-                db.session.rollback() # Rollback for this specific error, or handle more globally
 
+    # Bad ticks (inverted rates, outliers vs. the other providers or the pair's history)
+    # are quarantined here instead of becoming the top result of get_rates
+    accepted_rows = validate_rate_rows(rate_rows, {p.id: p for p in configured_providers})
+    rejected_updates = len(rate_rows) - len(accepted_rows)
+    successful_updates -= rejected_updates
+    rate_rows = accepted_rows
+
+    # All writes for the cycle go out as a single bulk upsert
+    feed_version = None
     try:
+        write_summary = bulk_upsert_exchange_rates(rate_rows)
+        record_rates(rate_rows) # Append to history/rollups in the same transaction
+        # Lets the other workers replay this refresh (even with nothing changed, the
+        # last_updated of every written row moved, so their cached responses are stale)
+        feed_version = rate_change_feed.record(write_summary['changed'], write_summary['written_at'])
         db.session.commit()
-        print("Successfully committed rate updates to the database.")
-    except Exception as e:
+        # Every written pair, not just changed ones: last_updated moved for all of them
+        publish_rate_snapshots({currency_pair for _, currency_pair, _ in rate_rows})
+        apply_rate_changes(write_summary['changed'], {p.id: p for p in configured_providers},
+                           write_summary['written_at'])
+        logger.info("Committed rate updates", extra={
+            'inserted': write_summary['inserted'],
+            'updated': write_summary['updated'],
+            'unchanged': write_summary['unchanged']
+        })
+    except Exception:
         db.session.rollback()
-        print(f"Error committing rate updates to database: {e}")
+        if feed_version is not None:
+            rate_change_feed.forget(feed_version)
+        logger.exception("Error committing rate updates to database")
         # Potentially re-raise or log more severely
 
-    print(f"[{datetime.utcnow()}] Scheduled rate update job finished.")
-    print(f"Summary: Successful updates: {successful_updates}, Failed attempts: {failed_updates}")
+    logger.info("Rate update job finished", extra={'fetched': successful_updates, 'failed': failed_updates,
+                                                   'rejected': rejected_updates})
 
 
 # Example of how you might call this from a script or a Flask CLI command
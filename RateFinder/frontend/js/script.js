@@ -14,6 +14,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const API_BASE_URL = 'http://localhost:5000/api'; // Assuming backend runs on port 5000
 
     let allRatesData = {}; // To store rates for the converter: { "USD_EUR": { "TapTap": 0.92, ... }, ... }
+    let currentRates = []; // Rates currently displayed for the selected pair
+    let rateStream = null; // EventSource pushing rate changes for the selected pair
     let availableCurrencies = new Set(); // To populate converter dropdowns: {"USD", "EUR", "GBP"}
 
     // Function to fetch available currency pairs
@@ -89,8 +91,10 @@ document.addEventListener('DOMContentLoaded', () => {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             const rates = await response.json();
+            currentRates = rates;
             displayRates(rates, pair);
             storeRatesForConverter(pair, rates);
+            subscribeToRateChanges(pair);
         } catch (error) {
             console.error(`Failed to fetch rates for ${pair}:`, error);
             providerListContainer.innerHTML = `<p class="error-message">Error loading rates for ${pair}. Please try again.</p>`;
@@ -114,6 +118,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     <h3>${rateInfo.provider}</h3>
                     <p class="rate">${rateInfo.rate.toFixed(4)} ${pair.split('_')[1]}</p>
                     <p class="pair-info">(1 ${pair.split('_')[0]} = ${rateInfo.rate.toFixed(4)} ${pair.split('_')[1]})</p>
+                    ${rateInfo.stale ? '<p class="pair-info">Last known rate, refreshing...</p>' : ''}
                 </div>
                 <a href="${rateInfo.register_link}" class="register-button" target="_blank" rel="noopener noreferrer" data-provider="${rateInfo.provider}">Register</a>
             `;
@@ -123,6 +128,38 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Subscribe to pushed rate changes for the selected pair instead of polling
+    function subscribeToRateChanges(pair) {
+        if (rateStream) {
+            rateStream.close();
+            rateStream = null;
+        }
+        if (!pair || !window.EventSource) {
+            return;
+        }
+        rateStream = new EventSource(`${API_BASE_URL}/stream/rates?pairs=${encodeURIComponent(pair)}`);
+        rateStream.addEventListener('rates', (event) => {
+            const update = JSON.parse(event.data);
+            if (update.currency_pair !== currencyPairSelect.value) {
+                return;
+            }
+            applyRateChanges(update.currency_pair, update.changes);
+        });
+        rateStream.addEventListener('evicted', () => {
+            // We fell behind; reload the full list, which also resubscribes
+            fetchRatesForPair(currencyPairSelect.value);
+        });
+    }
+
+    // Merge pushed changes (only providers whose rate changed) into the displayed list
+    function applyRateChanges(pair, changes) {
+        const byProvider = new Map(currentRates.map(rateInfo => [rateInfo.provider, rateInfo]));
+        changes.forEach(change => byProvider.set(change.provider, change));
+        currentRates = Array.from(byProvider.values()).sort((a, b) => a.rate - b.rate);
+        displayRates(currentRates, pair);
+        storeRatesForConverter(pair, currentRates);
+    }
+
     // Store rates in a structured way for the converter
     function storeRatesForConverter(pair, ratesList) {
         if (!allRatesData[pair]) {
@@ -225,12 +262,6 @@ document.addEventListener('DOMContentLoaded', () => {
         // appLogo.alt = "RateFinder (Logo Missing)";
     }
 
-    // TODO: Implement auto-refresh logic if strictly "real-time daily" means more than on page load/pair selection.
-    // For daily rates, fetching on selection or page load is often sufficient.
-    // If backend updates rates at a specific time, frontend could poll or use websockets.
-    // A simpler "daily" refresh could be a meta refresh tag or a JS timeout that re-fetches.
-    // setInterval( () => {
-    //    const selectedPair = currencyPairSelect.value;
-    //    if(selectedPair) fetchRatesForPair(selectedPair);
-    // }, 24 * 60 * 60 * 1000); // Refresh every 24 hours - crude, better to align with backend update
+    // Auto-refresh: rate changes are pushed over server-sent events (see subscribeToRateChanges),
+    // so there is no polling; the backend sends only the providers whose rate changed.
 });
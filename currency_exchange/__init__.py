@@ -0,0 +1,2 @@
+# Makes currency_exchange a package, so it imports the shared RateFinder modules
+# (python -m currency_exchange.app from the repository root).
@@ -1,34 +1,189 @@
-from flask import Flask, render_template, request
+# Run from the repository root, so the shared RateFinder modules import as a package:
+#   python -m currency_exchange.app          (development server)
+#   gunicorn currency_exchange.app:app       (every worker starts the scheduler; the lease picks one)
+# Importing this module opens nothing: create_app() opens the database and starts the
+# scheduler, and the module-level `app` is created on first access.
+from flask import Blueprint, Flask, Response, current_app, render_template, jsonify, g
+import logging
+import os
+import queue
 import sqlite3
-import requests
-import time
 import threading
+import time
 
-app = Flask(__name__)
+# The background scheduler is shared with RateFinder (stdlib-only module)
+from RateFinder.backend.scheduler import Scheduler, SQLiteJobLock
+from RateFinder.backend.instrumentation import (registry as metrics_registry, PROMETHEUS_CONTENT_TYPE,
+                                                configure_logging, instrument_flask_app,
+                                                instrument_sqlite_connection)
 
-# It's better to define the database path and connect/create cursors when needed
-DATABASE = 'currency_exchange.db'
+logger = logging.getLogger(__name__)
 
-def get_db_conn():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row # Optional: allows accessing columns by name
+# Routes; create_app() registers them on each app it builds
+bp = Blueprint('exchange', __name__)
+
+# Next to this module, so every worker opens the same file whatever its working directory
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'currency_exchange.db')
+READ_POOL_SIZE = 8
+
+class ConnectionPool:
+    """
+    Thread-safe pool of read-only SQLite connections, created lazily up to `size`.
+    get() blocks (up to `timeout` seconds) when every connection is checked out.
+    """
+
+    def __init__(self, path, size=READ_POOL_SIZE, timeout=5.0):
+        self.uri = f"file:{os.path.abspath(path)}?mode=ro"
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row # Optional: allows accessing columns by name
+        return instrument_sqlite_connection(conn)
+
+    def get(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get(timeout=self.timeout)
+
+    def put(self, conn):
+        self._idle.put(conn)
+
+def open_writer_conn(path):
+    """The updater's connection. It is the only writer and keeps this connection for its whole life."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL') # Readers never block on the writer (or vice versa)
+    conn.execute('PRAGMA synchronous=NORMAL')
     return conn
 
+def get_db_conn():
+    """Read-only connection for the current request, reused until the request ends."""
+    if 'db_conn' not in g:
+        g.db_conn = current_app.extensions['currency_exchange'].read_pool.get()
+    return g.db_conn
+
+def return_db_conn(exception):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        current_app.extensions['currency_exchange'].read_pool.put(conn)
+
 # Create required tables
-def init_db():
-    conn = get_db_conn()
-    c = conn.cursor()
-    c.execute('''
+def init_db(writer_conn):
+    writer_conn.execute('''
         CREATE TABLE IF NOT EXISTS platforms (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT UNIQUE,
             rate REAL
         );
     ''')
-    conn.commit()
-    conn.close()
+    writer_conn.commit()
+
+
+class RateSnapshot:
+    """
+    The current platform rates plus the page rendered from them. The updater swaps in
+    a new snapshot after each commit, so '/' is served without touching the database.
+    The page is rendered once per snapshot, on the first request that needs it.
+    Commits made by other worker processes are picked up by SnapshotWatcher.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self.rates = {}
+        self._html = None
+
+    def swap(self, rates):
+        with self._lock:
+            self.version += 1
+            self.rates = dict(rates)
+            self._html = None
+
+    def render(self):
+        with self._lock:
+            version, rates, html = self.version, self.rates, self._html
+        if html is not None:
+            return html
+        # If database is empty, fetch fresh rates immediately for display
+        html = render_template('index.html', exchange_rates=rates or fetch_exchange_rates())
+        with self._lock:
+            if self.version == version:
+                self._html = html
+        return html
+
+def load_rates(conn):
+    return {name: rate for name, rate in conn.execute('SELECT name, rate FROM platforms')}
+
+SNAPSHOT_CHECK_INTERVAL = 1.0 # Seconds between checks for commits made by other workers
+
+class SnapshotWatcher:
+    """
+    Reloads a RateSnapshot when the database changed under it. Only the worker holding
+    the lease runs the updater, so the others learn about new rates here: PRAGMA
+    data_version on the watcher's own connection changes whenever another connection
+    commits, which makes each check a single pragma. check() runs at most once per
+    interval and never makes a request wait for another request's reload.
+    """
+
+    def __init__(self, path, snapshot, interval=SNAPSHOT_CHECK_INTERVAL):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.snapshot = snapshot
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        # Version first, then the rows: a commit in between is reloaded on the next check
+        self._data_version = self._read_data_version()
+        snapshot.swap(load_rates(self.conn))
 
-init_db() # Initialize the database and table when the app starts
+    def _read_data_version(self):
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def check(self):
+        """Reloads the snapshot if another connection committed since the last check. Returns True if it did."""
+        now = time.monotonic()
+        if now < self._next_check or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + self.interval
+            data_version = self._read_data_version()
+            if data_version == self._data_version:
+                return False
+            self._data_version = data_version
+            # Also fires after this process's own updates (writer_conn is another
+            # connection); reloading those is redundant but harmless
+            self.snapshot.swap(load_rates(self.conn))
+            return True
+        except sqlite3.Error:
+            logger.exception("Could not reload the rate snapshot")
+            return False
+        finally:
+            self._lock.release()
+
+class RateStore:
+    """
+    The database handles of one app: the writer connection (and the lock around it),
+    the read-only pool for requests, and the snapshot '/' is served from.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writer_conn = open_writer_conn(path)
+        self.writer_lock = threading.Lock()
+        with self.writer_lock:
+            init_db(self.writer_conn)
+        self.read_pool = ConnectionPool(path)
+        self.snapshot = RateSnapshot()
+        self.watcher = SnapshotWatcher(path, self.snapshot)
 
 # Define a function to fetch exchange rates from multiple platforms
 def fetch_exchange_rates():
@@ -44,48 +199,101 @@ def fetch_exchange_rates():
     }
     return dummy_rates
 
+UPDATE_INTERVAL = 300  # Update every 5 minutes (300 seconds)
+
 # Define a function to update exchange rates in real-time
-def update_exchange_rates_periodically():
-    while True:
-        print("Fetching and updating exchange rates...")
-        exchange_rates = fetch_exchange_rates()
+def update_exchange_rates(store):
+    logger.info("Fetching and updating exchange rates...")
+    exchange_rates = fetch_exchange_rates()
+    writer_conn = store.writer_conn
+    with store.writer_lock:
         try:
-            conn = get_db_conn()
-            c = conn.cursor()
+            c = writer_conn.cursor()
             for platform, rate in exchange_rates.items():
                 # Using INSERT OR IGNORE for new platforms, and UPDATE for existing ones
                 c.execute('INSERT OR IGNORE INTO platforms (name, rate) VALUES (?, ?)', (platform, rate))
                 c.execute('UPDATE platforms SET rate = ? WHERE name = ?', (rate, platform))
-            conn.commit()
-            print(f"Rates updated: {exchange_rates}")
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-        finally:
-            if conn:
-                conn.close()
-        time.sleep(300)  # Update every 5 minutes (300 seconds)
+            writer_conn.commit()
+            store.snapshot.swap(load_rates(writer_conn)) # Publish to '/' only after the commit
+            logger.info("Rates updated", extra={'platforms': len(exchange_rates)})
+        except sqlite3.Error:
+            writer_conn.rollback()
+            logger.exception("Database error while updating rates")
 
-# Define a route to display exchange rates from multiple platforms
-@app.route('/')
-def index():
-    conn = get_db_conn()
-    c = conn.cursor()
-    c.execute('SELECT name, rate FROM platforms')
-    # Fetchall returns a list of tuples, convert to dict for easier template access
-    db_rates = c.fetchall()
-    conn.close()
+def create_app(config=None):
+    """
+    Builds the app: opens the database at DATABASE (creating the table) and starts the
+    rate update scheduler unless SCHEDULER_ENABLED is false. config (a dict) overrides
+    the settings read from the environment.
+    """
+    # Level from RATEFINDER_LOG_LEVEL (default INFO), for this package and the shared modules
+    configure_logging(logger_name='currency_exchange')
+    configure_logging()
+
+    flask_app = Flask(__name__)
+    flask_app.config['DATABASE'] = os.environ.get('CURRENCY_EXCHANGE_DATABASE', DEFAULT_DATABASE)
+    # Started with the app (not only under __main__) so WSGI workers refresh rates too;
+    # CURRENCY_EXCHANGE_SCHEDULER=0 turns it off, e.g. for one-off scripts
+    flask_app.config['SCHEDULER_ENABLED'] = os.environ.get('CURRENCY_EXCHANGE_SCHEDULER', '1') != '0'
+    flask_app.config.update(config or {})
+
+    instrument_flask_app(flask_app) # Per-route latency and per-request query counts on /metrics
+    store = RateStore(flask_app.config['DATABASE'])
+    flask_app.extensions['currency_exchange'] = store
+    flask_app.teardown_appcontext(return_db_conn)
 
-    # Convert list of Row objects to a dictionary
-    exchange_rates_display = {row['name']: row['rate'] for row in db_rates}
+    # The database lease means only one process runs the update per interval,
+    # even with several workers each starting a scheduler
+    scheduler = Scheduler(lock=SQLiteJobLock(store.path))
+    scheduler.add_job('update_exchange_rates', lambda: update_exchange_rates(store), interval=UPDATE_INTERVAL)
+    flask_app.extensions['currency_exchange_scheduler'] = scheduler
 
-    # If database is empty, fetch fresh rates immediately for display
-    if not exchange_rates_display:
-        exchange_rates_display = fetch_exchange_rates()
+    flask_app.register_blueprint(bp)
+    if flask_app.config['SCHEDULER_ENABLED']:
+        scheduler.start()
+    return flask_app
 
-    return render_template('index.html', exchange_rates=exchange_rates_display)
+
+def _shared_app():
+    global app
+    if 'app' not in globals():
+        app = create_app()
+    return app
+
+
+def __getattr__(name):
+    """The shared `app` (gunicorn's currency_exchange.app:app) is created on first access."""
+    if name == 'app':
+        return _shared_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@bp.route('/scheduler-metrics')
+def scheduler_metrics():
+    return jsonify(current_app.extensions['currency_exchange_scheduler'].metrics())
+
+@bp.route('/metrics')
+def metrics():
+    # Prometheus scrape endpoint
+    return Response(metrics_registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+# Define a route to display exchange rates from multiple platforms
+@bp.route('/')
+def index():
+    # Served from the snapshot the updater publishes; at most one pragma per second
+    # (SnapshotWatcher) touches the database on this path
+    store = current_app.extensions['currency_exchange']
+    store.watcher.check()
+    return store.snapshot.render()
+
+@bp.route('/api/rates')
+def api_rates():
+    # JSON view of the stored rates, read through the pooled read-only connection
+    rows = get_db_conn().execute('SELECT name, rate FROM platforms').fetchall()
+    return jsonify({row['name']: row['rate'] for row in rows})
 
 # Define a route to handle the "Get" button click event
-@app.route('/register/<platform>')
+@bp.route('/register/<platform>')
 def register(platform):
     # Redirect the user to the platform's registration page
     # These are placeholder URLs
@@ -101,12 +309,8 @@ def register(platform):
 
 
 if __name__ == '__main__':
-    # Start the rate update thread
-    update_thread = threading.Thread(target=update_exchange_rates_periodically)
-    update_thread.daemon = True  # Allows main program to exit even if thread is running
-    update_thread.start()
-
+    # create_app() starts the background scheduler (runs the rate update job every UPDATE_INTERVAL seconds)
     # Run the Flask development server
-    app.run(debug=True, use_reloader=False) # use_reloader=False is important when using threads like this for background tasks
+    _shared_app().run(debug=True, use_reloader=False) # use_reloader=False is important when using threads like this for background tasks
                                             # to prevent the background task from running twice.
                                             # For production, use a proper WSGI server.
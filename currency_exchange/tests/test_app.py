@@ -0,0 +1,130 @@
+# Run from the repository root: python -m pytest -q currency_exchange/tests
+
+import json
+import os
+import queue
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from currency_exchange.app import (ConnectionPool, RateSnapshot, SnapshotWatcher, create_app, fetch_exchange_rates,
+                                   init_db, load_rates, open_writer_conn, update_exchange_rates)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'currency_exchange.db')
+    conn = open_writer_conn(path)
+    init_db(conn)
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app({'DATABASE': str(tmp_path / 'app.db'), 'SCHEDULER_ENABLED': False})
+
+
+def _commit_rate(path, name, rate):
+    """A write from another connection, as another worker's updater would make."""
+    conn = sqlite3.connect(path)
+    conn.execute('INSERT OR REPLACE INTO platforms (name, rate) VALUES (?, ?)', (name, rate))
+    conn.commit()
+    conn.close()
+
+
+def test_import_opens_nothing_and_starts_no_threads(tmp_path):
+    db_path = tmp_path / 'currency_exchange.db'
+    script = ("import json, threading, currency_exchange.app; "
+              "print(json.dumps([t.name for t in threading.enumerate()]))")
+    env = dict(os.environ, CURRENCY_EXCHANGE_DATABASE=str(db_path))
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == ['MainThread']
+    assert not db_path.exists()
+
+
+def test_writer_conn_uses_wal(db_path):
+    conn = open_writer_conn(db_path)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.close()
+
+
+def test_pool_creates_connections_lazily_up_to_its_size(db_path):
+    pool = ConnectionPool(db_path, size=2, timeout=0.05)
+    first = pool.get()
+    pool.put(first)
+    assert pool.get() is first # Reused, not reopened
+    second = pool.get()
+    assert second is not first
+
+    with pytest.raises(queue.Empty):
+        pool.get() # Both checked out
+    pool.put(second)
+    assert pool.get() is second
+
+
+def test_pool_connections_are_read_only(db_path):
+    conn = ConnectionPool(db_path).get()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO platforms (name, rate) VALUES ('X', 1.0)")
+
+
+def test_watcher_reloads_after_another_connection_commits(db_path):
+    snapshot = RateSnapshot()
+    watcher = SnapshotWatcher(db_path, snapshot, interval=0)
+    assert snapshot.rates == {}
+    assert not watcher.check()
+
+    _commit_rate(db_path, 'Remitly', 1.2)
+    assert watcher.check()
+    assert snapshot.rates == {'Remitly': 1.2}
+    assert not watcher.check()
+
+
+def test_watcher_checks_at_most_once_per_interval(db_path):
+    snapshot = RateSnapshot()
+    watcher = SnapshotWatcher(db_path, snapshot, interval=60)
+    assert not watcher.check() # Nothing changed, but the next check is an interval away
+    _commit_rate(db_path, 'Remitly', 1.2)
+    assert not watcher.check()
+    assert snapshot.rates == {}
+
+    watcher._next_check = 0
+    assert watcher.check()
+    assert snapshot.rates == {'Remitly': 1.2}
+
+
+def test_update_publishes_the_committed_rates(app):
+    store = app.extensions['currency_exchange']
+    version = store.snapshot.version
+    update_exchange_rates(store)
+
+    assert store.snapshot.rates == fetch_exchange_rates()
+    assert store.snapshot.version == version + 1
+    assert load_rates(store.read_pool.get()) == fetch_exchange_rates()
+
+
+def test_routes_read_from_the_app_store(app):
+    store = app.extensions['currency_exchange']
+    update_exchange_rates(store)
+    client = app.test_client()
+
+    assert client.get('/api/rates').get_json() == fetch_exchange_rates()
+    assert store.read_pool._idle.qsize() == 1 # Returned to the pool at teardown
+    page = client.get('/').get_data(as_text=True)
+    assert 'Remitly' in page and 'TransferWise' in page
+    assert client.get('/scheduler-metrics').status_code == 200
+
+
+def test_each_app_has_its_own_store(tmp_path):
+    first = create_app({'DATABASE': str(tmp_path / 'first.db'), 'SCHEDULER_ENABLED': False})
+    second = create_app({'DATABASE': str(tmp_path / 'second.db'), 'SCHEDULER_ENABLED': False})
+    update_exchange_rates(first.extensions['currency_exchange'])
+
+    assert first.test_client().get('/api/rates').get_json() == fetch_exchange_rates()
+    assert second.test_client().get('/api/rates').get_json() == {}